@@ -0,0 +1,369 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import shutil
+import multiprocessing
+import platform
+import resource
+import subprocess
+from time import perf_counter
+from pathlib import Path
+from argparse import ArgumentParser
+from statistics import median
+from tempfile import TemporaryDirectory
+
+import torch
+
+from models import CRNN, TFCRNN
+from models._modules.dnn import DNN
+from tools.metrics import f1_per_frame, error_rate_per_frame, \
+    F1PerFrameAccumulator, ErrorRatePerFrameAccumulator
+from tools.printing import print_msg
+from tools.dataset_generator import generate_real_life
+from data_feeders._real_life_dataset import SEDRealLife
+from experiments._processes import _precisions, _autocast, _saved_tensors_memory
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['run_benchmarks', 'compare_results', 'main']
+
+
+def _current_rss():
+    """Returns the current resident set size of the process, in MB.
+
+    :return: The resident set size.
+    :rtype: float
+    """
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 1024 ** 2
+
+
+def _time_it(fn, repeats, warm_up=1):
+    """Times a callable.
+
+    :param fn: The callable.
+    :type fn: callable
+    :param repeats: The amount of timed calls.
+    :type repeats: int
+    :param warm_up: The amount of not timed calls before the timed ones.
+    :type warm_up: int
+    :return: The time of each of the timed calls, in seconds.
+    :rtype: list[float]
+    """
+    for _ in range(warm_up):
+        fn()
+    times = []
+    for _ in range(repeats):
+        start_time = perf_counter()
+        fn()
+        times.append(perf_counter() - start_time)
+    return times
+
+
+def _result(name, params, times, **extra):
+    """Makes the result of a benchmark.
+
+    :param name: The name of the benchmark.
+    :type name: str
+    :param params: The parameters of the benchmark.
+    :type params: dict
+    :param times: The timings, in seconds.
+    :type times: list[float]
+    :param extra: Any extra values for the result.
+    :type extra: object
+    :return: The result.
+    :rtype: dict
+    """
+    result = {'name': name, 'params': params, 'repeats': len(times),
+              'median_s': median(times), 'min_s': min(times)}
+    result.update(extra)
+    return result
+
+
+def _model_settings(channels, nb_classes):
+    """Returns the settings of the models, as in the settings files.
+
+    :param channels: The amount of CNN channels and RNN dimensions.
+    :type channels: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int
+    :return: The settings of the models.
+    :rtype: dict
+    """
+    return {'cnn_channels': channels, 'cnn_dropout': .25,
+            'rnn_in_dim': channels, 'rnn_out_dim': channels,
+            'rnn_dropout': .25, 'nb_classes': nb_classes}
+
+
+def _peak_memory_worker(fn, results):
+    """Runs a callable and puts the increase of the peak resident\
+    set size of the process, in MB, to a queue.
+
+    :param fn: The callable.
+    :type fn: callable
+    :param results: The queue for the result.
+    :type results: multiprocessing.Queue
+    """
+    rss_before = _current_rss()
+    fn()
+    results.put(max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - rss_before, 0.))
+
+
+def _peak_memory(fn):
+    """Returns the increase of the peak resident set size of the\
+    process during a call of a callable, in MB. The call is done\
+    in a forked process, so that the peak is not the one of a\
+    previous benchmark.
+
+    :param fn: The callable.
+    :type fn: callable
+    :return: The increase of the peak resident set size.
+    :rtype: float
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    process = context.Process(target=_peak_memory_worker, args=(fn, results))
+    process.start()
+    peak = results.get()
+    process.join()
+    return peak
+
+
+def benchmark_dnn(batch_size, seq_len, nb_features, channels, repeats):
+    """Benchmarks the forward pass of the DNN.
+    """
+    dnn = DNN(cnn_channels=channels, cnn_dropout=.25).eval()
+    x = torch.randn(batch_size, seq_len, nb_features)
+
+    def _run():
+        with torch.no_grad():
+            dnn(x)
+
+    return [_result('dnn_forward', {'batch_size': batch_size, 'seq_len': seq_len,
+                                    'channels': channels}, _time_it(_run, repeats))]
+
+
+def benchmark_models(batch_size, seq_len, nb_features, channels, nb_classes,
+                     repeats, precisions=('float32',)):
+    """Benchmarks the forward and backward passes of CRNN\
+    (with and without the fused GRU) and TFCRNN (with the\
+    autoregressive loop and with parallel scheduled sampling),\
+    also with activation checkpointing of the DNN and of chunks\
+    of 64 time steps of the recurrent loop. The memory is\
+    reported as the one that autograd keeps for the backward\
+    pass (without the inputs that checkpointing keeps) and as\
+    the increase of the peak resident set size.
+
+    Precisions other than `float32` use autocast for the\
+    models, and their benchmarks have the precision as suffix.
+    """
+    settings = _model_settings(channels, nb_classes)
+    x = torch.randn(batch_size, seq_len, nb_features)
+    y = torch.rand(batch_size, seq_len, nb_classes).gt(.8).float()
+
+    models = [
+        ('crnn', CRNN(**settings), False),
+        ('crnn_fused', CRNN(fused_rnn=True, **settings), False),
+        ('tf_crnn', TFCRNN(gamma_factor=10, mul_factor=120, min_prob=.05,
+                           max_prob=.9, **settings), True),
+        ('tf_crnn_parallel', TFCRNN(gamma_factor=10, mul_factor=120, min_prob=.05,
+                                    max_prob=.9, parallel_sampling=True,
+                                    **settings), True),
+        ('crnn_checkpointed', CRNN(checkpoint_dnn=True, checkpoint_steps=64,
+                                   **settings), False),
+        ('tf_crnn_checkpointed', TFCRNN(gamma_factor=10, mul_factor=120, min_prob=.05,
+                                        max_prob=.9, checkpoint_dnn=True,
+                                        checkpoint_steps=64, **settings), True)]
+
+    results = []
+    for name, model, use_tf in models:
+        model.train()
+        if use_tf:
+            model.batch_counter = 100
+
+        for precision in precisions:
+            def _run():
+                model.zero_grad()
+                with _autocast('cpu', precision):
+                    y_hat = model(x, y) if use_tf else model(x)
+                torch.nn.functional.binary_cross_entropy_with_logits(
+                    y_hat.float(), y).backward()
+
+            times = _time_it(_run, repeats)
+            results.append(_result(
+                '{}_forward_backward{}'.format(
+                    name, '' if precision == 'float32' else '_{}'.format(precision)),
+                {'batch_size': batch_size, 'seq_len': seq_len, 'channels': channels,
+                 'nb_classes': nb_classes, 'precision': precision}, times,
+                frames_per_sec=batch_size * seq_len / median(times),
+                activation_mb=_saved_tensors_memory(_run) / 1024 ** 2,
+                peak_rss_mb=_peak_memory(_run)))
+    return results
+
+
+def benchmark_metrics(nb_examples, seq_len, nb_classes, batch_size, repeats):
+    """Benchmarks the metrics on epoch-sized tensors, at once\
+    and with the accumulators over batches.
+    """
+    y_hat = torch.randn(nb_examples, seq_len, nb_classes)
+    y_true = torch.rand(nb_examples, seq_len, nb_classes).gt(.8).float()
+    params = {'nb_examples': nb_examples, 'seq_len': seq_len, 'nb_classes': nb_classes}
+
+    def _accumulated(accumulator_class):
+        accumulator = accumulator_class()
+        for i in range(0, nb_examples, batch_size):
+            accumulator.update(y_hat[i:i + batch_size], y_true[i:i + batch_size])
+        return accumulator.compute()
+
+    return [
+        _result('f1_per_frame', params, _time_it(lambda: f1_per_frame(y_hat, y_true), repeats)),
+        _result('error_rate_per_frame', params,
+                _time_it(lambda: error_rate_per_frame(y_hat, y_true), repeats)),
+        _result('f1_accumulator', dict(params, batch_size=batch_size),
+                _time_it(lambda: _accumulated(F1PerFrameAccumulator), repeats)),
+        _result('error_rate_accumulator', dict(params, batch_size=batch_size),
+                _time_it(lambda: _accumulated(ErrorRatePerFrameAccumulator), repeats))]
+
+
+def benchmark_dataset(nb_recordings, recording_len, nb_features, nb_classes,
+                      seq_len, repeats):
+    """Benchmarks the construction of a real life dataset from\
+    generated pickle files, without cache, and with a cold and\
+    a warm cache, with the memory that each dataset keeps.
+    """
+    params = {'nb_recordings': nb_recordings, 'recording_len': recording_len,
+              'nb_features': nb_features, 'seq_len': seq_len}
+    results = []
+
+    with TemporaryDirectory() as tmp_dir:
+        generate_real_life(
+            root_dir=Path(tmp_dir, 'data'), data_dir='real_life_2017', scene='',
+            nb_recordings=2 * nb_recordings, nb_folds=2, min_len=recording_len // 2,
+            max_len=recording_len * 3 // 2, length_distribution='uniform',
+            nb_features=nb_features, nb_classes=nb_classes, event_density=.1,
+            mean_event_len=100, input_features_file_name='x.p',
+            target_values_input_name='y.p')
+
+        def _make(cache_dir=None):
+            return SEDRealLife(
+                root_dir=str(Path(tmp_dir, 'data')), data_dir='real_life_2017',
+                data_fold=1, scene='', input_features_file_name='x.p',
+                target_values_input_name='y.p', seq_len=seq_len,
+                is_test=False, cache_dir=cache_dir)
+
+        cases = [
+            ('dataset_construction', lambda: None),
+            ('dataset_construction_cold_cache',
+             lambda: shutil.rmtree(str(Path(tmp_dir, 'cache')), ignore_errors=True)),
+            ('dataset_construction_warm_cache', lambda: None)]
+
+        for name, before in cases:
+            cache_dir = None if name == 'dataset_construction' else str(Path(tmp_dir, 'cache'))
+            times, rss = [], []
+            for _ in range(repeats):
+                before()
+                rss_before = _current_rss()
+                start_time = perf_counter()
+                dataset = _make(cache_dir)
+                times.append(perf_counter() - start_time)
+                rss.append(_current_rss() - rss_before)
+                del dataset
+            results.append(_result(name, params, times, rss_delta_mb=median(rss)))
+
+    return results
+
+
+def run_benchmarks(quick=False, repeats=3, precisions=('float32', 'bfloat16')):
+    """Runs all the benchmarks, on the CPU.
+
+    :param quick: Use small sizes, for a fast check?
+    :type quick: bool
+    :param repeats: The amount of timed calls of each benchmark.
+    :type repeats: int
+    :param precisions: The precisions of the benchmarks of the models.
+    :type precisions: list[str]
+    :return: The results, with information about the environment.
+    :rtype: dict
+    """
+    if quick:
+        sizes = {'batch_size': 2, 'seq_len': 128, 'channels': 32,
+                 'nb_examples': 64, 'nb_recordings': 8, 'recording_len': 2000}
+    else:
+        sizes = {'batch_size': 8, 'seq_len': 1024, 'channels': 256,
+                 'nb_examples': 256, 'nb_recordings': 32, 'recording_len': 20000}
+
+    nb_features, nb_classes = 40, 6
+
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    results = []
+    results.extend(benchmark_dnn(
+        sizes['batch_size'], sizes['seq_len'], nb_features, sizes['channels'], repeats))
+    results.extend(benchmark_models(
+        sizes['batch_size'], sizes['seq_len'], nb_features, sizes['channels'],
+        nb_classes, repeats, precisions))
+    results.extend(benchmark_metrics(
+        sizes['nb_examples'], sizes['seq_len'], nb_classes, sizes['batch_size'], repeats))
+    results.extend(benchmark_dataset(
+        sizes['nb_recordings'], sizes['recording_len'], nb_features, nb_classes,
+        sizes['seq_len'], repeats))
+
+    return {'commit': commit, 'torch': torch.__version__,
+            'threads': torch.get_num_threads(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'quick': quick,
+            'results': results}
+
+
+def compare_results(results, baseline):
+    """Prints the ratio of the median times of two runs.
+
+    :param results: The results of this run.
+    :type results: dict
+    :param baseline: The results of the run to compare with.
+    :type baseline: dict
+    """
+    baseline_times = {r['name']: r['median_s'] for r in baseline['results']}
+    print_msg('Compared with commit {}'.format(baseline['commit']), end='\n\n')
+    for result in results['results']:
+        if result['name'] not in baseline_times:
+            continue
+        print_msg('{:<45}: {:8.4f} s -> {:8.4f} s ({:5.2f}x)'.format(
+            result['name'], baseline_times[result['name']], result['median_s'],
+            baseline_times[result['name']] / result['median_s']), start='  -- ')
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument('--quick', default=False, action='store_true')
+    arg_parser.add_argument('--repeats', type=int, default=3)
+    arg_parser.add_argument('--output', type=str, default='')
+    arg_parser.add_argument('--compare', type=str, default='')
+    arg_parser.add_argument('--precisions', type=str, nargs='+',
+                            default=['float32', 'bfloat16'], choices=sorted(_precisions))
+    args = arg_parser.parse_args()
+
+    results = run_benchmarks(quick=args.quick, repeats=args.repeats,
+                             precisions=args.precisions)
+
+    for result in results['results']:
+        print_msg('{:<45}: {:8.4f} s (min {:8.4f} s)'.format(
+            result['name'], result['median_s'], result['min_s']), start='  -- ')
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        compare_results(results, json.loads(Path(args.compare).read_text()))
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
@@ -2,10 +2,13 @@
 # -*- coding: utf-8 -*-
 
 from ._data_loader_functions import get_tut_sed_data_loader
+from ._samplers import StatefulBatchSampler
+from ._curriculum import SequenceLengthCurriculum
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
-__all__ = ['get_tut_sed_data_loader']
+__all__ = ['get_tut_sed_data_loader', 'StatefulBatchSampler',
+           'SequenceLengthCurriculum']
 
 
 # EOF
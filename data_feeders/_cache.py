@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+from hashlib import sha1
+from os import getpid, replace
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['file_hash', 'cached_file_hash', 'cache_key', 'load_cached_array',
+           'create_cached_array', 'commit_cached_array',
+           'recording_id', 'load_recording', 'store_recording']
+
+_recordings_dir = 'recordings'
+_digests_dir = 'digests'
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """Calculates the SHA1 hash of the contents of a file.
+
+    :param file_path: The path of the file.
+    :type file_path: pathlib.Path|str
+    :param chunk_size: The amount of bytes to read at once.
+    :type chunk_size: int
+    :return: The hash, as a hexadecimal string.
+    :rtype: str
+    """
+    the_hash = sha1()
+    with Path(file_path).open('rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            the_hash.update(chunk)
+    return the_hash.hexdigest()
+
+
+def cached_file_hash(cache_dir, file_path):
+    """Returns the SHA1 hash of the contents of a file, as\
+    :func:`file_hash`, keeping it in the cache directory.
+
+    The kept hash is used as long as the path, the size, and the\
+    modification time of the file are the same, so the file is\
+    read only when it is new or has changed.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param file_path: The path of the file.
+    :type file_path: pathlib.Path|str
+    :return: The hash, as a hexadecimal string.
+    :rtype: str
+    """
+    file_path = Path(file_path).resolve()
+    stat = file_path.stat()
+    digests_dir = Path(cache_dir, _digests_dir)
+    digest_path = digests_dir.joinpath('{}.sha1'.format(
+        cache_key(file_path, stat.st_size, stat.st_mtime_ns)))
+
+    if digest_path.exists():
+        return digest_path.read_text().strip()
+
+    digest = file_hash(file_path)
+
+    digests_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = digest_path.with_suffix('.{}.tmp'.format(getpid()))
+    tmp_path.write_text(digest)
+    replace(str(tmp_path), str(digest_path))
+
+    return digest
+
+
+def cache_key(*items):
+    """Creates a cache key from the specified items.
+
+    :param items: The items that define the cached contents.
+    :type items: object
+    :return: The cache key.
+    :rtype: str
+    """
+    return sha1('|'.join(map(str, items)).encode('utf-8')).hexdigest()
+
+
+def _cached_array_path(cache_dir, key, name):
+    """Returns the path of a cached array.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param key: The cache key.
+    :type key: str
+    :param name: The name of the array (e.g. `x`).
+    :type name: str
+    :return: The path of the cached array.
+    :rtype: pathlib.Path
+    """
+    return Path(cache_dir, '{}_{}.npy'.format(key, name))
+
+
+def load_cached_array(cache_dir, key, name):
+    """Opens a cached array as a read-only memory map.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param key: The cache key.
+    :type key: str
+    :param name: The name of the array (e.g. `x`).
+    :type name: str
+    :return: The memory mapped array, or None if it is not cached.
+    :rtype: numpy.memmap|None
+    """
+    array_path = _cached_array_path(cache_dir, key, name)
+    if not array_path.exists():
+        return None
+    return np.load(str(array_path), mmap_mode='r')
+
+
+def create_cached_array(cache_dir, key, name, shape, dtype=np.float32):
+    """Creates a writable, memory mapped array, to be filled in\
+    and then made visible with :func:`commit_cached_array`.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param key: The cache key.
+    :type key: str
+    :param name: The name of the array (e.g. `x`).
+    :type name: str
+    :param shape: The shape of the array.
+    :type shape: tuple[int]
+    :param dtype: The data type of the array.
+    :type dtype: numpy.dtype
+    :return: The memory mapped array.
+    :rtype: numpy.memmap
+    """
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    tmp_path = _cached_array_path(
+        cache_dir, key, '{}.{}.tmp'.format(name, getpid()))
+    return open_memmap(str(tmp_path), mode='w+', dtype=dtype, shape=shape)
+
+
+def commit_cached_array(array, cache_dir, key, name):
+    """Flushes an array from :func:`create_cached_array` to\
+    disk, atomically moves it to its final place, and opens\
+    it again as a read-only memory map.
+
+    Concurrent processes that create the same array do not\
+    see partially written files.
+
+    :param array: The array.
+    :type array: numpy.memmap
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param key: The cache key.
+    :type key: str
+    :param name: The name of the array (e.g. `x`).
+    :type name: str
+    :return: The read-only memory mapped array.
+    :rtype: numpy.memmap
+    """
+    tmp_path = array.filename
+    array.flush()
+    replace(tmp_path, str(_cached_array_path(cache_dir, key, name)))
+    return load_cached_array(cache_dir, key, name)
+
+
+def recording_id(x, y):
+    """Calculates the content address of a recording, i.e. the\
+    SHA1 hash of its float32 input features and target values.
+
+    :param x: The input features of the recording.
+    :type x: numpy.ndarray
+    :param y: The target values of the recording.
+    :type y: numpy.ndarray
+    :return: The ID of the recording.
+    :rtype: str
+    """
+    the_hash = sha1()
+    for array in [x, y]:
+        array = np.ascontiguousarray(array, dtype=np.float32)
+        the_hash.update(str(array.shape).encode('utf-8'))
+        the_hash.update(array.data)
+    return the_hash.hexdigest()
+
+
+def load_recording(cache_dir, rec_id):
+    """Opens a recording of the store as read-only memory maps.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param rec_id: The ID of the recording.
+    :type rec_id: str
+    :return: The input features and the target values, or\
+             None if the recording is not in the store.
+    :rtype: (numpy.memmap, numpy.memmap)|None
+    """
+    store_dir = Path(cache_dir, _recordings_dir)
+    recording = [load_cached_array(store_dir, rec_id, name) for name in ['x', 'y']]
+    return None if any(r is None for r in recording) else tuple(recording)
+
+
+def store_recording(cache_dir, rec_id, x, y):
+    """Puts a recording in the store, if it is not already there,\
+    and opens it as read-only memory maps.
+
+    :param cache_dir: The cache directory.
+    :type cache_dir: pathlib.Path|str
+    :param rec_id: The ID of the recording.
+    :type rec_id: str
+    :param x: The input features of the recording.
+    :type x: numpy.ndarray
+    :param y: The target values of the recording.
+    :type y: numpy.ndarray
+    :return: The input features and the target values.
+    :rtype: numpy.memmap, numpy.memmap
+    """
+    recording = load_recording(cache_dir, rec_id)
+    if recording is not None:
+        return recording
+
+    store_dir = Path(cache_dir, _recordings_dir)
+    for name, array in [('x', x), ('y', y)]:
+        cached = create_cached_array(store_dir, rec_id, name, array.shape)
+        cached[:] = array
+        commit_cached_array(cached, store_dir, rec_id, name)
+
+    return load_recording(cache_dir, rec_id)
+
+# EOF
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['SequenceLengthCurriculum']
+
+
+class SequenceLengthCurriculum(object):
+    def __init__(self, make_data_loader, max_len, start_len,
+                 growth_factor=2., every_n_epochs=None, patience=None):
+        """Curriculum of the length of the training sequences.
+
+        The training starts with sequences of `start_len` feature\
+        vectors, and their length is multiplied by `growth_factor`\
+        (up to `max_len`) every `every_n_epochs` epochs and/or\
+        every time that the validation loss does not improve for\
+        `patience` epochs.
+
+        The data loader for the current length is made by\
+        `make_data_loader`, only when the length changes.
+
+        :param make_data_loader: Callable that makes the data\
+                                 loader for a sequence length.
+        :type make_data_loader: callable
+        :param max_len: The full length of the sequences.
+        :type max_len: int
+        :param start_len: The length of the sequences at the start.
+        :type start_len: int
+        :param growth_factor: The factor for growing the length.
+        :type growth_factor: float
+        :param every_n_epochs: The amount of epochs between growths\
+                               (None for no growth on schedule).
+        :type every_n_epochs: int|None
+        :param patience: The amount of epochs without improvement\
+                         of the validation loss for a growth (None\
+                         for no growth on plateau).
+        :type patience: int|None
+        """
+        super(SequenceLengthCurriculum, self).__init__()
+
+        if every_n_epochs is None and patience is None:
+            raise ValueError('The sequence length curriculum needs '
+                             '`every_n_epochs` and/or `patience`.')
+        if growth_factor <= 1:
+            raise ValueError('The growth factor of the sequence length '
+                             'curriculum must be bigger than 1, got {}.'.format(growth_factor))
+
+        self.make_data_loader = make_data_loader
+        self.max_len = max_len
+        self.growth_factor = growth_factor
+        self.every_n_epochs = every_n_epochs
+        self.patience = patience
+
+        self.seq_len = min(start_len, max_len)
+        self.start_epoch = 0
+
+        self._data_loader = None
+        self._data_loader_len = None
+
+    @property
+    def at_max_len(self):
+        """Are the sequences at their full length?
+
+        :return: True if the sequences are at their full length.
+        :rtype: bool
+        """
+        return self.seq_len >= self.max_len
+
+    def data_loader(self):
+        """Returns the data loader for the current length,\
+        making it if the length has changed.
+
+        :return: The data loader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        if self._data_loader_len != self.seq_len:
+            self._data_loader = None
+            self._data_loader = self.make_data_loader(self.seq_len)
+            self._data_loader_len = self.seq_len
+        return self._data_loader
+
+    def reset_data_loader(self):
+        """Drops the data loader, so that the next call of\
+        :meth:`data_loader` makes a new one (e.g. after a change\
+        of the settings that `make_data_loader` uses).
+        """
+        self._data_loader = None
+        self._data_loader_len = None
+
+    def step(self, epoch, epochs_waiting):
+        """Grows the length after an epoch, if it is time to.
+
+        :param epoch: The epoch that has just finished.
+        :type epoch: int
+        :param epochs_waiting: The amount of epochs without\
+                               improvement of the validation loss.
+        :type epochs_waiting: int
+        :return: Has the length grown?
+        :rtype: bool
+        """
+        if self.at_max_len:
+            return False
+
+        on_schedule = self.every_n_epochs is not None and \
+            epoch + 1 - self.start_epoch >= self.every_n_epochs
+        on_plateau = self.patience is not None and epochs_waiting >= self.patience
+
+        if not (on_schedule or on_plateau):
+            return False
+
+        self.seq_len = min(max(int(self.seq_len * self.growth_factor),
+                               self.seq_len + 1), self.max_len)
+        self.start_epoch = epoch + 1
+        return True
+
+    def state_dict(self):
+        """Returns the state of the curriculum, for checkpoints.
+
+        :return: The state.
+        :rtype: dict
+        """
+        return {'seq_len': self.seq_len, 'start_epoch': self.start_epoch}
+
+    def load_state_dict(self, state_dict):
+        """Loads the state of the curriculum from a checkpoint.
+
+        :param state_dict: The state.
+        :type state_dict: dict
+        """
+        self.seq_len = state_dict['seq_len']
+        self.start_epoch = state_dict['start_epoch']
+
+# EOF
@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from torch.utils.data import DataLoader
+from torch.utils.data import DataLoader, DistributedSampler
+from torch.cuda import is_available
 
 from ._tut_sed_synthetic_2016 import TUTSEDSynthetic2016
 from ._tut_sed_real_life_2017 import TUTSEDRealLife2017
 from ._tut_sed_real_life_2016 import TUTSEDRealLife2016
+from ._samplers import LengthGroupedBatchSampler, StatefulBatchSampler
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
@@ -15,7 +17,11 @@ __all__ = ['get_tut_sed_data_loader']
 def get_tut_sed_data_loader(root_dir, split, data_version, batch_size,
                             shuffle, drop_last, input_features_file_name,
                             target_values_input_name, data_fold=None,
-                            scene=None, is_test=False):
+                            scene=None, is_test=False, seq_len=None,
+                            hop=None, cache_dir=None, group_by_length=False,
+                            num_workers=0, pin_memory=False,
+                            persistent_workers=False, prefetch_factor=2,
+                            stateful=False, num_replicas=1, rank=0):
     """Creates and returns the data loader.
 
     :param root_dir: The root dir for the dataset.
@@ -42,9 +48,66 @@ def get_tut_sed_data_loader(root_dir, split, data_version, batch_size,
     :type scene: str
     :param is_test: We want the testing split for folds case?
     :type is_test: bool
+    :param seq_len: Amount of feature vectors in one sequence\
+                    (None for the whole sequences of the synthetic\
+                    dataset and for the default of 1024 feature\
+                    vectors of the real life datasets).
+    :type seq_len: int|None
+    :param hop: Amount of feature vectors between the starts of\
+                consecutive sequences, for the training split of\
+                the real life datasets (None for `seq_len`). The\
+                testing split never overlaps, so that every frame\
+                counts once in the metrics.
+    :type hop: int|None
+    :param cache_dir: The directory for caching the recordings of\
+                      the real life datasets (None for no caching).
+    :type cache_dir: str|None
+    :param group_by_length: Put examples with similar amount of not\
+                            padded feature vectors in the same batch?
+    :type group_by_length: bool
+    :param num_workers: The amount of worker processes for loading\
+                        the data (0 for loading in the main process).
+    :type num_workers: int
+    :param pin_memory: Put the batches in pinned memory, for faster\
+                       copies to the GPU? Ignored if there is no GPU.
+    :type pin_memory: bool
+    :param persistent_workers: Keep the worker processes alive\
+                               between epochs?
+    :type persistent_workers: bool
+    :param prefetch_factor: The amount of batches that each worker\
+                            loads in advance.
+    :type prefetch_factor: int
+    :param stateful: Keep consecutive sequences of the same recording\
+                     in the same slot of consecutive batches, for\
+                     carrying the state of the model (see\
+                     :class:`StatefulBatchSampler`)? Used only with\
+                     the real life datasets, where it implies no\
+                     overlap of the sequences (i.e. `hop` is ignored)\
+                     and takes precedence over `group_by_length`.
+    :type stateful: bool
+    :param num_replicas: The amount of processes of data parallel\
+                         training. With more than one, the training\
+                         split is distributed with a\
+                         :class:`torch.utils.data.DistributedSampler`\
+                         (calling its `set_epoch` before each epoch\
+                         is needed for shuffling), and the other\
+                         splits are divided without repeated\
+                         examples, and without the ones that one\
+                         process drops with `drop_last`, so that\
+                         the metrics reduced over the processes\
+                         are the ones of a single process. Not\
+                         supported with `group_by_length` or\
+                         `stateful`.
+    :type num_replicas: int
+    :param rank: The rank of the process of data parallel training.
+    :type rank: int
     :return: The TUT BREACNNModel data loader.
     :rtype: torch.utils.data.DataLoader
     """
+    if num_replicas > 1 and (group_by_length or stateful):
+        raise ValueError('Data parallel training does not support '
+                         '`group_by_length` or `stateful`.')
+
     common_kwargs = {
         'root_dir': root_dir,
         'input_features_file_name': input_features_file_name,
@@ -52,10 +115,14 @@ def get_tut_sed_data_loader(root_dir, split, data_version, batch_size,
         'is_test': is_test}
 
     if data_version == 'synthetic':
-        common_kwargs.update({'split': split})
+        common_kwargs.update({'split': split, 'seq_len': seq_len})
         dataset = TUTSEDSynthetic2016(**common_kwargs)
     else:
-        common_kwargs.update({'data_fold': data_fold})
+        common_kwargs.update({
+            'data_fold': data_fold,
+            'hop': None if is_test or stateful else hop, 'cache_dir': cache_dir})
+        if seq_len is not None:
+            common_kwargs.update({'seq_len': seq_len})
 
         if data_version == 2016:
             common_kwargs.update({'scene': scene})
@@ -63,9 +130,44 @@ def get_tut_sed_data_loader(root_dir, split, data_version, batch_size,
         else:
             dataset = TUTSEDRealLife2017(**common_kwargs)
 
+    loader_kwargs = {
+        'num_workers': num_workers,
+        'pin_memory': pin_memory and is_available()}
+
+    if num_workers > 0:
+        loader_kwargs.update({
+            'persistent_workers': persistent_workers,
+            'prefetch_factor': prefetch_factor})
+
+    if stateful and data_version != 'synthetic':
+        return DataLoader(
+            dataset=dataset, batch_sampler=StatefulBatchSampler(
+                windows=dataset.windows, batch_size=batch_size,
+                shuffle=shuffle if split == 'training' else False,
+                drop_last=drop_last), **loader_kwargs)
+
+    if group_by_length:
+        return DataLoader(
+            dataset=dataset, batch_sampler=LengthGroupedBatchSampler(
+                valid_lengths=dataset.valid_lengths, batch_size=batch_size,
+                shuffle=shuffle if split == 'training' else False,
+                drop_last=drop_last), **loader_kwargs)
+
+    if num_replicas > 1:
+        # The other splits drop the same examples as in one process.
+        nb_examples = len(dataset) - len(dataset) % batch_size if drop_last else len(dataset)
+        sampler = DistributedSampler(
+            dataset, num_replicas=num_replicas, rank=rank,
+            shuffle=shuffle, drop_last=drop_last) if split == 'training' \
+            else range(rank, nb_examples, num_replicas)
+        return DataLoader(
+            dataset=dataset, batch_size=batch_size, sampler=sampler,
+            drop_last=drop_last if split == 'training' else False,
+            **loader_kwargs)
+
     return DataLoader(
         dataset=dataset, batch_size=batch_size,
         shuffle=shuffle if split == 'training' else False,
-        drop_last=drop_last)
+        drop_last=drop_last, **loader_kwargs)
 
 # EOF
@@ -7,10 +7,58 @@ from torch.utils.data import Dataset
 import numpy as np
 
 from tools import file_io
+from . import _cache
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
-__all__ = ['SEDRealLife']
+__all__ = ['SEDRealLife', 'make_windows', 'cut_window']
+
+
+def make_windows(lengths, seq_len, hop):
+    """Makes the index of the sequences of a set of recordings,\
+    as pairs of the recording and the start of the sequence in\
+    the recording (negative if the sequence is padded).
+
+    The sequences start every `hop` feature vectors, with the\
+    last one ending at the end of the recording. The first one\
+    is left padded with zeros, only as much as needed.
+
+    :param lengths: The lengths of the recordings.
+    :type lengths: numpy.ndarray
+    :param seq_len: Amount of feature vectors in one sequence.
+    :type seq_len: int
+    :param hop: Amount of feature vectors between the starts of\
+                consecutive sequences.
+    :type hop: int
+    :return: The index of the sequences.
+    :rtype: numpy.ndarray
+    """
+    windows = []
+    for recording, length in enumerate(lengths):
+        pad = seq_len - length if length < seq_len \
+            else (seq_len - length) % hop
+        starts = np.arange(-pad, length - seq_len + 1, hop)
+        windows.append(np.stack([np.full_like(starts, recording), starts], axis=-1))
+    return np.concatenate(windows).astype(np.int64)
+
+
+def cut_window(recording, start, seq_len):
+    """Materializes one sequence of a recording.
+
+    :param recording: The input features or the target\
+                      values of the recording.
+    :type recording: numpy.ndarray
+    :param start: The start of the sequence in the recording.
+    :type start: int
+    :param seq_len: Amount of feature vectors in one sequence.
+    :type seq_len: int
+    :return: The sequence.
+    :rtype: numpy.ndarray
+    """
+    sequence = np.zeros((seq_len, recording.shape[-1]), dtype=np.float32)
+    pad = max(-start, 0)
+    sequence[pad:] = recording[start + pad:start + seq_len]
+    return sequence
 
 
 class SEDRealLife(Dataset):
@@ -18,9 +66,27 @@ class SEDRealLife(Dataset):
     """
     def __init__(self, root_dir, data_dir, data_fold, scene,
                  input_features_file_name, target_values_input_name,
-                 seq_len, is_test):
+                 seq_len, is_test, hop=None, cache_dir=None):
         """Base class for real life datasets.
 
+        The recordings are kept as float32 arrays. The examples\
+        are sequences of `seq_len` feature vectors, starting every\
+        `hop` feature vectors, with the last one ending at the end\
+        of the recording. The first one is left padded with zeros,\
+        only as much as needed. They are taken as views of the\
+        recordings and materialized only in :meth:`__getitem__`,\
+        together with a mask of the not padded feature vectors.
+
+        If `cache_dir` is specified, the recordings are kept in a\
+        store in there, once per recording contents, as float32\
+        `.npy` files. Every fold (and scene) keeps only the IDs of\
+        its recordings, keyed by the contents of the pickle files\
+        and the split. The hashes of the contents are kept too, so\
+        the pickle files are not read again until they change.\
+        Later instances (also of concurrent runs) open the\
+        recordings as read-only memory maps, so all the folds\
+        share a single copy of the recordings.
+
         :param root_dir: The root directory for the dataset.
         :type root_dir: str
         :param data_dir: The data directory for the dataset.
@@ -37,9 +103,18 @@ class SEDRealLife(Dataset):
         :type seq_len: int
         :param is_test: Want the test split?
         :type is_test: bool
+        :param hop: Amount of feature vectors between the starts of\
+                    consecutive sequences (None for `seq_len`).
+        :type hop: int|None
+        :param cache_dir: The directory for the stored recordings\
+                          (None for no storing).
+        :type cache_dir: str|None
         """
         super(SEDRealLife, self).__init__()
 
+        self.seq_len = seq_len
+        self.hop = seq_len if hop is None else hop
+
         data_path = Path(root_dir, data_dir, scene,
                          'fold_{}'.format(data_fold))
 
@@ -48,21 +123,58 @@ class SEDRealLife(Dataset):
         x_path = data_path.joinpath('{}_{}'.format(f_prefix, input_features_file_name))
         y_path = data_path.joinpath('{}_{}'.format(f_prefix, target_values_input_name))
 
-        self.x = file_io.load_pickle_file(x_path)
-        self.y = file_io.load_pickle_file(y_path)
+        if cache_dir is None:
+            self.x = [r.astype(np.float32) for r in file_io.load_pickle_file(x_path)]
+            self.y = [r.astype(np.float32) for r in file_io.load_pickle_file(y_path)]
+        else:
+            self.x, self.y = self._load_stored_recordings(
+                x_path, y_path, f_prefix, cache_dir)
+
+        self.windows = make_windows(
+            np.array([r.shape[0] for r in self.x], dtype=np.int64),
+            self.seq_len, self.hop)
+        self.valid_lengths = self.seq_len - np.maximum(-self.windows[:, 1], 0)
+
+    @staticmethod
+    def _load_stored_recordings(x_path, y_path, f_prefix, cache_dir):
+        """Loads the recordings from the store, putting them\
+        in the store first if needed.
+
+        :param x_path: The path of the input features file.
+        :type x_path: pathlib.Path
+        :param y_path: The path of the target values file.
+        :type y_path: pathlib.Path
+        :param f_prefix: The prefix of the split.
+        :type f_prefix: str
+        :param cache_dir: The cache directory.
+        :type cache_dir: str
+        :return: The input features and the target values\
+                 of the recordings.
+        :rtype: list[numpy.memmap], list[numpy.memmap]
+        """
+        key = _cache.cache_key(
+            _cache.cached_file_hash(cache_dir, x_path),
+            _cache.cached_file_hash(cache_dir, y_path), f_prefix)
+
+        ids = _cache.load_cached_array(cache_dir, key, 'ids')
+        recordings = None if ids is None else \
+            [_cache.load_recording(cache_dir, rec_id) for rec_id in ids]
+
+        if recordings is None or any(r is None for r in recordings):
+            x_recordings = file_io.load_pickle_file(x_path)
+            y_recordings = file_io.load_pickle_file(y_path)
+            ids = [_cache.recording_id(x, y) for x, y in zip(x_recordings, y_recordings)]
 
-        for i in range(len(self.x)):
-            _, red = divmod(self.x[i].shape[0], seq_len)
+            recordings = [
+                _cache.store_recording(cache_dir, rec_id, x, y)
+                for rec_id, x, y in zip(ids, x_recordings, y_recordings)]
 
-            self.x[i] = np.concatenate([
-                np.zeros((seq_len - red, self.x[i].shape[-1])), self.x[i]
-            ]).reshape((-1, seq_len, self.x[i].shape[-1]))
-            self.y[i] = np.concatenate([
-                np.zeros((seq_len - red, self.y[i].shape[-1])), self.y[i]
-            ]).reshape((-1, seq_len, self.y[i].shape[-1]))
+            cached_ids = _cache.create_cached_array(
+                cache_dir, key, 'ids', (len(ids), ), '<U40')
+            cached_ids[:] = ids
+            _cache.commit_cached_array(cached_ids, cache_dir, key, 'ids')
 
-        self.x = np.concatenate(self.x)
-        self.y = np.concatenate(self.y)
+        return [r[0] for r in recordings], [r[1] for r in recordings]
 
     def __len__(self):
         """The amount of examples in the dataset.
@@ -70,7 +182,7 @@ class SEDRealLife(Dataset):
         :return: The amount of examples.
         :rtype: int
         """
-        return len(self.x)
+        return len(self.windows)
 
     def __getitem__(self, item):
         """Gets an example and its target values\
@@ -78,9 +190,14 @@ class SEDRealLife(Dataset):
 
         :param item: Index of the example.
         :type item: int
-        :return: The example and the target values.
-        :rtype: tuple[numpy.ndarray, numpy.ndarray]
+        :return: The example, the target values, and the mask\
+                 of the not padded feature vectors.
+        :rtype: tuple[numpy.ndarray, numpy.ndarray, numpy.ndarray]
         """
-        return self.x[item], self.y[item]
+        recording, start = self.windows[item]
+        mask = np.zeros(self.seq_len, dtype=np.float32)
+        mask[self.seq_len - self.valid_lengths[item]:] = 1
+        return cut_window(self.x[recording], start, self.seq_len), \
+            cut_window(self.y[recording], start, self.seq_len), mask
 
 # EOF
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from torch import randperm
+from torch.utils.data import Sampler
+import numpy as np
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['LengthGroupedBatchSampler', 'StatefulBatchSampler']
+
+
+class LengthGroupedBatchSampler(Sampler):
+    """Batch sampler that puts examples with similar amount\
+    of not padded feature vectors in the same batch.
+    """
+    def __init__(self, valid_lengths, batch_size, shuffle, drop_last):
+        """Batch sampler that puts examples with similar amount\
+        of not padded feature vectors in the same batch.
+
+        :param valid_lengths: The amount of not padded feature\
+                              vectors of each example.
+        :type valid_lengths: numpy.ndarray
+        :param batch_size: The batch size.
+        :type batch_size: int
+        :param shuffle: Shuffle the examples of the same length\
+                        and the order of the batches?
+        :type shuffle: bool
+        :param drop_last: Drop last examples?
+        :type drop_last: bool
+        """
+        super(LengthGroupedBatchSampler, self).__init__()
+        self.valid_lengths = np.asarray(valid_lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+
+    def __iter__(self):
+        tie_break = randperm(len(self.valid_lengths)).numpy() \
+            if self.shuffle else np.arange(len(self.valid_lengths))
+        indices = np.lexsort((tie_break, self.valid_lengths))
+
+        batches = [indices[i:i + self.batch_size].tolist()
+                   for i in range(0, len(indices), self.batch_size)]
+
+        if self.drop_last and len(batches) > 0 and len(batches[-1]) < self.batch_size:
+            batches = batches[:-1]
+
+        if self.shuffle:
+            batches = [batches[i] for i in randperm(len(batches)).tolist()]
+
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.valid_lengths) // self.batch_size
+        return (len(self.valid_lengths) + self.batch_size - 1) // self.batch_size
+
+
+class StatefulBatchSampler(Sampler):
+    """Batch sampler that keeps consecutive sequences of the\
+    same recording in the same slot of consecutive batches.
+    """
+    def __init__(self, windows, batch_size, shuffle, drop_last):
+        """Batch sampler that keeps consecutive sequences of the\
+        same recording in the same slot of consecutive batches,\
+        so that the state of a recurrent model can be carried\
+        from one batch to the next.
+
+        The sequences of all recordings (in random order, if\
+        `shuffle` is set) are put one after the other and split\
+        in `batch_size` contiguous parts, one per slot. The\
+        parts are of the same length, except of the last ones\
+        when `drop_last` is not set, so the slots that are still\
+        used are always the first ones of a batch.
+
+        After the sampler is iterated, `resets` has, for every\
+        batch, the flags of the slots that start a new recording\
+        (or a new part) and must not get the carried state.
+
+        :param windows: The recording and the start of each of\
+                        the sequences, ordered by the start in\
+                        each recording (see\
+                        :class:`data_feeders._real_life_dataset.SEDRealLife`).
+        :type windows: numpy.ndarray
+        :param batch_size: The batch size.
+        :type batch_size: int
+        :param shuffle: Shuffle the order of the recordings?
+        :type shuffle: bool
+        :param drop_last: Drop the last sequences that do not\
+                          fill a batch?
+        :type drop_last: bool
+        """
+        super(StatefulBatchSampler, self).__init__()
+        self.windows = np.asarray(windows)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.resets = []
+
+        self._recordings = [
+            np.flatnonzero(self.windows[:, 0] == recording)
+            for recording in np.unique(self.windows[:, 0])]
+
+    def __iter__(self):
+        order = randperm(len(self._recordings)).tolist() \
+            if self.shuffle else range(len(self._recordings))
+
+        indices = np.concatenate([self._recordings[i] for i in order])
+        starts = np.concatenate([
+            np.arange(len(self._recordings[i])) == 0 for i in order])
+
+        slot_len = len(self)
+        slots = [slice(i * slot_len, (i + 1) * slot_len) for i in range(self.batch_size)]
+        slots = [(indices[slot], starts[slot]) for slot in slots]
+        slots = [(slot_indices, np.concatenate([[True], slot_starts[1:]]))
+                 for slot_indices, slot_starts in slots if len(slot_indices) > 0]
+
+        batches = [[slot_indices[b].item() for slot_indices, _ in slots if len(slot_indices) > b]
+                   for b in range(slot_len)]
+        self.resets = [[bool(slot_resets[b]) for _, slot_resets in slots if len(slot_resets) > b]
+                       for b in range(slot_len)]
+
+        return iter(batches)
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.windows) // self.batch_size
+        return (len(self.windows) + self.batch_size - 1) // self.batch_size
+
+# EOF
@@ -13,7 +13,8 @@ class TUTSEDRealLife2016(SEDRealLife):
     """
     def __init__(self, root_dir, data_fold, scene,
                  input_features_file_name, target_values_input_name,
-                 is_test):
+                 is_test, seq_len=1024, hop=None,
+                 cache_dir=None):
         """TUT SED Real Life 2016 dataset class.
 
         :param root_dir: The root directory for the dataset.
@@ -28,6 +29,14 @@ class TUTSEDRealLife2016(SEDRealLife):
         :type target_values_input_name: str
         :param is_test: Want the test split?
         :type is_test: bool
+        :param seq_len: Amount of feature vectors in one sequence.
+        :type seq_len: int
+        :param hop: Amount of feature vectors between the starts of\
+                    consecutive sequences (None for `seq_len`).
+        :type hop: int|None
+        :param cache_dir: The directory for the cached recordings\
+                          (None for no caching).
+        :type cache_dir: str|None
         """
         super(TUTSEDRealLife2016, self).__init__(
             root_dir=root_dir, data_dir='real_life_2016',
@@ -35,7 +44,8 @@ class TUTSEDRealLife2016(SEDRealLife):
             scene=scene,
             input_features_file_name=input_features_file_name,
             target_values_input_name=target_values_input_name,
-            seq_len=1024, is_test=is_test
+            seq_len=seq_len, is_test=is_test, hop=hop,
+            cache_dir=cache_dir
         )
 
 # EOF
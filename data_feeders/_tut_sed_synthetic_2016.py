@@ -4,8 +4,10 @@
 from pathlib import Path
 
 from torch.utils.data import Dataset
+import numpy as np
 
 from tools import file_io
+from ._real_life_dataset import make_windows, cut_window
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
@@ -16,7 +18,7 @@ class TUTSEDSynthetic2016(Dataset):
     """TUT SED Synthetic 2016 dataset
     """
     def __init__(self, root_dir, split, input_features_file_name,
-                 target_values_input_name, is_test):
+                 target_values_input_name, is_test, seq_len=None):
         """TUT SED Synthetic 2016 dataset class. 
         
         :param root_dir: The root directory for the dataset. 
@@ -27,6 +29,12 @@ class TUTSEDSynthetic2016(Dataset):
         :type input_features_file_name: str
         :param target_values_input_name: Target values file name.
         :type target_values_input_name: str
+        :param seq_len: Amount of feature vectors in one sequence\
+                        (None for the whole sequences of the\
+                        dataset). Shorter sequences are cut from\
+                        the ones of the dataset without overlap,\
+                        as in :class:`SEDRealLife`.
+        :type seq_len: int|None
         """
         super(TUTSEDSynthetic2016, self).__init__()
         data_path = Path(root_dir, 'synthetic', split)
@@ -37,10 +45,29 @@ class TUTSEDSynthetic2016(Dataset):
         self.x = file_io.load_numpy_object(x_path)
         self.y = file_io.load_numpy_object(y_path)
 
+        self.seq_len = self.x.shape[1] if seq_len is None else seq_len
+        self.windows = None
+
+        if self.seq_len == self.x.shape[1]:
+            self.valid_lengths = np.full(self.x.shape[0], self.seq_len)
+        else:
+            self.windows = make_windows(
+                np.full(self.x.shape[0], self.x.shape[1]), self.seq_len, self.seq_len)
+            self.valid_lengths = self.seq_len - np.maximum(-self.windows[:, 1], 0)
+
+        self._mask = np.ones(self.seq_len, dtype=np.float32)
+
     def __len__(self):
-        return self.x.shape[0]
+        return len(self.valid_lengths)
 
     def __getitem__(self, item):
-        return self.x[item], self.y[item]
+        if self.windows is None:
+            return self.x[item], self.y[item], self._mask
+
+        example, start = self.windows[item]
+        mask = np.zeros(self.seq_len, dtype=np.float32)
+        mask[self.seq_len - self.valid_lengths[item]:] = 1
+        return cut_window(self.x[example], start, self.seq_len), \
+            cut_window(self.y[example], start, self.seq_len), mask
 
 # EOF
@@ -1,123 +1,732 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from time import time
-from copy import deepcopy
+import sys
+import json
+from os import sysconf, devnull
+from hashlib import sha1
+from math import ceil
+from time import time, perf_counter
+from socket import socket
+from pathlib import Path
+from queue import Empty
+from functools import partial
+from contextlib import nullcontext
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
-from torch import no_grad, cat, zeros
+from torch import no_grad, zeros, tensor, set_num_threads, autocast, \
+    bfloat16, float16, float64, device as torch_device, distributed, \
+    manual_seed, initial_seed, get_num_threads
+from torch.amp import GradScaler
+from torch.multiprocessing import get_context
+from torch.autograd.profiler import record_function
 from torch.optim import Adam
 from torch.nn import BCEWithLogitsLoss, utils
-from torch.cuda import is_available
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DistributedSampler
+from torch.cuda import is_available, Stream, current_stream, \
+    stream as cuda_stream, empty_cache, mem_get_info, memory_allocated, \
+    max_memory_allocated, reset_peak_memory_stats, OutOfMemoryError
+from torch.autograd.graph import saved_tensors_hooks
 
-from tools.metrics import f1_per_frame, error_rate_per_frame
+from tools.metrics import F1PerFrameAccumulator, \
+    ErrorRatePerFrameAccumulator
 from tools.printing import print_msg, inform_about_device, \
-    InformAboutProcess, print_evaluation_results, \
-    print_training_results
-from data_feeders import get_tut_sed_data_loader
+    InformAboutProcess
+from tools.telemetry import PhaseTimer, make_record, TelemetrySink, \
+    JSONLWriter, ConsolePrinter
+from tools.profiling import make_profiler
+from tools.checkpoints import get_rng_states, set_rng_states, \
+    save_checkpoint, load_checkpoint, ModelSnapshot
+from data_feeders import get_tut_sed_data_loader, StatefulBatchSampler, \
+    SequenceLengthCurriculum
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
 __all__ = ['training', 'testing', 'experiment']
 
+_model_attributes = ['iteration', 'batch_counter']
+
+_precisions = {
+    'float32': None,
+    'bfloat16': bfloat16,
+    'float16': float16}
+
+
+def _autocast(device, precision):
+    """Returns the autocast context for the forward passes of\
+    the models, with the specified precision.
+
+    :param device: The device to be used.
+    :type device: str
+    :param precision: The precision (`float32`, `bfloat16`, or\
+                      `float16`). With `float32`, autocast is\
+                      not enabled.
+    :type precision: str
+    :return: The autocast context.
+    :rtype: torch.autocast
+    """
+    if precision not in _precisions:
+        raise ValueError('Unknown precision `{}`. Accepted values are: {}.'.format(
+            precision, ', '.join(_precisions.keys())))
+    return autocast(
+        torch_device(device).type, dtype=_precisions[precision],
+        enabled=_precisions[precision] is not None)
+
+
+class _DevicePrefetcher(object):
+    def __init__(self, data_loader, device):
+        """Iterates over a data loader, having the next batch\
+        already moved to the device and cast to float32.
+
+        On a GPU, the copy and the cast of the next batch are done\
+        on a separate CUDA stream, while the current batch is being\
+        processed. The time spent on waiting for the data loader is\
+        kept in the `wait_time` attribute.
+
+        :param data_loader: The data loader.
+        :type data_loader: torch.utils.data.DataLoader
+        :param device: The device to be used.
+        :type device: str
+        """
+        super(_DevicePrefetcher, self).__init__()
+        self.data_loader = data_loader
+        self.device = torch_device(device)
+        self.stream = Stream(self.device) if self.device.type == 'cuda' else None
+        self.wait_time = 0.
+
+    def __len__(self):
+        return len(self.data_loader)
+
+    def _fetch(self, loader_iterator):
+        """Gets the next batch and starts moving it to the device.
+
+        :param loader_iterator: The iterator of the data loader.
+        :type loader_iterator: iterator
+        :return: The batch, or None if there are no more batches.
+        :rtype: list[torch.Tensor]|None
+        """
+        start_time = perf_counter()
+        try:
+            with record_function('data_loading'):
+                data = next(loader_iterator)
+        except StopIteration:
+            return None
+        finally:
+            self.wait_time += perf_counter() - start_time
+
+        if self.stream is None:
+            return [d.to(self.device).float() for d in data]
+
+        with cuda_stream(self.stream):
+            return [d.to(self.device, non_blocking=True).float() for d in data]
+
+    def __iter__(self):
+        self.wait_time = 0.
+        loader_iterator = iter(self.data_loader)
+        next_data = self._fetch(loader_iterator)
+
+        while next_data is not None:
+            if self.stream is not None:
+                current_stream(self.device).wait_stream(self.stream)
+                for d in next_data:
+                    d.record_stream(current_stream(self.device))
+            data = next_data
+            next_data = self._fetch(loader_iterator)
+            yield data
+
+
+def _is_distributed():
+    """Is the process one of the processes of data parallel training?
+
+    :return: True if the default process group is initialized.
+    :rtype: bool
+    """
+    return distributed.is_available() and distributed.is_initialized()
+
+
+def _rank():
+    """Returns the rank of the process in data parallel training.
+
+    :return: The rank (0 if there is no data parallel training).
+    :rtype: int
+    """
+    return distributed.get_rank() if _is_distributed() else 0
+
+
+def _world_size():
+    """Returns the amount of processes of data parallel training.
+
+    :return: The amount of processes (1 if there is no data\
+             parallel training).
+    :rtype: int
+    """
+    return distributed.get_world_size() if _is_distributed() else 1
+
+
+def _carried_state(state, resets, device):
+    """Returns the state of a model for the next batch of a\
+    :class:`data_feeders.StatefulBatchSampler`, i.e. the state\
+    of the slots of the batch, zeroed where a new recording starts.
+
+    :param state: The state of the model after the previous\
+                  batch (None for the first batch).
+    :type state: tuple[torch.Tensor]|None
+    :param resets: The flags of the slots that start a new recording.
+    :type resets: list[bool]
+    :param device: The device to be used.
+    :type device: str|torch.device
+    :return: The state for the batch (None if all slots are reset).
+    :rtype: tuple[torch.Tensor]|None
+    """
+    if state is None or all(resets):
+        return None
+    keep = tensor([[0.] if reset else [1.] for reset in resets], device=device)
+    return tuple(s[:len(resets)].mul(keep.to(s.dtype)) for s in state)
+
 
 def _sed_epoch(model, data_loader, objective,
-               optimizer, device, is_testing=False,
-               use_tf=True, grad_norm=1.):
+               optimizer, device, f1_metric, er_metric,
+               is_testing=False, use_tf=True, grad_norm=1.,
+               trim_padding=False, profiler=None, precision='float32',
+               grad_scaler=None, tbptt_steps=None, accumulation_steps=1):
     """Performs a forward pass for the BREACNNModel model.
 
+    The objective is averaged, and the metrics are calculated,\
+    only over the not padded frames of the examples.
+
+    If the data loader uses a :class:`data_feeders.StatefulBatchSampler`,\
+    the state of the model is carried from each batch to the next,\
+    except for the slots that start a new recording. With\
+    `tbptt_steps`, the training batches are processed in chunks of\
+    `tbptt_steps` frames, with a backward pass per chunk and the\
+    state carried (but not back-propagated) between the chunks,\
+    i.e. with truncated back-propagation through time. There is\
+    one optimizer step per batch.
+
+    With `accumulation_steps`, the gradients of that many consecutive\
+    batches are accumulated before each optimizer step (the last\
+    step of the epoch may have less batches), with the objective\
+    normalized over the not padded frames of all of them, as for\
+    one batch. The gradient norm is clipped once, on the accumulated\
+    gradients. With a\
+    :class:`torch.nn.parallel.DistributedDataParallel` model, the\
+    gradients are synchronized only at the backward pass before\
+    each optimizer step.
+
+    In data parallel training, the values of the objective, the\
+    metrics, and the amounts of frames and batches are reduced\
+    over the processes, i.e. the values of the objective are\
+    replaced with their mean over the batches of all processes.
+
+    With a `precision` other than `float32`, the model runs under\
+    autocast, and its outputs are cast back to float32 before the\
+    objective and the metrics.
+
     :param model: The BREACNNModel model.
     :type model: torch.nn.Module
     :param data_loader: The data loader to be used.
     :type data_loader: torch.utils.data.DataLoader
-    :param objective: The objective function to be used.
+    :param objective: The objective function to be used, returning\
+                      the value for each frame and class (i.e.\
+                      with no reduction).
     :type objective: callable | None
     :param optimizer: The optimizer ot be used.
     :type optimizer: torch.optim.Optimizer | None
     :param device: The device to be used.
     :type device: str
+    :param f1_metric: The accumulator class for the F1 score.
+    :type f1_metric: callable
+    :param er_metric: The accumulator class for the error rate.
+    :type er_metric: callable
     :param is_testing: Is it a testing pass?
     :type is_testing: bool
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
     :param grad_norm: The maximum gradient norm.
     :type grad_norm: float
-    :return: The model and the values for the objective and evaluation of a full\
-             iteration of the data (objective, f1_score, er_score).
-    :rtype: torch.nn.Module, torch.Tensor, torch.Tensor, torch.Tensor
+    :param trim_padding: Drop the leading frames that are padded\
+                         in all the examples of a batch?
+    :type trim_padding: bool
+    :param profiler: The profiler to step after every batch (None\
+                     for no profiling).
+    :type profiler: torch.profiler.profile|None
+    :param precision: The precision of the model (`float32`,\
+                      `bfloat16`, or `float16`).
+    :type precision: str
+    :param grad_scaler: The scaler of the objective, for the\
+                        gradients in float16 (None for no scaling).
+    :type grad_scaler: torch.amp.GradScaler|None
+    :param tbptt_steps: The amount of frames between the truncations\
+                        of the back-propagation (None for no\
+                        truncation).
+    :type tbptt_steps: int|None
+    :param accumulation_steps: The amount of batches per optimizer step.
+    :type accumulation_steps: int
+    :return: The model, the values for the objective and evaluation of a full\
+             iteration of the data (objective, f1_score, er_score), and the\
+             statistics of the epoch (the time of each of its phases, and\
+             the amounts of frames and batches).
+    :rtype: torch.nn.Module, torch.Tensor, torch.Tensor, torch.Tensor, dict
     """
-    epoch_objective_values = zeros(len(data_loader)).float()
+    nb_batches = len(data_loader)
+    epoch_objective_values = zeros(nb_batches).float()
+    stateful = isinstance(data_loader.batch_sampler, StatefulBatchSampler)
+    state = None
 
-    values_true = []
-    values_hat = []
+    f1_accumulator = f1_metric()
+    er_accumulator = er_metric()
 
-    for e, data in enumerate(data_loader):
-        if optimizer is not None:
-            optimizer.zero_grad()
+    prefetcher = _DevicePrefetcher(data_loader, device)
+    timer = PhaseTimer(device)
+    frames = 0
 
-        x = data[0].float().to(device)
-        y = data[1].float().to(device)
+    for e, (x, y, mask) in enumerate(prefetcher):
+        group_start = e - e % accumulation_steps
+        group_size = min(accumulation_steps, nb_batches - group_start)
 
-        y_hat = model(x, y if not is_testing else None) if use_tf else model(x)
+        if optimizer is not None and e == group_start:
+            with timer.time('optimizer'):
+                optimizer.zero_grad()
+
+        if trim_padding:
+            valid_len = max(int(mask.sum(dim=1).max().item()), 1)
+            x, y, mask = x[:, -valid_len:], y[:, -valid_len:], mask[:, -valid_len:]
+
+        if stateful:
+            state = _carried_state(state, data_loader.batch_sampler.resets[e], x.device)
+        else:
+            state = None
+
+        # The loss of every chunk is normalized with the not padded
+        # frames of the whole batch, so the chunks add up to the loss
+        # of the batch.
+        loss, nb_valid = 0., mask.sum().mul(y.size(-1))
+
+        # The objective of a group of accumulated batches is normalized
+        # with the not padded frames of all of them, which are known
+        # only at its last batch. The batches are weighted with an
+        # estimate of them, which is corrected before the optimizer step.
+        if e == group_start:
+            group_estimate, group_valid = nb_valid.mul(group_size).clamp(min=1), 0.
+        group_valid = nb_valid.add(group_valid)
+        batch_weight = nb_valid.div(group_estimate)
+
+        chunk_len = tbptt_steps if optimizer is not None and tbptt_steps else x.size(1)
+
+        for t in range(0, x.size(1), chunk_len):
+            x_c, y_c, mask_c = x[:, t:t + chunk_len], y[:, t:t + chunk_len], \
+                mask[:, t:t + chunk_len]
+
+            synchronize = e + 1 == group_start + group_size and t + chunk_len >= x.size(1)
+            sync_context = model.no_sync \
+                if optimizer is not None and not synchronize and \
+                isinstance(model, DistributedDataParallel) else nullcontext
+
+            with sync_context(), timer.time('forward'):
+                with _autocast(device, precision):
+                    y_hat, state = model(
+                        x_c, y_c if not is_testing else None, state=state,
+                        return_state=True) if use_tf else \
+                        model(x_c, state=state, return_state=True)
+                y_hat = y_hat.float()
+
+                if objective is not None:
+                    with record_function('loss'):
+                        loss_c = objective(y_hat, y_c).mul(
+                            mask_c.unsqueeze(-1)).sum().div(nb_valid)
+
+            if objective is not None:
+                if optimizer is not None:
+                    with sync_context(), timer.time('backward'):
+                        if grad_scaler is None:
+                            loss_c.mul(batch_weight).backward()
+                        else:
+                            grad_scaler.scale(loss_c.mul(batch_weight)).backward()
+                loss = loss_c.detach().add(loss)
+
+            state = tuple(s.detach() for s in state)
+
+            with timer.time('metrics'), no_grad():
+                f1_accumulator.update(y_hat, y_c, mask_c)
+                er_accumulator.update(y_hat, y_c, mask_c)
 
         if objective is not None:
-            loss = objective(y_hat, y)
-            if optimizer is not None:
-                loss.backward()
-                if grad_norm > 0:
-                    utils.clip_grad_norm_(model.parameters(), grad_norm)
-                optimizer.step()
+            if optimizer is not None and e + 1 == group_start + group_size:
+                with timer.time('optimizer'):
+                    if grad_scaler is not None:
+                        grad_scaler.unscale_(optimizer)
+                    if group_size > 1:
+                        correction = group_estimate.div(group_valid.clamp(min=1))
+                        for parameter in model.parameters():
+                            if parameter.grad is not None:
+                                parameter.grad.mul_(correction)
+                    if grad_norm > 0:
+                        utils.clip_grad_norm_(model.parameters(), grad_norm)
+                    if grad_scaler is None:
+                        optimizer.step()
+                    else:
+                        grad_scaler.step(optimizer)
+                        grad_scaler.update()
             loss = loss.item()
         else:
             loss = 0.
 
         epoch_objective_values[e] = loss
-        values_true.append(y.cpu())
-        values_hat.append(y_hat.cpu())
 
-    values_true = cat(values_true, dim=0)
-    values_hat = cat(values_hat, dim=0)
+        frames += x.size(0) * x.size(1)
+
+        if profiler is not None:
+            profiler.step()
+
+    batches = len(prefetcher)
+
+    if _is_distributed():
+        totals = tensor([epoch_objective_values.sum().item(), nb_batches, frames],
+                        dtype=float64)
+        distributed.all_reduce(totals)
+        epoch_objective_values = totals[:1].div(totals[1].clamp(min=1)).float()
+        batches, frames = int(totals[1]), int(totals[2])
+        f1_accumulator.all_reduce()
+        er_accumulator.all_reduce()
+
+    timer.add('data_wait', prefetcher.wait_time)
+    stats = dict(timer.totals, frames=frames, batches=batches)
 
-    return model, epoch_objective_values, values_true, values_hat
+    return model, epoch_objective_values, \
+        f1_accumulator.compute(), er_accumulator.compute(), stats
 
 
-def testing(model, data_loader, f1_func, er_func, device, use_tf):
+def testing(model, data_loader, f1_metric, er_metric, device, use_tf,
+            trim_padding=False, telemetry=None, precision='float32'):
     """Tests a model.
 
     :param model: The model to be tested.
     :type model: torch.nn.Module
     :param data_loader: The data loader to be used.
     :type data_loader: torch.utils.data.DataLoader
-    :param f1_func: The function to obtain F1 score.
-    :type f1_func: callable
-    :param er_func: The function to obtain error rate.
-    :type er_func: callable
+    :param f1_metric: The accumulator class for the F1 score.
+    :type f1_metric: callable
+    :param er_metric: The accumulator class for the error rate.
+    :type er_metric: callable
     :param device: The device to be used.
     :type device: str
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
+    :param trim_padding: Drop the leading frames that are padded\
+                         in all the examples of a batch?
+    :type trim_padding: bool
+    :param telemetry: The sink of the telemetry records (None for\
+                      printing them to the console).
+    :type telemetry: tools.telemetry.TelemetrySink|None
+    :param precision: The precision of the model (`float32`,\
+                      `bfloat16`, or `float16`).
+    :type precision: str
+    :return: The F1 score and the error rate.
+    :rtype: float, float
     """
+    telemetry = TelemetrySink([ConsolePrinter()]) if telemetry is None else telemetry
     start_time = time()
     model.eval()
     with no_grad():
-        _, _, true_values, hat_values = _sed_epoch(
+        _, _, f1_score, er_score, stats = _sed_epoch(
             model=model, data_loader=data_loader,
             objective=None, optimizer=None,
-            device=device, use_tf=use_tf,
-            is_testing=True
+            device=device, f1_metric=f1_metric,
+            er_metric=er_metric, use_tf=use_tf,
+            is_testing=True, trim_padding=trim_padding,
+            precision=precision
         )
-    end_time = time() - start_time
 
-    f1_score = f1_func(hat_values, true_values).mean()
-    er_score = er_func(hat_values, true_values).mean()
+    telemetry(make_record(
+        'testing', None, start_time, None, f1_score, er_score, stats, device))
 
-    print_evaluation_results(f1_score, er_score, end_time)
+    return float(f1_score), float(er_score)
 
 
-def training(model, data_loader_training, optimizer, objective, f1_func, er_func,
+class _Validator(object):
+    def __init__(self, data_loader, objective, f1_metric, er_metric,
+                 device, use_tf, trim_padding=False, precision='float32'):
+        """Validates a model, in the training process.
+
+        :param data_loader: The data loader to be used with\
+                            the validation data.
+        :type data_loader: torch.utils.data.DataLoader
+        :param objective: The objective function to be used.
+        :type objective: callable
+        :param f1_metric: The accumulator class for the F1 score.
+        :type f1_metric: callable
+        :param er_metric: The accumulator class for the error rate.
+        :type er_metric: callable
+        :param device: The device to be used.
+        :type device: str
+        :param use_tf: Do we use teacher forcing?
+        :type use_tf: bool
+        :param trim_padding: Drop the leading frames that are padded\
+                             in all the examples of a batch?
+        :type trim_padding: bool
+        :param precision: The precision of the model (`float32`,\
+                          `bfloat16`, or `float16`).
+        :type precision: str
+        """
+        super(_Validator, self).__init__()
+        self.data_loader = data_loader
+        self.objective = objective
+        self.f1_metric = f1_metric
+        self.er_metric = er_metric
+        self.device = device
+        self.use_tf = use_tf
+        self.trim_padding = trim_padding
+        self.precision = precision
+        self._ready = []
+
+    def submit(self, epoch, model):
+        """Validates the model.
+
+        :param epoch: The epoch.
+        :type epoch: int
+        :param model: The model.
+        :type model: torch.nn.Module
+        """
+        start_time = time()
+        model.eval()
+        with no_grad():
+            _, loss, f1_score, er_score, stats = _sed_epoch(
+                model=model, data_loader=self.data_loader,
+                objective=self.objective, optimizer=None,
+                device=self.device, f1_metric=self.f1_metric,
+                er_metric=self.er_metric, use_tf=self.use_tf,
+                is_testing=True, trim_padding=self.trim_padding,
+                precision=self.precision
+            )
+        self._ready.append((make_record(
+            'validation', epoch, start_time, loss.mean(), f1_score,
+            er_score, stats, self.device), model.state_dict()))
+
+    def results(self, wait=False):
+        """Returns the results of the finished validations, as\
+        tuples of the telemetry record of the validation and the\
+        state dict of the validated model.
+
+        :param wait: Wait for all the submitted validations?
+        :type wait: bool
+        :return: The results.
+        :rtype: list[tuple]
+        """
+        ready, self._ready = self._ready, []
+        return ready
+
+    def close(self):
+        """Stops the validations.
+        """
+        self._ready = []
+
+
+def _validation_worker(model_class, model_settings, data_loader_settings,
+                       device, use_tf, trim_padding, precision, nb_threads, tasks,
+                       results, cancelled):
+    """The process of :class:`_BackgroundValidator`.
+
+    :param model_class: The class of the model.
+    :type model_class: callable
+    :param model_settings: The settings of the model.
+    :type model_settings: dict
+    :param data_loader_settings: The settings of the data loader.
+    :type data_loader_settings: dict
+    :param device: The device to be used.
+    :type device: str
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param trim_padding: Drop the leading frames that are padded\
+                         in all the examples of a batch?
+    :type trim_padding: bool
+    :param precision: The precision of the model (`float32`,\
+                      `bfloat16`, or `float16`).
+    :type precision: str
+    :param nb_threads: The amount of threads for PyTorch\
+                       (None for the default).
+    :type nb_threads: int|None
+    :param tasks: The queue with the epochs and the state\
+                  dicts to validate, ending with None.
+    :type tasks: multiprocessing.Queue
+    :param results: The queue for the results.
+    :type results: multiprocessing.Queue
+    :param cancelled: Set when the pending validations are not needed.
+    :type cancelled: multiprocessing.Event
+    """
+    if nb_threads is not None:
+        set_num_threads(nb_threads)
+
+    model = model_class(**model_settings).to(device)
+    validator = _Validator(
+        data_loader=get_tut_sed_data_loader(
+            split='validation', **data_loader_settings, is_test=True),
+        objective=BCEWithLogitsLoss(reduction='none'),
+        f1_metric=F1PerFrameAccumulator, er_metric=ErrorRatePerFrameAccumulator,
+        device=device, use_tf=use_tf, trim_padding=trim_padding,
+        precision=precision)
+
+    for epoch, state_dict in iter(tasks.get, None):
+        if cancelled.is_set():
+            continue
+        model.load_state_dict(state_dict)
+        validator.submit(epoch, model)
+        results.put(validator.results()[0][0])
+
+
+class _BackgroundValidator(object):
+    def __init__(self, model_class, model_settings, data_loader_settings,
+                 device, use_tf, trim_padding=False, precision='float32',
+                 nb_threads=None, max_pending=2):
+        """Validates snapshots of a model in a separate process,\
+        while the training goes on.
+
+        :param model_class: The class of the model.
+        :type model_class: callable
+        :param model_settings: The settings of the model.
+        :type model_settings: dict
+        :param data_loader_settings: The settings of the data loader.
+        :type data_loader_settings: dict
+        :param device: The device to be used.
+        :type device: str
+        :param use_tf: Do we use teacher forcing?
+        :type use_tf: bool
+        :param trim_padding: Drop the leading frames that are padded\
+                             in all the examples of a batch?
+        :type trim_padding: bool
+        :param precision: The precision of the model (`float32`,\
+                          `bfloat16`, or `float16`).
+        :type precision: str
+        :param nb_threads: The amount of threads for PyTorch in the\
+                           validation process (None for the default).
+        :type nb_threads: int|None
+        :param max_pending: The maximum amount of snapshots waiting\
+                            for validation, before the training waits.
+        :type max_pending: int
+        """
+        super(_BackgroundValidator, self).__init__()
+        context = get_context('spawn')
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._cancelled = context.Event()
+        self._pending = OrderedDict()
+        self.max_pending = max_pending
+        self._process = context.Process(
+            target=_validation_worker, args=(
+                model_class, model_settings, data_loader_settings, device,
+                use_tf, trim_padding, precision, nb_threads, self._tasks,
+                self._results, self._cancelled))
+        self._process.start()
+
+    def submit(self, epoch, model):
+        """Sends a snapshot of the model for validation.
+
+        :param epoch: The epoch.
+        :type epoch: int
+        :param model: The model.
+        :type model: torch.nn.Module
+        """
+        state_dict = OrderedDict(
+            (k, v.detach().to('cpu', copy=True))
+            for k, v in model.state_dict().items())
+        self._pending[epoch] = state_dict
+        self._tasks.put((epoch, state_dict))
+
+    def _get(self, block):
+        """Gets a result from the validation process.
+
+        :param block: Wait for the result?
+        :type block: bool
+        :return: The result, or None if there is none ready.
+        :rtype: tuple|None
+        """
+        while True:
+            try:
+                return self._results.get(block=block, timeout=1. if block else None)
+            except Empty:
+                if not block:
+                    return None
+                if not self._process.is_alive():
+                    raise RuntimeError('The validation process stopped unexpectedly.')
+
+    def results(self, wait=False):
+        """Returns the results of the finished validations, as\
+        tuples of the telemetry record of the validation and the\
+        validated state dict. If there are more than\
+        `max_pending` snapshots waiting, waits for the oldest.
+
+        :param wait: Wait for all the submitted validations?
+        :type wait: bool
+        :return: The results.
+        :rtype: list[tuple]
+        """
+        ready = []
+        while len(self._pending) > 0:
+            result = self._get(block=wait or len(self._pending) > self.max_pending)
+            if result is None:
+                break
+            ready.append((result, self._pending.pop(result['epoch'])))
+        return ready
+
+    def close(self):
+        """Stops the validation process, dropping any\
+        pending validations.
+        """
+        self._cancelled.set()
+        self._tasks.put(None)
+        self._process.join()
+        self._pending.clear()
+
+
+def training(model, data_loader_training, optimizer, objective, f1_metric, er_metric,
              epochs, data_loader_validation, validation_patience, device, grad_norm,
-             use_tf=True):
+             use_tf=True, trim_padding=False, checkpoint_dir=None,
+             checkpoint_every=1, resume=False, background_saving=True,
+             validator=None, validate_every_n_epochs=1, telemetry=None,
+             profiler=None, precision='float32', tbptt_steps=None,
+             curriculum=None, accumulation_steps=1):
     """Optimizes an BREACNNModel model.
 
+    If `checkpoint_dir` is specified, a checkpoint with the model,\
+    the optimizer, the early stopping counters, and the states of\
+    the random number generators is saved there every\
+    `checkpoint_every` epochs, and the best model is saved every\
+    time the validation loss improves. With `resume`, the training\
+    continues from the epoch after the last checkpoint.
+
+    The best model is kept in a :class:`tools.checkpoints.ModelSnapshot`,\
+    i.e. in a reusable CPU buffer, and, with `background_saving`,\
+    it is saved on a background thread.
+
+    The model is validated every `validate_every_n_epochs` epochs\
+    and at the last epoch. If a `validator` is specified (e.g. a\
+    :class:`_BackgroundValidator`), the early stopping is decided\
+    from its results as they arrive, and validations that are\
+    still running when a checkpoint is saved are not part of it.
+
+    With `float16` precision, the objective is scaled with a\
+    :class:`torch.amp.GradScaler`, whose state is also part of\
+    the checkpoints.
+
+    With a `curriculum`, every epoch uses the data loader of the\
+    curriculum instead of `data_loader_training`, and the length\
+    of its sequences grows after the epochs. The validation\
+    always uses the full sequences, so its losses are comparable\
+    across the growths. The epochs without improvement are\
+    counted from the last growth, and the early stopping can\
+    happen only when the sequences are at their full length.
+
+    In data parallel training (i.e. if the default process group\
+    of :mod:`torch.distributed` is initialized), the model is\
+    wrapped in a :class:`torch.nn.parallel.DistributedDataParallel`\
+    for the training passes, and the results of every epoch are\
+    reduced over the processes, so all of them take the same early\
+    stopping decisions. The `iteration` of the model (i.e. the\
+    schedule of scheduled sampling) is synchronized after every\
+    epoch. Only the first process saves the checkpoints, with\
+    the states of the random number generators of all processes.
+
     :param model: The BREACNNModel model.
     :type model: torch.nn.Module
     :param data_loader_training: The data loader to be used with\
@@ -127,10 +736,10 @@ def training(model, data_loader_training, optimizer, objective, f1_func, er_func
     :type optimizer: torch.optim.Optimizer
     :param objective: The objective function to be used.
     :type objective: callable
-    :param f1_func: The function to calculate the F1 score.
-    :type f1_func: callable
-    :param er_func: The function to calculate the error rate.
-    :type er_func: callable
+    :param f1_metric: The accumulator class for the F1 score.
+    :type f1_metric: callable
+    :param er_metric: The accumulator class for the error rate.
+    :type er_metric: callable
     :param epochs: The maximum amount of epochs for training.
     :type epochs: int
     :param data_loader_validation:The data loader to be used with\
@@ -145,101 +754,628 @@ def training(model, data_loader_training, optimizer, objective, f1_func, er_func
     :type grad_norm: float
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
+    :param trim_padding: Drop the leading frames that are padded\
+                         in all the examples of a batch?
+    :type trim_padding: bool
+    :param checkpoint_dir: The directory for the checkpoints\
+                           (None for no checkpoints).
+    :type checkpoint_dir: pathlib.Path|str|None
+    :param checkpoint_every: The amount of epochs between checkpoints.
+    :type checkpoint_every: int
+    :param resume: Continue from the last checkpoint, if any?
+    :type resume: bool
+    :param background_saving: Save the best model on a background thread?
+    :type background_saving: bool
+    :param validator: The validator to be used (None for validating\
+                      with `data_loader_validation` in this process).
+    :type validator: _Validator|_BackgroundValidator|None
+    :param validate_every_n_epochs: The amount of epochs between validations.
+    :type validate_every_n_epochs: int
+    :param telemetry: The sink of the telemetry records (None for\
+                      printing them to the console).
+    :type telemetry: tools.telemetry.TelemetrySink|None
+    :param profiler: The profiler for the training steps (None\
+                     for no profiling).
+    :type profiler: torch.profiler.profile|None
+    :param precision: The precision of the model (`float32`,\
+                      `bfloat16`, or `float16`).
+    :type precision: str
+    :param tbptt_steps: The amount of frames between the truncations\
+                        of the back-propagation (None for no\
+                        truncation).
+    :type tbptt_steps: int|None
+    :param curriculum: The curriculum of the length of the training\
+                       sequences (None for no curriculum).
+    :type curriculum: data_feeders.SequenceLengthCurriculum|None
+    :param accumulation_steps: The amount of batches per optimizer\
+                               step, i.e. with accumulated gradients.
+    :type accumulation_steps: int
     :return: The optimized model.
     :rtype: torch.nn.Module
     """
-    best_model = None
+    best_model = ModelSnapshot(
+        file_path=None if checkpoint_dir is None or _rank() > 0
+        else Path(checkpoint_dir, 'best.pt'),
+        background_saving=background_saving)
     epochs_waiting = 100
     biggest_epoch_loss = 1e8
     best_model_epoch = -1
+    patience_start = -1
+    start_epoch = 0
+    stopped = False
 
-    for epoch in range(epochs):
-        start_time = time()
+    telemetry = TelemetrySink([ConsolePrinter()]) if telemetry is None else telemetry
+    grad_scaler = GradScaler(torch_device(device).type) \
+        if precision == 'float16' else None
 
-        model.train()
-        model, epoch_tr_loss, true_training, hat_training = _sed_epoch(
-            model=model, data_loader=data_loader_training,
-            objective=objective, optimizer=optimizer,
-            device=device, use_tf=use_tf, grad_norm=grad_norm
-        )
+    if validator is None:
+        validator = _Validator(
+            data_loader=data_loader_validation, objective=objective,
+            f1_metric=f1_metric, er_metric=er_metric, device=device,
+            use_tf=use_tf, trim_padding=trim_padding, precision=precision)
 
-        epoch_tr_loss = epoch_tr_loss.mean()
+    if checkpoint_dir is not None and resume:
+        checkpoint = load_checkpoint(Path(checkpoint_dir, 'last.pt'))
+        if checkpoint is not None:
+            model.load_state_dict(checkpoint['model'])
+            optimizer.load_state_dict(checkpoint['optimizer'])
+            if grad_scaler is not None and checkpoint.get('grad_scaler', None) is not None:
+                grad_scaler.load_state_dict(checkpoint['grad_scaler'])
+            for attribute, value in checkpoint['model_attributes'].items():
+                setattr(model, attribute, value)
+            if checkpoint['best_model'] is not None:
+                best_model.copy_from(checkpoint['best_model'], checkpoint['best_model_epoch'])
+            epochs_waiting = checkpoint['epochs_waiting']
+            biggest_epoch_loss = checkpoint['biggest_epoch_loss']
+            best_model_epoch = checkpoint['best_model_epoch']
+            patience_start = checkpoint.get('patience_start', -1)
+            if curriculum is not None and checkpoint.get('curriculum', None) is not None:
+                curriculum.load_state_dict(checkpoint['curriculum'])
+            rank_rng_states = checkpoint.get('rank_rng_states', None)
+            set_rng_states(
+                rank_rng_states[_rank()]
+                if rank_rng_states is not None and len(rank_rng_states) == _world_size()
+                else checkpoint['rng_states'])
+            stopped = checkpoint['stopped']
+            start_epoch = epochs if stopped else checkpoint['epoch'] + 1
+            print_msg('Resuming from the checkpoint of epoch {:3d}'.format(
+                checkpoint['epoch']), end='\n\n')
 
-        f1_score_training = f1_func(hat_training, true_training).mean()
-        error_rate_training = er_func(hat_training, true_training).mean()
+    def _early_stopping(results):
+        """Updates the early stopping with validation results.
 
-        model.eval()
-        with no_grad():
-            model, epoch_va_loss, true_validation, hat_validation = _sed_epoch(
-                model=model, data_loader=data_loader_validation,
-                objective=objective, optimizer=None,
-                device=device, use_tf=use_tf, is_testing=True
+        :param results: The results of the validator.
+        :type results: list[tuple]
+        :return: Stop the training?
+        :rtype: bool
+        """
+        nonlocal biggest_epoch_loss, epochs_waiting, best_model_epoch
+        for record, state_dict in results:
+            if record['loss'] < biggest_epoch_loss:
+                biggest_epoch_loss = record['loss']
+                epochs_waiting = 0
+                best_model.copy_from(state_dict, record['epoch'])
+                best_model_epoch = record['epoch']
+            else:
+                epochs_waiting = max(
+                    record['epoch'] - max(best_model_epoch, patience_start), 0)
+
+            telemetry(record)
+
+            if epochs_waiting >= validation_patience and \
+                    (curriculum is None or curriculum.at_max_len):
+                return True
+        return False
+
+    training_model = DistributedDataParallel(model) if _is_distributed() else model
+
+    if profiler is not None:
+        profiler.start()
+
+    try:
+        for epoch in range(start_epoch, epochs):
+            start_time = time()
+
+            if curriculum is not None:
+                data_loader_training = curriculum.data_loader()
+
+            if isinstance(data_loader_training.sampler, DistributedSampler):
+                data_loader_training.sampler.set_epoch(epoch)
+
+            model.train()
+            _, epoch_tr_loss, f1_score_training, error_rate_training, \
+                stats_training = _sed_epoch(
+                model=training_model, data_loader=data_loader_training,
+                objective=objective, optimizer=optimizer,
+                device=device, f1_metric=f1_metric, er_metric=er_metric,
+                use_tf=use_tf, grad_norm=grad_norm,
+                trim_padding=trim_padding, profiler=profiler,
+                precision=precision, grad_scaler=grad_scaler,
+                tbptt_steps=tbptt_steps, accumulation_steps=accumulation_steps
             )
 
-        epoch_va_loss = epoch_va_loss.mean()
+            if _is_distributed() and hasattr(model, 'iteration'):
+                iteration = tensor([model.iteration], dtype=float64)
+                distributed.all_reduce(iteration, op=distributed.ReduceOp.MAX)
+                model.iteration = int(iteration.item())
 
-        f1_score_validation = f1_func(hat_validation, true_validation).mean()
-        error_rate_validation = er_func(hat_validation, true_validation).mean()
+            validated = (epoch + 1) % validate_every_n_epochs == 0 or epoch + 1 == epochs
 
-        if epoch_va_loss < biggest_epoch_loss:
-            biggest_epoch_loss = epoch_va_loss
-            epochs_waiting = 0
-            best_model = deepcopy(model.state_dict())
-            best_model_epoch = epoch
-        else:
-            epochs_waiting += 1
-
-        end_time = time() - start_time
-
-        print_training_results(
-            epoch=epoch, training_loss=epoch_tr_loss,
-            validation_loss=epoch_va_loss,
-            training_f1=f1_score_training,
-            training_er=error_rate_training,
-            validation_f1=f1_score_validation,
-            validation_er=error_rate_validation,
-            time_elapsed=end_time
-        )
+            telemetry(make_record(
+                'training', epoch, start_time, epoch_tr_loss.mean(),
+                f1_score_training, error_rate_training, stats_training, device,
+                validated=validated,
+                scheduled_sampling=model.scheduled_sampling()
+                if getattr(model, 'batch_counter', 0) > 0 else None,
+                seq_len=None if curriculum is None else curriculum.seq_len))
+
+            if validated:
+                validator.submit(epoch, model)
+
+            stopped = _early_stopping(validator.results())
+
+            if curriculum is not None and not stopped and \
+                    curriculum.step(epoch, epochs_waiting):
+                epochs_waiting, patience_start = 0, epoch
+                print_msg('Length of the training sequences: {:5d}'.format(
+                    curriculum.seq_len), start='\n-- ', end='\n\n')
+
+            checkpointing = checkpoint_dir is not None and \
+                ((epoch + 1) % checkpoint_every == 0 or stopped or epoch + 1 == epochs)
 
-        if epochs_waiting >= validation_patience:
-            print_msg(
-                'Early stopping! Lowest validation loss: {:7.3f} at epoch: {:3d}'.format(
-                    biggest_epoch_loss, best_model_epoch
-                ), start='\n-- ', end='\n\n')
-            break
+            rank_rng_states = None
+            if checkpointing and _is_distributed():
+                rank_rng_states = [None] * _world_size()
+                distributed.all_gather_object(rank_rng_states, get_rng_states())
 
-    if best_model is not None:
-        model.load_state_dict(best_model)
+            if checkpointing and _rank() == 0:
+                save_checkpoint({
+                    'model': model.state_dict(),
+                    'optimizer': optimizer.state_dict(),
+                    'grad_scaler': None if grad_scaler is None else grad_scaler.state_dict(),
+                    'model_attributes': {
+                        attribute: getattr(model, attribute)
+                        for attribute in _model_attributes if hasattr(model, attribute)},
+                    'best_model': best_model.state_dict(),
+                    'epochs_waiting': epochs_waiting,
+                    'biggest_epoch_loss': biggest_epoch_loss,
+                    'best_model_epoch': best_model_epoch,
+                    'patience_start': patience_start,
+                    'curriculum': None if curriculum is None else curriculum.state_dict(),
+                    'rng_states': get_rng_states(),
+                    'rank_rng_states': rank_rng_states,
+                    'epoch': epoch,
+                    'stopped': stopped}, Path(checkpoint_dir, 'last.pt'))
+
+            if stopped:
+                break
+
+        if not stopped:
+            stopped = _early_stopping(validator.results(wait=True))
+    finally:
+        validator.close()
+        if profiler is not None:
+            profiler.stop()
+        telemetry.flush()
+
+    if stopped:
+        print_msg(
+            'Early stopping! Lowest validation loss: {:7.3f} at epoch: {:3d}'.format(
+                biggest_epoch_loss, best_model_epoch
+            ), start='\n-- ', end='\n\n')
+
+    best_model.close()
+
+    if best_model.state_dict() is not None:
+        model.load_state_dict(best_model.state_dict())
 
     return model
 
 
-def experiment(settings, model_class, use_tf):
+def _available_memory(device):
+    """Returns the memory that is available for the training.
+
+    :param device: The device to be used.
+    :type device: str
+    :return: The available memory, in bytes.
+    :rtype: int
+    """
+    if torch_device(device).type == 'cuda':
+        empty_cache()
+        return mem_get_info(device)[0]
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for line in meminfo:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return sysconf('SC_PAGE_SIZE') * sysconf('SC_AVPHYS_PAGES')
+
+
+def _step_memory(model, x, y, device, use_tf, precision):
+    """Does a forward and a backward pass and returns the memory\
+    that they need. On GPU, it is the peak of the allocated memory\
+    and, else, the memory of the tensors kept for the backward pass.
+
+    :param model: The model.
+    :type model: torch.nn.Module
+    :param x: The input features.
+    :type x: torch.Tensor
+    :param y: The target values.
+    :type y: torch.Tensor
+    :param device: The device to be used.
+    :type device: str
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param precision: The precision of the model.
+    :type precision: str
+    :return: The memory, in bytes.
+    :rtype: int
+    """
+    on_gpu = torch_device(device).type == 'cuda'
+
+    def _step():
+        with _autocast(device, precision):
+            y_hat = model(x, y) if use_tf else model(x)
+        y_hat.float().mean().backward()
+
+    if on_gpu:
+        reset_peak_memory_stats(device)
+        start = memory_allocated(device)
+
+    saved_memory = _saved_tensors_memory(_step)
+
+    model.zero_grad(set_to_none=True)
+
+    if on_gpu:
+        return max_memory_allocated(device) - start
+    return saved_memory
+
+
+def _saved_tensors_memory(fn):
+    """Calls a callable and returns the memory of the tensors\
+    that autograd keeps for the backward pass while it runs.\
+    Tensors that share storage are counted once.
+
+    :param fn: The callable, e.g. doing a forward and a backward pass.
+    :type fn: callable
+    :return: The memory of the saved tensors, in bytes.
+    :rtype: int
+    """
+    storages = {}
+
+    def _pack(t):
+        storage = t.untyped_storage()
+        storages[storage.data_ptr()] = storage.nbytes()
+        return t
+
+    with saved_tensors_hooks(_pack, lambda t: t):
+        fn()
+
+    return sum(storages.values())
+
+
+def _find_batch_size(model, data_loader, device, use_tf, precision,
+                     max_batch_size, memory_fraction=.8, seq_len=None):
+    """Finds the largest batch size that fits in memory for a\
+    training step of a model.
+
+    The memory of a step is measured with one and with two\
+    examples of the data loader, and extrapolated linearly to\
+    `memory_fraction` of the available memory. On GPU, the\
+    found batch size is also tried, halving it while it runs\
+    out of memory. The model, its attributes, and the random\
+    number generators are restored afterwards.
+
+    :param model: The model.
+    :type model: torch.nn.Module
+    :param data_loader: The training data loader.
+    :type data_loader: torch.utils.data.DataLoader
+    :param device: The device to be used.
+    :type device: str
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param precision: The precision of the model.
+    :type precision: str
+    :param max_batch_size: The largest batch size to consider.
+    :type max_batch_size: int
+    :param memory_fraction: The fraction of the available memory\
+                            to use.
+    :type memory_fraction: float
+    :param seq_len: The length of the sequences to measure with,\
+                    repeating the example of the data loader in time\
+                    (None for the length of the data loader), e.g.\
+                    the full length of a curriculum.
+    :type seq_len: int|None
+    :return: The batch size.
+    :rtype: int
+    """
+    x, y, _ = next(iter(data_loader))
+    x, y = x[:1].to(device), y[:1].to(device)
+
+    if seq_len is not None:
+        repeats = -(-seq_len // x.size(1))
+        x, y = x.repeat(1, repeats, 1)[:, :seq_len], y.repeat(1, repeats, 1)[:, :seq_len]
+
+    rng_states = get_rng_states()
+    model_state = {k: v.clone() for k, v in model.state_dict().items()}
+    attributes = {a: getattr(model, a) for a in _model_attributes if hasattr(model, a)}
+    model.train()
+
+    try:
+        # The scheduled sampling needs the batch counter, which
+        # is set after the batch size is found.
+        if hasattr(model, 'batch_counter'):
+            model.batch_counter = max(len(data_loader), 1)
+
+        memory_1 = _step_memory(model, x, y, device, use_tf, precision)
+        memory_2 = _step_memory(
+            model, x.repeat(2, 1, 1), y.repeat(2, 1, 1), device, use_tf, precision)
+        per_example = max(memory_2 - memory_1, 1)
+
+        batch_size = int((_available_memory(device) * memory_fraction -
+                          memory_1 + per_example) // per_example)
+        batch_size = min(max(batch_size, 1), max_batch_size)
+
+        if torch_device(device).type == 'cuda':
+            while batch_size > 1:
+                try:
+                    _step_memory(
+                        model, x.expand(batch_size, -1, -1), y.expand(batch_size, -1, -1),
+                        device, use_tf, precision)
+                    break
+                except OutOfMemoryError:
+                    model.zero_grad(set_to_none=True)
+                    empty_cache()
+                    batch_size //= 2
+    finally:
+        model.load_state_dict(model_state)
+        for attribute, value in attributes.items():
+            setattr(model, attribute, value)
+        set_rng_states(rng_states)
+
+    return batch_size
+
+
+def _run_name(settings, use_tf):
+    """Returns the name of a run, for its checkpoints.
+
+    The name ends with a short hash of the settings of the\
+    model and the optimizer, so that runs with different\
+    hyper-parameters do not share their checkpoints.
+
+    :param settings: The settings.
+    :type settings: dict
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :return: The name of the run.
+    :rtype: str
+    """
+    data_settings = settings['data_loader']
+    name = [str(data_settings['data_version'])]
+    if data_settings.get('scene', None):
+        name.append(data_settings['scene'])
+    if data_settings.get('data_fold', None) is not None:
+        name.append('fold_{}'.format(data_settings['data_fold']))
+    name.append('tf' if use_tf else 'baseline')
+
+    hyper_parameters = {
+        section: settings.get(section, None) for section in
+        ['sed_model', 'tf' if use_tf else 'baseline', 'optimizer']}
+    name.append(sha1(json.dumps(
+        hyper_parameters, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:8])
+
+    return '_'.join(name)
+
+
+def _data_parallel_process(rank, world_size, init_method, nb_threads,
+                           settings, model_class, use_tf, resume):
+    """One of the processes of :func:`_data_parallel_experiment`.
+
+    :param rank: The rank of the process.
+    :type rank: int
+    :param world_size: The amount of processes.
+    :type world_size: int
+    :param init_method: The URL for initializing the process group.
+    :type init_method: str
+    :param nb_threads: The amount of threads for PyTorch.
+    :type nb_threads: int
+    :param settings: The settings.
+    :type settings: dict
+    :param model_class: The class of the model.
+    :type model_class: callable
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param resume: Continue from the last checkpoint, if any?
+    :type resume: bool
+    :return: The F1 score and the error rate on the testing data.
+    :rtype: float, float
+    """
+    set_num_threads(nb_threads)
+
+    # Only the first process prints.
+    if rank > 0:
+        sys.stdout = open(devnull, 'w')
+
+    distributed.init_process_group(
+        'gloo', init_method=init_method, rank=rank, world_size=world_size)
+
+    # The processes start from the same weights (the ones of the
+    # first process), but need different dropout masks and draws
+    # of scheduled sampling.
+    manual_seed(initial_seed() + rank)
+
+    try:
+        return experiment(settings, model_class, use_tf=use_tf, resume=resume)
+    finally:
+        distributed.destroy_process_group()
+
+
+def _data_parallel_experiment(settings, model_class, use_tf, resume, nb_processes):
+    """Does the experiment with data parallel training, in\
+    processes that communicate with the gloo backend of\
+    :mod:`torch.distributed`. The threads of PyTorch are\
+    divided among the processes.
+
+    :param settings: The settings.
+    :type settings: dict
+    :param model_class: The class of the model.
+    :type model_class: callable
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param resume: Continue from the last checkpoint, if any?
+    :type resume: bool
+    :param nb_processes: The amount of processes.
+    :type nb_processes: int
+    :return: The F1 score and the error rate on the testing data.
+    :rtype: float, float
+    """
+    with socket() as a_socket:
+        a_socket.bind(('127.0.0.1', 0))
+        init_method = 'tcp://127.0.0.1:{}'.format(a_socket.getsockname()[1])
+
+    nb_threads = max(get_num_threads() // nb_processes, 1)
+
+    print_msg('Running {} data parallel processes, with {} threads each.'.format(
+        nb_processes, nb_threads), end='\n\n')
+
+    process = partial(
+        _data_parallel_process, world_size=nb_processes, init_method=init_method,
+        nb_threads=nb_threads, settings=settings, model_class=model_class,
+        use_tf=use_tf, resume=resume)
+
+    with ProcessPoolExecutor(max_workers=nb_processes,
+                             mp_context=get_context('spawn')) as executor:
+        results = list(executor.map(process, range(nb_processes)))
+
+    return results[0]
+
+
+def experiment(settings, model_class, use_tf, resume=False):
     """Does the experiment with the specified settings and model.
 
+    With more than one `data_parallel_processes` in the global\
+    settings, the experiment is done with data parallel training\
+    (see :func:`training`), in that many processes.
+
     :param settings: The settings.
     :type settings: dict
     :param model_class: The class of the model.
     :type model_class: callable
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
+    :param resume: Continue from the last checkpoint, if any?
+    :type resume: bool
+    :return: The F1 score and the error rate on the testing data.
+    :rtype: float, float
     """
+    if resume and settings['training'].get('checkpoint_dir', None) is None:
+        raise ValueError('Resuming needs the `checkpoint_dir` of the training settings.')
+    if settings['training'].get('curriculum_start_len', None) is not None and \
+            settings['data_loader'].get('seq_len', None) is None:
+        raise ValueError('The sequence length curriculum needs the `seq_len` '
+                         'of the data loader settings.')
+
+    nb_processes = settings.get('global', {}).get('data_parallel_processes', 1) or 1
+    if nb_processes > 1 and not _is_distributed():
+        return _data_parallel_experiment(
+            settings, model_class, use_tf, resume, nb_processes)
+
+    if _is_distributed():
+        if settings['training'].get('background_validation', False):
+            raise ValueError('Data parallel training does not support '
+                             '`background_validation`.')
+        settings = dict(settings, data_loader=dict(
+            settings['data_loader'], num_replicas=_world_size(), rank=_rank()))
+
     device = 'cuda' if is_available() else 'cpu'
     inform_about_device(device)
 
     with InformAboutProcess('Creating the model'):
-        model_settings = settings['sed_model']
-        if use_tf:
-            model_settings.update(settings['tf'])
+        model_settings = dict(settings['sed_model'])
+        model_settings.update(
+            settings['tf'] if use_tf else settings.get('baseline', {}))
         model = model_class(**model_settings)
         model = model.to(device)
 
-    with InformAboutProcess('Creating training data loader'):
-        training_data = get_tut_sed_data_loader(
+    # With a curriculum, only the data loader of the current
+    # length of the sequences is made.
+    curriculum = None
+    if settings['training'].get('curriculum_start_len', None) is not None:
+        max_len = settings['data_loader']['seq_len']
+
+        def _training_data(seq_len):
+            """Makes the training data loader for a sequence length,\
+            with the hop scaled as the length.
+
+            :param seq_len: The sequence length.
+            :type seq_len: int
+            :return: The data loader.
+            :rtype: torch.utils.data.DataLoader
+            """
+            data_settings = dict(settings['data_loader'], seq_len=seq_len)
+            if data_settings.get('hop', None) is not None:
+                data_settings['hop'] = max(data_settings['hop'] * seq_len // max_len, 1)
+            return get_tut_sed_data_loader(split='training', **data_settings, is_test=False)
+
+        curriculum = SequenceLengthCurriculum(
+            make_data_loader=_training_data, max_len=max_len,
+            start_len=settings['training']['curriculum_start_len'],
+            growth_factor=settings['training'].get('curriculum_growth_factor', 2.),
+            every_n_epochs=settings['training'].get('curriculum_every_n_epochs', None),
+            patience=settings['training'].get('curriculum_patience', None))
+
+    def _make_training_data():
+        """Makes the training data loader, with the current settings.
+
+        :return: The data loader.
+        :rtype: torch.utils.data.DataLoader
+        """
+        if curriculum is not None:
+            curriculum.reset_data_loader()
+            return curriculum.data_loader()
+        return get_tut_sed_data_loader(
             split='training', **settings['data_loader'],
             is_test=False
         )
 
+    with InformAboutProcess('Creating training data loader'):
+        training_data = _make_training_data()
+
+    # In data parallel training, the effective batch size is
+    # divided among the processes.
+    effective_batch_size = settings['training'].get('effective_batch_size', None)
+    effective_batch_size = settings['data_loader']['batch_size'] \
+        if effective_batch_size is None else ceil(effective_batch_size / _world_size())
+    batch_size = settings['data_loader']['batch_size']
+
+    if settings['training'].get('find_batch_size', False):
+        with InformAboutProcess('Finding the batch size'):
+            batch_size = _find_batch_size(
+                model=model, data_loader=training_data, device=device, use_tf=use_tf,
+                precision=settings['training'].get('precision', 'float32'),
+                max_batch_size=effective_batch_size,
+                memory_fraction=settings['training'].get('memory_fraction', .8) /
+                _world_size(), seq_len=None if curriculum is None else curriculum.max_len)
+
+        if _is_distributed():
+            min_batch_size = tensor([batch_size])
+            distributed.all_reduce(min_batch_size, op=distributed.ReduceOp.MIN)
+            batch_size = int(min_batch_size.item())
+
+    # The batches are made as equal as possible for the amount
+    # of accumulation steps that reaches the effective batch size.
+    accumulation_steps = ceil(effective_batch_size / batch_size)
+    batch_size = ceil(effective_batch_size / accumulation_steps)
+
+    if batch_size != settings['data_loader']['batch_size']:
+        settings = dict(settings, data_loader=dict(
+            settings['data_loader'], batch_size=batch_size))
+        with InformAboutProcess('Re-creating training data loader'):
+            del training_data
+            training_data = _make_training_data()
+
     with InformAboutProcess('Creating validation data loader'):
         validation_data = get_tut_sed_data_loader(
             split='validation', **settings['data_loader'],
@@ -251,21 +1387,33 @@ def experiment(settings, model_class, use_tf):
 
     if use_tf:
         with InformAboutProcess('Setting the teacher forcing batch counter'):
-            model.batch_counter = len(training_data)
+            # The scheduled sampling is scaled with the batches
+            # of the sequences at their full length.
+            model.batch_counter = len(training_data) if curriculum is None else \
+                max(round(len(training_data) * curriculum.seq_len / curriculum.max_len), 1)
 
     print_msg('', start='')
 
     common_kwargs = {
-        'f1_func': f1_per_frame,
-        'er_func': error_rate_per_frame,
+        'f1_metric': F1PerFrameAccumulator,
+        'er_metric': ErrorRatePerFrameAccumulator,
         'device': device,
-        'use_tf': use_tf
+        'use_tf': use_tf,
+        'trim_padding': settings['data_loader'].get('group_by_length', False),
+        'telemetry': TelemetrySink([ConsolePrinter()]),
+        'precision': settings['training'].get('precision', 'float32')
     }
 
+    telemetry_dir = settings['training'].get('telemetry_dir', None)
+    if telemetry_dir is not None and _rank() == 0:
+        common_kwargs['telemetry'].consumers.append(JSONLWriter(Path(
+            telemetry_dir, '{}.jsonl'.format(_run_name(settings, use_tf)))))
+
     len_m = max([
         len('Training examples/batches'),
         len('Validation examples/batches'),
-        len('Testing examples/batches')
+        len('Testing examples/batches'),
+        len('Batch size/accumulation steps')
     ])
 
     print_msg('{m:<{len_m}}: {d1:5d} /{d2:5d}'.format(
@@ -275,6 +1423,13 @@ def experiment(settings, model_class, use_tf):
         len_m=len_m
     ))
 
+    print_msg('{m:<{len_m}}: {d1:5d} x{d2:5d}'.format(
+        m='Batch size/accumulation steps',
+        d1=batch_size,
+        d2=accumulation_steps,
+        len_m=len_m
+    ))
+
     print_msg('{m:<{len_m}}: {d1:5d} /{d2:5d}'.format(
         m='Validation examples/batches',
         d1=len(validation_data) * settings['data_loader']['batch_size'],
@@ -282,18 +1437,46 @@ def experiment(settings, model_class, use_tf):
         len_m=len_m
     ), end='\n\n')
 
+    checkpoint_dir = settings['training'].get('checkpoint_dir', None)
+    if checkpoint_dir is not None:
+        checkpoint_dir = Path(checkpoint_dir, _run_name(settings, use_tf))
+
+    validator = None
+    if settings['training'].get('background_validation', False):
+        with InformAboutProcess('Starting the background validation process'):
+            validator = _BackgroundValidator(
+                model_class=model_class, model_settings=model_settings,
+                data_loader_settings=settings['data_loader'], device=device,
+                use_tf=use_tf, trim_padding=common_kwargs['trim_padding'],
+                precision=common_kwargs['precision'],
+                nb_threads=settings['training'].get('validation_threads', None))
+
+    profiler = None
+    if settings.get('profiling', None) is not None and _rank() == 0:
+        profiler = make_profiler(
+            run_name=_run_name(settings, use_tf), **settings['profiling'])
+
     print_msg('Starting training', start='\n\n-- ', end='\n\n')
 
     optimized_model = training(
         model=model, data_loader_training=training_data,
-        optimizer=optimizer, objective=BCEWithLogitsLoss(),
+        optimizer=optimizer, objective=BCEWithLogitsLoss(reduction='none'),
         epochs=settings['training']['epochs'],
         data_loader_validation=validation_data,
         validation_patience=settings['training']['validation_patience'],
-        grad_norm=settings['training']['grad_norm'], **common_kwargs
+        grad_norm=settings['training']['grad_norm'],
+        checkpoint_dir=checkpoint_dir,
+        checkpoint_every=settings['training'].get('checkpoint_every', 1),
+        resume=resume,
+        background_saving=settings['training'].get('background_saving', True),
+        validator=validator, profiler=profiler, curriculum=curriculum,
+        validate_every_n_epochs=settings['training'].get('validate_every_n_epochs', 1),
+        tbptt_steps=settings['training'].get('tbptt_steps', None),
+        accumulation_steps=accumulation_steps,
+        **common_kwargs
     )
 
-    del training_data
+    del training_data, curriculum
 
     if settings['data_loader']['data_version'] == 'synthetic':
         del validation_data
@@ -313,11 +1496,15 @@ def experiment(settings, model_class, use_tf):
         testing_data = validation_data
 
     print_msg('Starting testing', start='\n\n-- ', end='\n\n')
-    testing(
+    f1_score, er_score = testing(
         model=optimized_model, data_loader=testing_data,
         **common_kwargs
     )
 
+    common_kwargs['telemetry'].close()
+
     print_msg('That\'s all!', start='\n\n-- ', end='\n\n')
 
+    return f1_score, er_score
+
 # EOF
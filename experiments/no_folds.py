@@ -3,7 +3,8 @@
 
 from models import CRNN, TFCRNN
 from tools.printing import print_msg, print_date_and_time
-from tools.various import get_argument_parser, CheckAllNone
+from tools.various import get_argument_parser, CheckAllNone, \
+    get_profiling_settings
 from tools.file_io import load_settings_file
 
 from ._processes import experiment
@@ -14,7 +15,8 @@ __all__ = ['do_process']
 
 
 @CheckAllNone()
-def do_process(settings_path=None, settings=None, use_tf=False):
+def do_process(settings_path=None, settings=None, use_tf=False, resume=False,
+               profiling=None):
     """The process of the baseline experiment.
 
     :param settings_path: The path for the settings.
@@ -23,16 +25,24 @@ def do_process(settings_path=None, settings=None, use_tf=False):
     :type settings: dict|None
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
+    :param resume: Continue from the last checkpoints, if any?
+    :type resume: bool
+    :param profiling: The profiling settings (None for keeping\
+                      the ones in the settings, if any).
+    :type profiling: dict|None
     """
     if settings_path is not None:
         settings = load_settings_file(settings_path)
 
+    if profiling is not None:
+        settings['profiling'] = profiling
+
     model = TFCRNN if use_tf else CRNN
 
     if not use_tf:
         print_msg('Baseline experiment')
     print_msg('Starting experiment without folds', end='\n\n')
-    experiment(settings, model, use_tf=use_tf)
+    experiment(settings, model, use_tf=use_tf, resume=resume)
 
 
 def main():
@@ -41,7 +51,8 @@ def main():
     arg_parser = get_argument_parser()
     args = arg_parser.parse_args()
 
-    do_process(args.config_file, use_tf=not args.baseline)
+    do_process(args.config_file, use_tf=not args.baseline, resume=args.resume,
+               profiling=get_profiling_settings(args))
 
 
 if __name__ == '__main__':
@@ -1,11 +1,18 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from copy import deepcopy
 from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from torch import set_num_threads
 
 from models import CRNN, TFCRNN
-from tools.printing import print_msg, print_date_and_time
-from tools.various import CheckAllNone, get_argument_parser
+from tools.printing import print_msg, print_date_and_time, \
+    print_folds_results
+from tools.various import CheckAllNone, get_argument_parser, \
+    get_profiling_settings
 from tools.file_io import load_settings_file
 
 from ._processes import experiment
@@ -15,8 +22,38 @@ __docformat__ = 'reStructuredText'
 __all__ = ['do_process']
 
 
+def _fold_process(settings, fold, use_tf, nb_threads=None, resume=False):
+    """Does the experiment for one fold.
+
+    :param settings: The settings to be used.
+    :type settings: dict
+    :param fold: The fold.
+    :type fold: int
+    :param use_tf: Do we use teacher forcing?
+    :type use_tf: bool
+    :param nb_threads: The amount of threads for PyTorch\
+                       (None for the default).
+    :type nb_threads: int|None
+    :param resume: Continue from the last checkpoint, if any?
+    :type resume: bool
+    :return: The F1 score and the error rate on the testing data.
+    :rtype: float, float
+    """
+    if nb_threads is not None:
+        set_num_threads(nb_threads)
+
+    settings = deepcopy(settings)
+    settings['data_loader'].update({'data_fold': fold})
+
+    model = TFCRNN if use_tf else CRNN
+
+    print_msg('Fold {}'.format(fold), decorate_prv='*', decorate_nxt='*', end='\n\n')
+    return experiment(settings, model, use_tf=use_tf, resume=resume)
+
+
 @CheckAllNone()
-def do_process(settings_path=None, settings=None, use_tf=False):
+def do_process(settings_path=None, settings=None, use_tf=False, resume=False,
+               profiling=None):
     """The process of the experiment for the proposed method.
 
     :param settings_path: The path for the settings.
@@ -25,23 +62,43 @@ def do_process(settings_path=None, settings=None, use_tf=False):
     :type settings: dict|None
     :param use_tf: Do we use teacher forcing?
     :type use_tf: bool
-    :param use_tf: Do we use teacher forcing?
-    :type use_tf: bool
+    :param resume: Continue from the last checkpoints, if any?
+    :type resume: bool
+    :param profiling: The profiling settings (None for keeping\
+                      the ones in the settings, if any).
+    :type profiling: dict|None
+    :return: The F1 score and the error rate of each fold.
+    :rtype: dict[int, (float, float)]
     """
     if settings_path is not None:
         settings = load_settings_file(settings_path)
 
-    model = TFCRNN if use_tf else CRNN
+    if profiling is not None:
+        settings['profiling'] = profiling
+
+    folds = settings['global'].get('folds', [3, 4])
+    parallel_folds = settings['global'].get('parallel_folds', 1) or 1
+    nb_threads = settings['global'].get('threads_per_fold', None)
 
     if not use_tf:
         print_msg('Baseline experiment')
     print_msg('Starting experiment with folds', end='\n\n')
-    p_print = partial(print_msg, decorate_prv='*', decorate_nxt='*', end='\n\n')
 
-    for i in range(2, 4):
-        settings['data_loader'].update({'data_fold': i + 1})
-        p_print('Fold {}'.format(i + 1))
-        experiment(settings, model, use_tf=use_tf)
+    fold_process = partial(
+        _fold_process, settings, use_tf=use_tf,
+        nb_threads=nb_threads, resume=resume)
+
+    if parallel_folds == 1:
+        folds_results = {fold: fold_process(fold) for fold in folds}
+    else:
+        print_msg('Running {} folds at the same time.'.format(parallel_folds), end='\n\n')
+        with ProcessPoolExecutor(max_workers=parallel_folds,
+                                 mp_context=get_context('spawn')) as executor:
+            folds_results = dict(zip(folds, executor.map(fold_process, folds)))
+
+    print_folds_results(folds_results)
+
+    return folds_results
 
 
 def main():
@@ -50,7 +107,8 @@ def main():
     arg_parser = get_argument_parser()
     args = arg_parser.parse_args()
 
-    do_process(args.config_file, use_tf=not args.baseline)
+    do_process(args.config_file, use_tf=not args.baseline, resume=args.resume,
+               profiling=get_profiling_settings(args))
 
 
 if __name__ == '__main__':
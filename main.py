@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from tools.printing import print_date_and_time, print_yaml_settings
-from tools.various import get_argument_parser
+from tools.various import get_argument_parser, get_profiling_settings
 from tools.file_io import load_settings_file
 from experiments.with_folds import do_process as with_folds_process
 from experiments.no_folds import do_process as no_folds_process
@@ -21,12 +21,14 @@ def main():
     args = arg_parser.parse_args()
 
     settings = load_settings_file(args.config_file)
+    settings['profiling'] = get_profiling_settings(args)
     print_yaml_settings(settings)
 
     experiment_process = with_folds_process if settings['global']['has_folds'] \
         else no_folds_process
 
-    experiment_process(settings=settings, use_tf=not args.baseline)
+    experiment_process(settings=settings, use_tf=not args.baseline,
+                       resume=args.resume)
 
 
 if __name__ == '__main__':
@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from . import backends
+from . import checkpointing
 from . import dnn
+from . import recurrent
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
-__all__ = ['dnn']
+__all__ = ['backends', 'checkpointing', 'dnn', 'recurrent']
 
 # EOF
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from torch.cuda import OutOfMemoryError
+
+from tools.printing import print_msg
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['CompiledLoop', 'compile_backends']
+
+
+def _torchscript(make_loop, step):
+    """Compiles the whole loop with TorchScript.
+
+    :param make_loop: The function that creates the loop.
+    :type make_loop: callable
+    :param step: The step of the loop.
+    :type step: callable
+    :return: The scripted loop.
+    :rtype: callable
+    """
+    from torch.jit import script
+    return script(make_loop(step))
+
+
+def _torch_compile(make_loop, step):
+    """Compiles the step of the loop with `torch.compile`. The\
+    loop itself stays in Python, since unrolling it for\
+    compilation takes minutes for 1024 steps.
+
+    :param make_loop: The function that creates the loop.
+    :type make_loop: callable
+    :param step: The step of the loop.
+    :type step: callable
+    :return: The loop with the compiled step.
+    :rtype: callable
+    """
+    from torch import compile as torch_compile
+    return make_loop(torch_compile(step))
+
+
+def _torchscript_errors():
+    """Returns the errors of scripting a loop, i.e. the\
+    unsupported Python constructs and the type errors.
+
+    :return: The errors.
+    :rtype: tuple[type]
+    """
+    from torch.jit.frontend import FrontendError
+    return FrontendError, RuntimeError
+
+
+def _torch_compile_errors():
+    """Returns the errors of tracing and compiling a step\
+    with `torch.compile`, which happen at its first call.
+
+    :return: The errors.
+    :rtype: tuple[type]
+    """
+    from torch._dynamo.exc import TorchDynamoException
+    return (TorchDynamoException, )
+
+
+compile_backends = {
+    'none': None,
+    'torchscript': _torchscript,
+    'torch_compile': _torch_compile}
+
+# The errors that make the loop fall back to eager mode, when
+# compiling it and when calling the compiled loop.
+_compile_errors = {
+    'torchscript': _torchscript_errors,
+    'torch_compile': lambda: (RuntimeError, )}
+_call_errors = {
+    'torchscript': lambda: (),
+    'torch_compile': _torch_compile_errors}
+
+
+def _out_of_memory(error):
+    """Returns the out of memory error that caused an error,\
+    if any (e.g. an out of memory error during the compilation\
+    of `torch.compile`).
+
+    :param error: The error.
+    :type error: Exception
+    :return: The out of memory error (None if there is none).
+    :rtype: torch.cuda.OutOfMemoryError|None
+    """
+    while error is not None:
+        if isinstance(error, OutOfMemoryError):
+            return error
+        error = getattr(error, 'inner_exception', None) or error.__cause__
+    return None
+
+
+class CompiledLoop(object):
+
+    def __init__(self, make_loop, step, backend='none'):
+        """A recurrent loop, compiled with the specified backend.
+
+        If compilation fails (for `torch_compile`, also at the\
+        first calls of the compiled loop), an informative message\
+        is printed and the eager loop is used from then on. Any\
+        other error, and every out of memory error, is raised.
+
+        :param make_loop: The function that creates the loop\
+                          from its step.
+        :type make_loop: callable
+        :param step: The step of the loop.
+        :type step: callable
+        :param backend: The backend, one of `none`, `torchscript`,\
+                        and `torch_compile`.
+        :type backend: str
+        """
+        super(CompiledLoop, self).__init__()
+
+        if backend not in compile_backends:
+            raise ValueError('Unknown compile backend `{}`. Accepted values are: {}.'.format(
+                backend, ', '.join(compile_backends.keys())))
+
+        self.backend = backend
+        self.name = step.__name__
+        self.loop = make_loop(step)
+        self.compiled_loop = None
+
+        if compile_backends[backend] is not None:
+            try:
+                self.compiled_loop = compile_backends[backend](make_loop, step)
+            except _compile_errors[backend]() as e:
+                self._fall_back(e)
+
+    def _fall_back(self, error):
+        """Switches to the eager loop, unless the error is\
+        (or is caused by) an out of memory error, which is raised.
+
+        :param error: The error that caused the fall back.
+        :type error: Exception
+        """
+        out_of_memory = _out_of_memory(error)
+        if out_of_memory is not None:
+            raise out_of_memory
+
+        msg = str(error).strip().splitlines()
+        print_msg('Compiling `{}` with `{}` failed ({}: {}). Using eager mode.'.format(
+            self.name, self.backend, type(error).__name__,
+            msg[0] if len(msg) > 0 else ''))
+        self.compiled_loop = None
+
+    def __call__(self, *args):
+        if self.compiled_loop is not None:
+            try:
+                return self.compiled_loop(*args)
+            except _call_errors[self.backend]() as e:
+                self._fall_back(e)
+        return self.loop(*args)
+
+# EOF
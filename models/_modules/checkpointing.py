@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager, nullcontext
+
+from torch import cat, is_grad_enabled
+from torch.nn.modules.batchnorm import _BatchNorm
+from torch.utils.checkpoint import checkpoint
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['frozen_batch_norm_statistics', 'checkpointed_module',
+           'checkpointed_chunks']
+
+
+@contextmanager
+def frozen_batch_norm_statistics(module):
+    """Context manager that keeps the running statistics of\
+    the batch normalization layers of a module unchanged, e.g.\
+    while the forward pass of a checkpointed part is recomputed.
+
+    :param module: The module.
+    :type module: torch.nn.Module
+    """
+    layers = [m for m in module.modules() if isinstance(m, _BatchNorm)]
+    saved = [(m.momentum, None if m.num_batches_tracked is None
+              else m.num_batches_tracked.clone()) for m in layers]
+    for m in layers:
+        m.momentum = 0.
+    try:
+        yield
+    finally:
+        for m, (momentum, num_batches_tracked) in zip(layers, saved):
+            m.momentum = momentum
+            if num_batches_tracked is not None:
+                m.num_batches_tracked.copy_(num_batches_tracked)
+
+
+def checkpointed_module(module, x):
+    """Applies a module, keeping only its input for the backward\
+    pass and recomputing the rest during it. The random number\
+    generators are restored for the recomputation (so dropout\
+    masks are the same), and the statistics of batch\
+    normalization are updated only once.
+
+    Without gradients (e.g. at validation), the module is\
+    applied normally.
+
+    :param module: The module.
+    :type module: torch.nn.Module
+    :param x: The input of the module.
+    :type x: torch.Tensor
+    :return: The output of the module.
+    :rtype: torch.Tensor
+    """
+    if not is_grad_enabled():
+        return module(x)
+    return checkpoint(
+        module, x, use_reentrant=False,
+        context_fn=lambda: (nullcontext(), frozen_batch_norm_statistics(module)))
+
+
+def checkpointed_chunks(loop, chunk_len, sequences, state, parameters):
+    """Runs a recurrent loop over chunks of `chunk_len` time steps,\
+    keeping only the inputs and the state at the start of every\
+    chunk for the backward pass and recomputing the steps of the\
+    chunk during it.
+
+    The loop is called as `loop(sequences, state, parameters)`,\
+    with the parts of the sequences in the chunk, and returns its\
+    outputs for the chunk and its state after the last step. All\
+    the parameters that the loop uses must be in `parameters`, else\
+    their gradients are accumulated once per chunk, outside the\
+    backward pass of the model (e.g. of data parallel training).
+
+    Without gradients (e.g. at validation), the loop runs over\
+    the whole sequences at once.
+
+    :param loop: The loop.
+    :type loop: callable
+    :param chunk_len: The amount of time steps of a chunk.
+    :type chunk_len: int
+    :param sequences: The input sequences, with shape (batch, time, ...).
+    :type sequences: tuple[torch.Tensor]
+    :param state: The state of the loop before the first step.
+    :type state: tuple[torch.Tensor]
+    :param parameters: The parameters of the loop.
+    :type parameters: tuple[torch.Tensor]
+    :return: The outputs for all time steps and the last state.
+    :rtype: (torch.Tensor, tuple[torch.Tensor])
+    """
+    if not is_grad_enabled():
+        return loop(sequences, state, parameters)
+
+    def _chunk(nb_sequences, nb_state, *tensors):
+        outputs, new_state = loop(
+            tensors[:nb_sequences], tensors[nb_sequences:nb_sequences + nb_state],
+            tensors[nb_sequences + nb_state:])
+        return (outputs, ) + tuple(new_state)
+
+    # The reentrant variant does not rely on saved tensor hooks,
+    # which the TorchScript loops do not call.
+    outputs = []
+    for t in range(0, sequences[0].size(1), chunk_len):
+        chunk_outputs = checkpoint(
+            _chunk, len(sequences), len(state),
+            *[s[:, t:t + chunk_len] for s in sequences], *state, *parameters,
+            use_reentrant=True)
+        outputs.append(chunk_outputs[0])
+        state = chunk_outputs[1:]
+
+    return cat(outputs, dim=1), state
+
+# EOF
@@ -3,6 +3,8 @@
 
 from torch import nn
 
+from .checkpointing import checkpointed_module
+
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
 __all__ = ['DNN']
@@ -10,10 +12,24 @@ __all__ = ['DNN']
 
 class DNN(nn.Module):
 
-    def __init__(self, cnn_channels, cnn_dropout):
+    def __init__(self, cnn_channels, cnn_dropout, checkpointing=False):
+        """The CNN front-end of the models.
+
+        With `checkpointing`, only the input of every layer is kept\
+        for the backward pass, and the rest (e.g. the full resolution\
+        output of the convolution) is recomputed during it.
 
+        :param cnn_channels: The amount of CNN channels.
+        :type cnn_channels: int
+        :param cnn_dropout: The dropout to be applied to the CNNs.
+        :type cnn_dropout: float
+        :param checkpointing: Recompute the layers in the backward pass?
+        :type checkpointing: bool
+        """
         super(DNN, self).__init__()
 
+        self.checkpointing = checkpointing
+
         layer_1 = nn.Sequential(
             nn.Conv2d(
                 in_channels=1, out_channels=cnn_channels,
@@ -52,6 +68,12 @@ class DNN(nn.Module):
                  by the DNN.
         :rtype: torch.Tensor
         """
-        return self.dnn(x.unsqueeze(1))
+        if not self.checkpointing:
+            return self.dnn(x.unsqueeze(1))
+
+        x = x.unsqueeze(1)
+        for layer in self.dnn:
+            x = checkpointed_module(layer, x)
+        return x
 
 # EOF
@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from functools import lru_cache
+from math import sqrt
+from typing import Tuple  # Used by the TorchScript type comments.
+
+from torch import Tensor, cat, stack, where
+from torch.func import functional_call
+from torch.nn import Module, Parameter, GRU
+from torch.nn.functional import linear
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['HoistedInputGRUCell', 'gru_cell_to_gru_state_dict',
+           'gru_to_gru_cell_state_dict', 'gru_step', 'decode_step',
+           'tf_decode_step', 'make_decode', 'make_tf_decode']
+
+
+_cell_to_sequence_names = OrderedDict([
+    ('weight_ih', 'weight_ih_l0'), ('weight_hh', 'weight_hh_l0'),
+    ('bias_ih', 'bias_ih_l0'), ('bias_hh', 'bias_hh_l0')])
+_sequence_to_cell_names = OrderedDict([
+    (v, k) for k, v in _cell_to_sequence_names.items()])
+
+
+class HoistedInputGRUCell(Module):
+
+    def __init__(self, feature_size, label_size, hidden_size, bias=True):
+        """GRU cell with the feature part of the input projection\
+        computed for all time steps at once.
+
+        The input of the cell is the concatenation of the features\
+        and (optionally) the labels used for teacher forcing. The\
+        parameters have the same names and shapes as the ones of\
+        `torch.nn.GRUCell(feature_size + label_size, hidden_size)`,\
+        so state dicts of the latter can be loaded directly.
+
+        :param feature_size: The dimensionality of the features.
+        :type feature_size: int
+        :param label_size: The dimensionality of the labels (0 if\
+                           no labels are used).
+        :type label_size: int
+        :param hidden_size: The dimensionality of the hidden state.
+        :type hidden_size: int
+        :param bias: Use biases?
+        :type bias: bool
+        """
+        super(HoistedInputGRUCell, self).__init__()
+
+        self.feature_size = feature_size
+        self.label_size = label_size
+        self.input_size = feature_size + label_size
+        self.hidden_size = hidden_size
+        self.bias = bias
+
+        self.weight_ih = Parameter(Tensor(3 * hidden_size, self.input_size))
+        self.weight_hh = Parameter(Tensor(3 * hidden_size, hidden_size))
+
+        if bias:
+            self.bias_ih = Parameter(Tensor(3 * hidden_size))
+            self.bias_hh = Parameter(Tensor(3 * hidden_size))
+        else:
+            self.register_parameter('bias_ih', None)
+            self.register_parameter('bias_hh', None)
+
+        self.reset_parameters()
+
+    def reset_parameters(self):
+        """Initializes the parameters as `torch.nn.GRUCell` does.
+        """
+        std = 1.0 / sqrt(self.hidden_size)
+        for weight in self.parameters():
+            weight.data.uniform_(-std, std)
+
+    def project_features(self, features):
+        """Computes the feature part of the input projection,\
+        for all time steps in one matrix multiplication.
+
+        :param features: The features, with shape\
+                         (batch, time, feature_size).
+        :type features: torch.Tensor
+        :return: The projected features, with shape\
+                 (batch, time, 3 * hidden_size).
+        :rtype: torch.Tensor
+        """
+        return linear(
+            features, self.weight_ih[:, :self.feature_size], self.bias_ih)
+
+    def label_weight(self):
+        """Returns the part of the input weights that\
+        corresponds to the labels.
+
+        :return: The label weights, with shape\
+                 (3 * hidden_size, label_size).
+        :rtype: torch.Tensor
+        """
+        return self.weight_ih[:, self.feature_size:]
+
+    def forward(self, projected_features, h, labels=None, label_weight=None):
+        """One step of the GRU cell.
+
+        :param projected_features: The output of :meth:`project_features`\
+                                   for the current time step.
+        :type projected_features: torch.Tensor
+        :param h: The previous hidden state.
+        :type h: torch.Tensor
+        :param labels: The labels for the current time step (if any).
+        :type labels: torch.Tensor | None
+        :param label_weight: The output of :meth:`label_weight`, to\
+                             avoid slicing the weights at every step.
+        :type label_weight: torch.Tensor | None
+        :return: The new hidden state.
+        :rtype: torch.Tensor
+        """
+        gi = projected_features
+        if labels is not None:
+            if label_weight is None:
+                label_weight = self.label_weight()
+            gi = gi + labels.mm(label_weight.t())
+
+        return gru_step(gi, h, self.weight_hh, self.bias_hh)
+
+    def sequence_parameters(self):
+        """Returns the parameters that :meth:`forward_sequence`\
+        uses, in the order that it gets them.
+
+        :return: The input and hidden-to-hidden weights (and biases).
+        :rtype: tuple[torch.Tensor]
+        """
+        return tuple(self.parameters())
+
+    def forward_sequence(self, features, labels=None, h=None, parameters=None):
+        """Runs the whole sequence through the fused GRU kernel\
+        (the one of `torch.nn.GRU`), using the parameters of the cell.
+
+        :param features: The features, with shape\
+                         (batch, time, feature_size).
+        :type features: torch.Tensor
+        :param labels: The labels, with shape (batch, time, label_size).
+        :type labels: torch.Tensor | None
+        :param h: The initial hidden state, with shape\
+                  (batch, hidden_size). Zeros if None.
+        :type h: torch.Tensor | None
+        :param parameters: The output of :meth:`sequence_parameters`,\
+                           when the parameters have to be explicit\
+                           inputs (e.g. of a checkpointed loop). None\
+                           for the parameters of the cell.
+        :type parameters: tuple[torch.Tensor] | None
+        :return: The hidden states for all time steps, with shape\
+                 (batch, time, hidden_size).
+        :rtype: torch.Tensor
+        """
+        inputs = features if labels is None else cat([features, labels], dim=-1)
+
+        if h is None:
+            h = inputs.new_zeros(inputs.size(0), self.hidden_size)
+
+        if parameters is None:
+            parameters = self.sequence_parameters()
+
+        outputs, _ = functional_call(
+            _sequence_gru(self.input_size, self.hidden_size, self.bias),
+            dict(zip(_cell_to_sequence_names.values(), parameters)),
+            (inputs, h.unsqueeze(0)))
+
+        return outputs
+
+
+@lru_cache(maxsize=None)
+def _sequence_gru(input_size, hidden_size, bias):
+    """Returns a `torch.nn.GRU` without storage for its parameters\
+    (i.e. on the meta device), for calling it with the parameters\
+    of a GRU cell through :func:`torch.func.functional_call`.
+
+    :param input_size: The dimensionality of the input.
+    :type input_size: int
+    :param hidden_size: The dimensionality of the hidden state.
+    :type hidden_size: int
+    :param bias: Use biases?
+    :type bias: bool
+    :return: The GRU.
+    :rtype: torch.nn.GRU
+    """
+    return GRU(input_size, hidden_size, bias=bias,
+               batch_first=True, device='meta')
+
+
+def gru_step(gi, h, weight_hh, bias_hh):
+    # type: (Tensor, Tensor, Tensor, Tensor) -> Tensor
+    """One step of a GRU, given the input projection.
+
+    :param gi: The input projection (biases included).
+    :type gi: torch.Tensor
+    :param h: The previous hidden state.
+    :type h: torch.Tensor
+    :param weight_hh: The hidden-to-hidden weights.
+    :type weight_hh: torch.Tensor
+    :param bias_hh: The hidden-to-hidden biases.
+    :type bias_hh: torch.Tensor
+    :return: The new hidden state.
+    :rtype: torch.Tensor
+    """
+    gh = linear(h, weight_hh, bias_hh)
+
+    i_r, i_z, i_n = gi.chunk(3, dim=-1)
+    h_r, h_z, h_n = gh.chunk(3, dim=-1)
+
+    r = i_r.add(h_r).sigmoid()
+    z = i_z.add(h_z).sigmoid()
+    n = i_n.add(r.mul(h_n)).tanh()
+
+    return n.add(z.mul(h.sub(n)))
+
+
+def decode_step(gi, h, weight_hh, bias_hh, cls_weight, cls_bias):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor]
+    """One step of the recurrent loop of the CRNN.
+
+    :param gi: The projected features of the step.
+    :type gi: torch.Tensor
+    :param h: The previous hidden state.
+    :type h: torch.Tensor
+    :param weight_hh: The hidden-to-hidden weights of the GRU.
+    :type weight_hh: torch.Tensor
+    :param bias_hh: The hidden-to-hidden biases of the GRU.
+    :type bias_hh: torch.Tensor
+    :param cls_weight: The weights of the classifier.
+    :type cls_weight: torch.Tensor
+    :param cls_bias: The biases of the classifier.
+    :type cls_bias: torch.Tensor
+    :return: The new hidden state and the output of the classifier.
+    :rtype: (torch.Tensor, torch.Tensor)
+    """
+    h = gru_step(gi, h, weight_hh, bias_hh)
+    return h, linear(h, cls_weight, cls_bias)
+
+
+def tf_decode_step(gi, h, tf, y, flags, label_weight,
+                   weight_hh, bias_hh, cls_weight, cls_bias):
+    # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor, Tensor]
+    """One step of the recurrent loop of the CRNN with\
+    teacher forcing.
+
+    The teacher forcing input of the next step is the ground\
+    truth where `flags` is True and the thresholded prediction\
+    elsewhere. Without teacher forcing (e.g. at testing), `flags`\
+    is all False. Keeping the branch in tensors, instead of\
+    optional arguments, keeps the function scriptable.
+
+    :param gi: The projected features of the step.
+    :type gi: torch.Tensor
+    :param h: The previous hidden state.
+    :type h: torch.Tensor
+    :param tf: The teacher forcing input of the step.
+    :type tf: torch.Tensor
+    :param y: The ground truth values of the step.
+    :type y: torch.Tensor
+    :param flags: The scheduled sampling flags of the step.
+    :type flags: torch.Tensor
+    :param label_weight: The transposed label part of\
+                         the GRU input weights.
+    :type label_weight: torch.Tensor
+    :param weight_hh: The hidden-to-hidden weights of the GRU.
+    :type weight_hh: torch.Tensor
+    :param bias_hh: The hidden-to-hidden biases of the GRU.
+    :type bias_hh: torch.Tensor
+    :param cls_weight: The weights of the classifier.
+    :type cls_weight: torch.Tensor
+    :param cls_bias: The biases of the classifier.
+    :type cls_bias: torch.Tensor
+    :return: The new hidden state, the output of the classifier,\
+             and the teacher forcing input of the next step.
+    :rtype: (torch.Tensor, torch.Tensor, torch.Tensor)
+    """
+    h = gru_step(gi + tf.mm(label_weight), h, weight_hh, bias_hh)
+    cls_out = linear(h, cls_weight, cls_bias)
+    tf = where(flags, y, cls_out.sigmoid().gt(.5).float())
+    return h, cls_out, tf
+
+
+def make_decode(step):
+    """Creates the recurrent loop of the CRNN.
+
+    :param step: The step of the loop (e.g. :func:`decode_step`).
+    :type step: callable
+    :return: The loop.
+    :rtype: callable
+    """
+    def decode(features, h, weight_hh, bias_hh, cls_weight, cls_bias):
+        # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor]
+        """The recurrent loop of the CRNN.
+
+        :param features: The projected features (see\
+                         :meth:`HoistedInputGRUCell.project_features`).
+        :type features: torch.Tensor
+        :param h: The initial hidden state.
+        :type h: torch.Tensor
+        :param weight_hh: The hidden-to-hidden weights of the GRU.
+        :type weight_hh: torch.Tensor
+        :param bias_hh: The hidden-to-hidden biases of the GRU.
+        :type bias_hh: torch.Tensor
+        :param cls_weight: The weights of the classifier.
+        :type cls_weight: torch.Tensor
+        :param cls_bias: The biases of the classifier.
+        :type cls_bias: torch.Tensor
+        :return: The output of the classifier, for all time steps,\
+                 and the last hidden state.
+        :rtype: (torch.Tensor, torch.Tensor)
+        """
+        outputs = []
+        for gi in features.unbind(1):
+            h, cls_out = step(gi, h, weight_hh, bias_hh, cls_weight, cls_bias)
+            outputs.append(cls_out)
+        return stack(outputs, dim=1), h
+    return decode
+
+
+def make_tf_decode(step):
+    """Creates the recurrent loop of the CRNN with teacher forcing.
+
+    :param step: The step of the loop (e.g. :func:`tf_decode_step`).
+    :type step: callable
+    :return: The loop.
+    :rtype: callable
+    """
+    def tf_decode(features, h, tf, y, flags, label_weight,
+                  weight_hh, bias_hh, cls_weight, cls_bias):
+        # type: (Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor, Tensor) -> Tuple[Tensor, Tensor, Tensor]
+        """The recurrent loop of the CRNN with teacher forcing.
+
+        :param features: The projected features (see\
+                         :meth:`HoistedInputGRUCell.project_features`).
+        :type features: torch.Tensor
+        :param h: The initial hidden state.
+        :type h: torch.Tensor
+        :param tf: The initial teacher forcing input.
+        :type tf: torch.Tensor
+        :param y: The ground truth values.
+        :type y: torch.Tensor
+        :param flags: The scheduled sampling flags, with shape\
+                      (batch, time, 1).
+        :type flags: torch.Tensor
+        :param label_weight: The label part of the GRU input weights.
+        :type label_weight: torch.Tensor
+        :param weight_hh: The hidden-to-hidden weights of the GRU.
+        :type weight_hh: torch.Tensor
+        :param bias_hh: The hidden-to-hidden biases of the GRU.
+        :type bias_hh: torch.Tensor
+        :param cls_weight: The weights of the classifier.
+        :type cls_weight: torch.Tensor
+        :param cls_bias: The biases of the classifier.
+        :type cls_bias: torch.Tensor
+        :return: The output of the classifier, for all time steps,\
+                 the last hidden state, and the teacher forcing\
+                 input of the step after the last one.
+        :rtype: (torch.Tensor, torch.Tensor, torch.Tensor)
+        """
+        label_weight = label_weight.t()
+        steps = features.unbind(1)
+        y_steps = y.unbind(1)
+        flags_steps = flags.unbind(1)
+        outputs = []
+        for t_step in range(len(steps)):
+            h, cls_out, tf = step(
+                steps[t_step], h, tf, y_steps[t_step], flags_steps[t_step],
+                label_weight, weight_hh, bias_hh, cls_weight, cls_bias)
+            outputs.append(cls_out)
+        return stack(outputs, dim=1), h, tf
+    return tf_decode
+
+
+def gru_cell_to_gru_state_dict(state_dict, prefix=''):
+    """Converts the parameters of a `torch.nn.GRUCell` (or\
+    :class:`HoistedInputGRUCell`) to the parameters of a\
+    single layer, unidirectional `torch.nn.GRU`.
+
+    :param state_dict: The state dict with the GRU cell parameters.
+    :type state_dict: dict
+    :param prefix: The prefix of the GRU cell parameters\
+                   in the state dict (e.g. `rnn.`).
+    :type prefix: str
+    :return: A new state dict, with the GRU parameters.
+    :rtype: collections.OrderedDict
+    """
+    return _rename_parameters(state_dict, prefix, _cell_to_sequence_names)
+
+
+def gru_to_gru_cell_state_dict(state_dict, prefix=''):
+    """Converts the parameters of a single layer, unidirectional\
+    `torch.nn.GRU` to the parameters of a `torch.nn.GRUCell`\
+    (or :class:`HoistedInputGRUCell`).
+
+    :param state_dict: The state dict with the GRU parameters.
+    :type state_dict: dict
+    :param prefix: The prefix of the GRU parameters\
+                   in the state dict (e.g. `rnn.`).
+    :type prefix: str
+    :return: A new state dict, with the GRU cell parameters.
+    :rtype: collections.OrderedDict
+    """
+    return _rename_parameters(state_dict, prefix, _sequence_to_cell_names)
+
+
+def _rename_parameters(state_dict, prefix, names):
+    """Renames the parameters with the specified prefix.
+
+    :param state_dict: The state dict.
+    :type state_dict: dict
+    :param prefix: The prefix of the parameters to be renamed.
+    :type prefix: str
+    :param names: The mapping from old to new names.
+    :type names: dict
+    :return: A new state dict, with the renamed parameters.
+    :rtype: collections.OrderedDict
+    """
+    renamed = OrderedDict()
+    for k, v in state_dict.items():
+        if k.startswith(prefix) and k[len(prefix):] in names:
+            k = '{}{}'.format(prefix, names[k[len(prefix):]])
+        renamed[k] = v
+    return renamed
+
+# EOF
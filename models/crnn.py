@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 from torch import zeros
-from torch.nn import Module, Sequential, GRUCell, \
-    Linear, Dropout
+from torch.func import functional_call
+from torch.nn import Module, Sequential, Linear, Dropout, GRU
+from torch.autograd.profiler import record_function
 
-from ._modules import dnn
+from ._modules import backends, dnn, recurrent
+from ._modules.checkpointing import checkpointed_chunks
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
@@ -15,9 +17,16 @@ __all__ = ['CRNN']
 class CRNN(Module):
 
     def __init__(self, cnn_channels, cnn_dropout, rnn_in_dim,
-                 rnn_out_dim, rnn_dropout, nb_classes):
+                 rnn_out_dim, rnn_dropout, nb_classes, fused_rnn=False,
+                 compile_backend='none', checkpoint_dnn=False,
+                 checkpoint_steps=None):
         """The CRNN model.
 
+        With `fused_rnn`, the whole sequence goes through a single\
+        `torch.nn.GRU` call and the classifier is applied once over\
+        all frames. State dicts of the two variants are converted\
+        automatically when loaded.
+
         :param cnn_channels: The amount of CNN channels.
         :type cnn_channels: int
         :param cnn_dropout: The dropout to be applied to the CNNs.
@@ -30,40 +39,134 @@ class CRNN(Module):
         :type rnn_dropout: float
         :param nb_classes: The amount of classes to be predicted.
         :type nb_classes: int
+        :param fused_rnn: Use a fused, full sequence GRU?
+        :type fused_rnn: bool
+        :param compile_backend: The backend for compiling the recurrent\
+                                loop (`none`, `torchscript`, or\
+                                `torch_compile`). Not used with `fused_rnn`.
+        :type compile_backend: str
+        :param checkpoint_dnn: Recompute the layers of the DNN in\
+                               the backward pass, to save memory?
+        :type checkpoint_dnn: bool
+        :param checkpoint_steps: The amount of time steps of the\
+                                 chunks of the RNN that are recomputed\
+                                 in the backward pass, to save memory\
+                                 (None for no recomputation).
+        :type checkpoint_steps: int|None
         """
         super(CRNN, self).__init__()
 
         self.dnn_output_features = cnn_channels
         self.rnn_hh_size = rnn_out_dim
         self.nb_classes = nb_classes
+        self.fused_rnn = fused_rnn
+        self.compile_backend = compile_backend
+        self.checkpoint_steps = checkpoint_steps
 
         self.dnn = Sequential(
-            dnn.DNN(cnn_channels=cnn_channels, cnn_dropout=cnn_dropout),
+            dnn.DNN(cnn_channels=cnn_channels, cnn_dropout=cnn_dropout,
+                    checkpointing=checkpoint_dnn),
             Dropout(rnn_dropout)
         )
-        self.rnn = GRUCell(rnn_in_dim, self.rnn_hh_size, bias=True)
+        if self.fused_rnn:
+            self.rnn = GRU(rnn_in_dim, self.rnn_hh_size, bias=True,
+                           batch_first=True)
+        else:
+            self.rnn = recurrent.HoistedInputGRUCell(
+                rnn_in_dim, 0, self.rnn_hh_size, bias=True)
+            self._decode = backends.CompiledLoop(
+                recurrent.make_decode, recurrent.decode_step,
+                compile_backend)
         self.classifier = Linear(self.rnn_hh_size, self.nb_classes, bias=True)
 
-    def forward(self, x):
+        self.register_load_state_dict_pre_hook(self._convert_rnn_state_dict)
+
+    def _convert_rnn_state_dict(self, module, state_dict, prefix, *args):
+        """Converts, in place, the RNN parameters of a state dict\
+        of the other CRNN variant (fused or not) to the ones of\
+        this model.
+
+        :param module: The module that loads the state dict (i.e.\
+                       this model).
+        :type module: torch.nn.Module
+        :param state_dict: The state dict to be loaded.
+        :type state_dict: dict
+        :param prefix: The prefix of this model in the state dict.
+        :type prefix: str
+        """
+        convert = recurrent.gru_cell_to_gru_state_dict if self.fused_rnn \
+            else recurrent.gru_to_gru_cell_state_dict
+        converted = convert(state_dict, '{}rnn.'.format(prefix))
+        state_dict.clear()
+        state_dict.update(converted)
+
+    def forward(self, x, state=None, return_state=False):
         """Forward pass of the CRNN model.
 
         :param x: The input to the CRNN.
         :type x: torch.Tensor
-        :return: The output predictions.
-        :rtype: torch.Tensor
+        :param state: The state of the RNN from a previous pass,\
+                      i.e. a tuple with the hidden state (None for\
+                      zeros).
+        :type state: tuple[torch.Tensor]|None
+        :param return_state: Return also the state of the RNN\
+                             after the last time step?
+        :type return_state: bool
+        :return: The output predictions (and the state of the RNN).
+        :rtype: torch.Tensor|(torch.Tensor, tuple[torch.Tensor])
         """
         b_size, t_steps, _ = x.size()
-        features = self.dnn(x).permute(0, 2, 1, 3).contiguous()
-        features = features.view(b_size, t_steps, self.dnn_output_features)
+        with record_function('dnn'):
+            features = self.dnn(x).permute(0, 2, 1, 3).contiguous()
+            features = features.view(b_size, t_steps, self.dnn_output_features)
+
+        h = zeros(b_size, self.rnn_hh_size).to(x.device) if state is None else state[0]
 
-        h = zeros(b_size, self.rnn_hh_size).to(x.device)
-        outputs = zeros(b_size, t_steps, self.nb_classes).to(features.device)
+        with record_function('recurrent'):
+            if self.fused_rnn:
+                sequences, parameters = (features, ), tuple(self.rnn.parameters())
+            else:
+                sequences = (self.rnn.project_features(features), )
+                parameters = (self.rnn.weight_hh, self.rnn.bias_hh,
+                              self.classifier.weight, self.classifier.bias)
 
-        for t_step in range(t_steps):
-            h = self.rnn(features[:, t_step, :], h)
-            out = self.classifier(h)
-            outputs[:, t_step, :] = out
+            if self.checkpoint_steps:
+                outputs, (h, ) = checkpointed_chunks(
+                    self._recurrent_loop, self.checkpoint_steps,
+                    sequences, (h, ), parameters)
+            else:
+                outputs, (h, ) = self._recurrent_loop(sequences, (h, ), parameters)
 
+            if self.fused_rnn:
+                outputs = self.classifier(outputs)
+
+        if return_state:
+            return outputs, (h, )
         return outputs
 
+    def _recurrent_loop(self, sequences, state, parameters):
+        """The recurrent loop, in the form that\
+        :func:`checkpointed_chunks` calls it.
+
+        :param sequences: The features (projected, if the RNN\
+                          is not fused).
+        :type sequences: tuple[torch.Tensor]
+        :param state: The hidden state.
+        :type state: tuple[torch.Tensor]
+        :param parameters: The parameters of the loop (the ones\
+                           of the GRU, if the RNN is fused).
+        :type parameters: tuple[torch.Tensor]
+        :return: The outputs of the RNN (of the classifier, if the\
+                 RNN is not fused) and the last hidden state.
+        :rtype: (torch.Tensor, tuple[torch.Tensor])
+        """
+        if self.fused_rnn:
+            outputs, h = functional_call(
+                self.rnn, dict(zip(dict(self.rnn.named_parameters()), parameters)),
+                (sequences[0], state[0].unsqueeze(0).to(sequences[0].dtype)))
+            return outputs, (h.squeeze(0), )
+
+        outputs, h = self._decode(sequences[0], state[0], *parameters)
+        return outputs, (h, )
+
 # EOF
@@ -1,10 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from torch.nn import Module, Sequential, GRUCell, Linear, Dropout
-from torch import zeros, Tensor, cat
+from math import exp
 
-from ._modules import dnn
+from torch.nn import Module, Sequential, Linear, Dropout
+from torch import zeros, arange, randint, where, float64, cat, no_grad
+from torch.autograd.profiler import record_function
+
+from ._modules import backends, dnn, recurrent
+from ._modules.checkpointing import checkpointed_chunks
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
@@ -16,10 +20,21 @@ class TFCRNN(Module):
     def __init__(self, cnn_channels, cnn_dropout,
                  rnn_in_dim, rnn_out_dim, rnn_dropout,
                  nb_classes, gamma_factor, mul_factor,
-                 min_prob, max_prob):
+                 min_prob, max_prob, parallel_sampling=False,
+                 compile_backend='none', checkpoint_dnn=False,
+                 checkpoint_steps=None):
         """The Sound Event Detection (SED) model with teacher forcing and\
         scheduled sampling.
 
+        With `parallel_sampling`, training passes use parallel\
+        scheduled sampling instead of the autoregressive loop. A\
+        first pass over the whole sequence uses the ground truth\
+        values (shifted by one frame) as teacher forcing input. Its\
+        predictions are mixed with the ground truth values according\
+        to :meth:`scheduled_sampling`, and a second pass is done with\
+        the mixed input. Passes without ground truth values (i.e.\
+        validation and testing) are always autoregressive.
+
         :param cnn_channels: The amount of CNN channels for the SED model.
         :type cnn_channels: int
         :param cnn_dropout: The dropout percentage for the CNNs dropout.
@@ -40,6 +55,20 @@ class TFCRNN(Module):
         :type min_prob: float
         :param max_prob: The maximum probability for selecting predictions.
         :type max_prob: float
+        :param parallel_sampling: Use parallel scheduled sampling for training?
+        :type parallel_sampling: bool
+        :param compile_backend: The backend for compiling the recurrent\
+                                loop (`none`, `torchscript`, or\
+                                `torch_compile`).
+        :type compile_backend: str
+        :param checkpoint_dnn: Recompute the layers of the DNN in\
+                               the backward pass, to save memory?
+        :type checkpoint_dnn: bool
+        :param checkpoint_steps: The amount of time steps of the\
+                                 chunks of the RNN that are recomputed\
+                                 in the backward pass, to save memory\
+                                 (None for no recomputation).
+        :type checkpoint_steps: int|None
         """
         super(TFCRNN, self).__init__()
 
@@ -52,14 +81,23 @@ class TFCRNN(Module):
         self._min_prob = 1 - min_prob
         self.max_prob = max_prob
         self.iteration = 0
+        self.parallel_sampling = parallel_sampling
+        self.compile_backend = compile_backend
+        self.checkpoint_steps = checkpoint_steps
 
         self.dnn = Sequential(
-            dnn.DNN(cnn_channels=cnn_channels, cnn_dropout=cnn_dropout),
+            dnn.DNN(cnn_channels=cnn_channels, cnn_dropout=cnn_dropout,
+                    checkpointing=checkpoint_dnn),
             Dropout(rnn_dropout)
         )
-        self.rnn = GRUCell(rnn_in_dim + self.nb_classes, self.rnn_hh_size, bias=True)
+        self.rnn = recurrent.HoistedInputGRUCell(
+            rnn_in_dim, self.nb_classes, self.rnn_hh_size, bias=True)
         self.classifier = Linear(self.rnn_hh_size, self.nb_classes, bias=True)
 
+        self._decode = backends.CompiledLoop(
+            recurrent.make_tf_decode, recurrent.tf_decode_step,
+            compile_backend)
+
     @property
     def min_prob(self):
         """Getter for the min_prob attribute.
@@ -79,7 +117,7 @@ class TFCRNN(Module):
         """
         self._min_prob = 1 - value
 
-    def forward(self, x, y):
+    def forward(self, x, y, state=None, return_state=False):
         """The forward pass of the CRNN model with\
         teacher forcing.
 
@@ -87,42 +125,155 @@ class TFCRNN(Module):
         :type x: torch.Tensor
         :param y: The predictions for teacher forcing.
         :type y: torch.Tensor
-        :return: The predictions of TF CRNN.
-        :rtype: torch.Tensor
+        :param state: The state of the RNN from a previous pass,\
+                      i.e. a tuple with the hidden state and the\
+                      teacher forcing input of the next time step\
+                      (None for zeros).
+        :type state: tuple[torch.Tensor, torch.Tensor]|None
+        :param return_state: Return also the state of the RNN\
+                             after the last time step?
+        :type return_state: bool
+        :return: The predictions of TF CRNN (and the state of the RNN).
+        :rtype: torch.Tensor|(torch.Tensor, tuple[torch.Tensor, torch.Tensor])
         """
         b_size, t_steps, _ = x.size()
-        features = self.dnn(x).permute(0, 2, 1, 3).contiguous().view(
-            b_size, t_steps, self.dnn_output_features)
+        with record_function('dnn'):
+            features = self.dnn(x).permute(0, 2, 1, 3).contiguous().view(
+                b_size, t_steps, self.dnn_output_features)
+
+        if state is None:
+            state = (zeros(b_size, self.rnn_hh_size).to(x.device),
+                     zeros(b_size, self.nb_classes).to(x.device))
 
+        with record_function('recurrent'):
+            outputs, h, tf = self._recurrent_forward(features, y, *state)
+
+        if return_state:
+            return outputs, (h, tf)
+        return outputs
+
+    def _recurrent_forward(self, features, y, h, tf):
+        """The recurrent part of the forward pass.
+
+        :param features: The output of the DNN, with shape\
+                         (batch, time, features).
+        :type features: torch.Tensor
+        :param y: The predictions for teacher forcing.
+        :type y: torch.Tensor
+        :param h: The initial hidden state.
+        :type h: torch.Tensor
+        :param tf: The teacher forcing input of the first time step.
+        :type tf: torch.Tensor
+        :return: The predictions of TF CRNN, the last hidden state,\
+                 and the teacher forcing input of the time step\
+                 after the last one.
+        :rtype: (torch.Tensor, torch.Tensor, torch.Tensor)
+        """
+        b_size, t_steps, _ = features.size()
         device = features.device
 
-        h = zeros(b_size, self.rnn_hh_size).to(device)
-        tf = zeros(b_size, self.nb_classes).to(device)
-        flags = zeros(b_size).to(device)
+        if self.parallel_sampling and y is not None:
+            return self._parallel_forward(features, y, h, tf)
 
-        outputs = zeros(b_size, t_steps, self.nb_classes).to(device)
+        features = self.rnn.project_features(features)
 
-        for t_step in range(t_steps):
+        if y is None:
+            y = tf.new_zeros(b_size, t_steps, self.nb_classes)
+            flags = tf.new_zeros(b_size, t_steps, 1).gt(0)
+        else:
+            flags = self.scheduled_sampling_flags(b_size, t_steps, device)
+            self.iteration += t_steps
 
-            prob = self.scheduled_sampling()
-            flags.random_(0, 1001).div_(1000).lt_(prob)
-            tf_input = cat([features[:, t_step, :], tf], dim=-1)
+        sequences, state = (features, y, flags), (h, tf)
+        parameters = (self.rnn.label_weight(), self.rnn.weight_hh, self.rnn.bias_hh,
+                      self.classifier.weight, self.classifier.bias)
 
-            h = self.rnn(tf_input, h)
+        if self.checkpoint_steps:
+            outputs, (h, tf) = checkpointed_chunks(
+                self._decode_loop, self.checkpoint_steps, sequences, state, parameters)
+        else:
+            outputs, (h, tf) = self._decode_loop(sequences, state, parameters)
 
-            cls_out = self.classifier(h)
-            sig_out = cls_out.sigmoid().gt(.5).float()
+        return outputs, h, tf
 
-            try:
-                for ii, flag in enumerate(flags):
-                    tf[ii, :] = y[ii, t_step, :] if flag else sig_out[ii, :]
-                self.iteration += 1
-            except TypeError:
-                tf[:, :] = sig_out
+    def _decode_loop(self, sequences, state, parameters):
+        """The autoregressive loop, in the form that\
+        :func:`checkpointed_chunks` calls it.
 
-            outputs[:, t_step, :] = cls_out
+        :param sequences: The projected features, the ground truth\
+                          values, and the scheduled sampling flags.
+        :type sequences: tuple[torch.Tensor]
+        :param state: The hidden state and the teacher forcing input.
+        :type state: tuple[torch.Tensor]
+        :param parameters: The parameters of the loop.
+        :type parameters: tuple[torch.Tensor]
+        :return: The outputs of the classifier and the state\
+                 after the last step.
+        :rtype: (torch.Tensor, tuple[torch.Tensor])
+        """
+        features, y, flags = sequences
+        outputs, h, tf = self._decode(features, state[0], state[1], y, flags, *parameters)
+        return outputs, (h, tf)
 
-        return outputs
+    def _sequence_loop(self, sequences, state, parameters):
+        """The second pass of parallel scheduled sampling, in\
+        the form that :func:`checkpointed_chunks` calls it.
+
+        :param sequences: The features and the teacher forcing input.
+        :type sequences: tuple[torch.Tensor]
+        :param state: The hidden state.
+        :type state: tuple[torch.Tensor]
+        :param parameters: The parameters of the RNN.
+        :type parameters: tuple[torch.Tensor]
+        :return: The outputs of the RNN and the last hidden state.
+        :rtype: (torch.Tensor, tuple[torch.Tensor])
+        """
+        outputs = self.rnn.forward_sequence(sequences[0], sequences[1], state[0], parameters)
+        return outputs, (outputs[:, -1], )
+
+    def _parallel_forward(self, features, y, h, tf):
+        """The two passes of parallel scheduled sampling.
+
+        :param features: The output of the DNN, with shape\
+                         (batch, time, features).
+        :type features: torch.Tensor
+        :param y: The ground truth values.
+        :type y: torch.Tensor
+        :param h: The initial hidden state.
+        :type h: torch.Tensor
+        :param tf: The teacher forcing input of the first time step.
+        :type tf: torch.Tensor
+        :return: The predictions of the second pass, its last hidden\
+                 state, and the teacher forcing input of the time\
+                 step after the last one (i.e. the last ground truth\
+                 values).
+        :rtype: (torch.Tensor, torch.Tensor, torch.Tensor)
+        """
+        b_size, t_steps, _ = y.size()
+        tf = tf.to(y.dtype).unsqueeze(1)
+
+        y_shifted = cat([tf, y[:, :-1, :]], dim=1)
+
+        with no_grad():
+            predictions = self.classifier(
+                self.rnn.forward_sequence(features, y_shifted, h)
+            ).sigmoid().gt(.5).float()
+
+        predictions = cat([tf, predictions[:, :-1, :]], dim=1)
+
+        flags = self.scheduled_sampling_flags(b_size, t_steps, features.device)
+        self.iteration += t_steps
+
+        sequences = (features, where(flags, y_shifted, predictions))
+        parameters = self.rnn.sequence_parameters()
+
+        if self.checkpoint_steps:
+            outputs, (h, ) = checkpointed_chunks(
+                self._sequence_loop, self.checkpoint_steps, sequences, (h, ), parameters)
+        else:
+            outputs, (h, ) = self._sequence_loop(sequences, (h, ), parameters)
+
+        return self.classifier(outputs), h, y[:, -1]
 
     def scheduled_sampling(self):
         """Returns the probability to select
@@ -130,10 +281,47 @@ class TFCRNN(Module):
 
         :return: The current probability of\
                  selecting predictions.
-        :rtype: torch.Tensor
+        :rtype: float
         """
         p = self.iteration/self.batch_counter
-        d = Tensor([-self.gamma_factor * p]).exp().item()
+        d = exp(-self.gamma_factor * p)
         return min(self.max_prob, 1 - min(self.min_prob, (2 / (1 + d)) - 1))
 
+    def scheduled_sampling_schedule(self, t_steps, device='cpu'):
+        """Returns the probabilities of :meth:`scheduled_sampling`\
+        for the next `t_steps` iterations, without advancing\
+        the iteration counter.
+
+        :param t_steps: The amount of iterations.
+        :type t_steps: int
+        :param device: The device of the returned tensor.
+        :type device: str | torch.device
+        :return: The probability for each of the iterations.
+        :rtype: torch.Tensor
+        """
+        p = arange(
+            self.iteration, self.iteration + t_steps,
+            dtype=float64, device=device).div(self.batch_counter)
+        d = p.mul(-self.gamma_factor).exp()
+        prob = d.add(1).reciprocal().mul(2).sub(1).clamp(max=self.min_prob)
+        return prob.neg().add(1).clamp(max=self.max_prob)
+
+    def scheduled_sampling_flags(self, b_size, t_steps, device='cpu'):
+        """Draws, for all examples and time steps at once, the\
+        flags for selecting the ground truth values (True) or\
+        the predicted values (False) as teacher forcing input.
+
+        :param b_size: The batch size.
+        :type b_size: int
+        :param t_steps: The amount of time steps.
+        :type t_steps: int
+        :param device: The device of the returned tensor.
+        :type device: str | torch.device
+        :return: The flags, with shape (b_size, t_steps, 1).
+        :rtype: torch.Tensor
+        """
+        prob = self.scheduled_sampling_schedule(t_steps, device).float()
+        flags = randint(0, 1001, (b_size, t_steps), device=device)
+        return flags.float().div_(1000).lt(prob).unsqueeze(-1)
+
 # EOF
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['write_real_life_fold']
+
+
+def write_real_life_fold(root_dir, lengths, nb_features=3, nb_classes=2,
+                         data_fold=1, split='train', seed=0):
+    """Writes the pickle files of a fold of the TUT Sound\\
+    Events 2017 layout, with recordings of the specified lengths.
+
+    The input features of every recording are its index plus the\\
+    index of the feature vector, so that every feature vector can\\
+    be traced back to its place.
+
+    :param root_dir: The root directory of the dataset.
+    :type root_dir: pathlib.Path|str
+    :param lengths: The lengths of the recordings.
+    :type lengths: list[int]
+    :param nb_features: The amount of features.
+    :type nb_features: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int
+    :param data_fold: The fold.
+    :type data_fold: int
+    :param split: The split (`train` or `test`).
+    :type split: str
+    :param seed: The seed of the target values.
+    :type seed: int
+    :return: The input features and the target values.
+    :rtype: list[numpy.ndarray], list[numpy.ndarray]
+    """
+    rng = np.random.RandomState(seed)
+    x = [np.tile(np.arange(1, length + 1, dtype=np.float64)[:, None] +
+                 1e4 * recording, (1, nb_features))
+         for recording, length in enumerate(lengths)]
+    y = [(rng.rand(length, nb_classes) > .5).astype(np.float64) for length in lengths]
+
+    fold_dir = Path(root_dir, 'real_life_2017', 'fold_{}'.format(data_fold))
+    fold_dir.mkdir(parents=True, exist_ok=True)
+    for name, data in [('x', x), ('y', y)]:
+        with fold_dir.joinpath('{}_{}.p'.format(split, name)).open('wb') as f:
+            pickle.dump(data, f)
+
+    return x, y
+
+# EOF
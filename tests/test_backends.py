@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+import torch
+from torch._dynamo.exc import TorchDynamoException
+
+from models._modules import backends, recurrent
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestCompiledLoop']
+
+
+def _make_unscriptable(step):
+    def loop(*args, **kwargs):
+        return step(*args)
+    return loop
+
+
+def _identity(x):
+    return x
+
+
+def _raising(error):
+    def compiled_loop(*args):
+        raise error
+    return compiled_loop
+
+
+class TestCompiledLoop(unittest.TestCase):
+
+    def _loop(self, compiled_loop):
+        """Makes a `torch_compile` loop, with the compiled loop\
+        replaced by the specified one.
+        """
+        with mock.patch.dict(backends.compile_backends,
+                             {'torch_compile': lambda make_loop, step: compiled_loop}):
+            return backends.CompiledLoop(_make_unscriptable, _identity, 'torch_compile')
+
+    def test_torchscript(self):
+        loop = backends.CompiledLoop(
+            recurrent.make_decode, recurrent.decode_step, 'torchscript')
+        self.assertIsNotNone(loop.compiled_loop)
+
+    def test_torchscript_falls_back(self):
+        with mock.patch('models._modules.backends.print_msg'):
+            loop = backends.CompiledLoop(_make_unscriptable, _identity, 'torchscript')
+        self.assertIsNone(loop.compiled_loop)
+        self.assertEqual(loop(1), 1)
+
+    def test_compile_error_falls_back(self):
+        loop = self._loop(_raising(TorchDynamoException('tracing failed')))
+        with mock.patch('models._modules.backends.print_msg'):
+            self.assertEqual(loop(1), 1)
+        self.assertIsNone(loop.compiled_loop)
+
+    def test_other_errors_are_raised(self):
+        for error in [ValueError('shape mismatch'), RuntimeError('shape mismatch'),
+                      torch.cuda.OutOfMemoryError('out of memory')]:
+            loop = self._loop(_raising(error))
+            with self.assertRaises(type(error)):
+                loop(1)
+            self.assertIsNotNone(loop.compiled_loop)
+
+    def test_out_of_memory_in_compilation_is_raised(self):
+        error = TorchDynamoException('compilation failed')
+        error.__cause__ = torch.cuda.OutOfMemoryError('out of memory')
+        loop = self._loop(_raising(error))
+        with self.assertRaises(torch.cuda.OutOfMemoryError):
+            loop(1)
+        self.assertIsNotNone(loop.compiled_loop)
+
+# EOF
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+import numpy as np
+
+from data_feeders import _cache
+from data_feeders._tut_sed_real_life_2017 import TUTSEDRealLife2017
+from tests._data import write_real_life_fold
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestCachedRecordings']
+
+
+class TestCachedRecordings(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.root_dir = Path(self.tmp_dir.name, 'data')
+        self.cache_dir = Path(self.tmp_dir.name, 'cache')
+        self.x, self.y = write_real_life_fold(self.root_dir, [10, 3, 16])
+
+    def _dataset(self):
+        return TUTSEDRealLife2017(
+            root_dir=self.root_dir, data_fold=1,
+            input_features_file_name='x.p', target_values_input_name='y.p',
+            is_test=False, seq_len=8, hop=4, cache_dir=self.cache_dir)
+
+    def test_hit_does_not_read_the_pickles(self):
+        with mock.patch.object(_cache, 'file_hash', wraps=_cache.file_hash) as file_hash:
+            dataset = self._dataset()
+            self.assertEqual(file_hash.call_count, 2)
+
+            with mock.patch('tools.file_io.load_pickle_file') as load_pickle_file:
+                cached = self._dataset()
+            self.assertEqual(file_hash.call_count, 2)
+            load_pickle_file.assert_not_called()
+
+        self.assertIsInstance(cached.x[0], np.memmap)
+        for item in range(len(dataset)):
+            for a, b in zip(dataset[item], cached[item]):
+                self.assertTrue(np.array_equal(a, b))
+        for recording, x in enumerate(self.x):
+            self.assertTrue(np.array_equal(cached.x[recording], x.astype(np.float32)))
+
+    def test_changed_file_is_hashed_again(self):
+        self._dataset()
+
+        x_path = self.root_dir.joinpath('real_life_2017', 'fold_1', 'train_x.p')
+        digest = _cache.cached_file_hash(self.cache_dir, x_path)
+        self.assertEqual(digest, _cache.file_hash(x_path))
+
+        self.x, self.y = write_real_life_fold(self.root_dir, [10, 4, 16])
+        stat = x_path.stat()
+        os.utime(str(x_path), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        with mock.patch.object(_cache, 'file_hash', wraps=_cache.file_hash) as file_hash:
+            dataset = self._dataset()
+        self.assertEqual(file_hash.call_count, 2)
+
+        self.assertNotEqual(_cache.cached_file_hash(self.cache_dir, x_path), digest)
+        self.assertEqual([len(x) for x in dataset.x], [10, 4, 16])
+
+# EOF
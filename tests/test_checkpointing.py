@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import torch
+
+from models.crnn import CRNN
+from models.tf_crnn import TFCRNN
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestCheckpointedChunks']
+
+
+class TestCheckpointedChunks(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.x = torch.randn(4, 12, 40)
+        self.y = torch.rand(4, 12, 4).gt(.5).float()
+
+    def _models(self):
+        """Makes every variant of the models, with the\
+        same parameters.
+
+        :return: The name and the model of every variant.
+        :rtype: list[(str, torch.nn.Module)]
+        """
+        models = []
+        for fused_rnn in [False, True]:
+            torch.manual_seed(0)
+            models.append(('crnn_fused_{}'.format(fused_rnn), CRNN(
+                cnn_channels=8, cnn_dropout=.2, rnn_in_dim=8, rnn_out_dim=8,
+                rnn_dropout=.2, nb_classes=4, fused_rnn=fused_rnn)))
+        for parallel_sampling in [False, True]:
+            torch.manual_seed(0)
+            model = TFCRNN(
+                cnn_channels=8, cnn_dropout=.2, rnn_in_dim=8, rnn_out_dim=8,
+                rnn_dropout=.2, nb_classes=4, gamma_factor=10, mul_factor=80,
+                min_prob=.05, max_prob=.9, parallel_sampling=parallel_sampling)
+            model.batch_counter = 50
+            models.append(('tf_crnn_parallel_{}'.format(parallel_sampling), model))
+        return models
+
+    def _gradients(self, model, checkpoint_steps):
+        """Returns the gradients of the parameters of a model,\
+        and the amount of times that each one was accumulated.
+
+        :param model: The model.
+        :type model: torch.nn.Module
+        :param checkpoint_steps: The time steps of the checkpointed chunks.
+        :type checkpoint_steps: int|None
+        :return: The gradients and the amounts of accumulations.
+        :rtype: dict[str, torch.Tensor], dict[str, int]
+        """
+        model.checkpoint_steps = checkpoint_steps
+        model.zero_grad(set_to_none=True)
+        accumulations = {name: 0 for name, _ in model.named_parameters()}
+
+        def _hook(name):
+            def _count(_):
+                accumulations[name] += 1
+            return _count
+
+        handles = [parameter.register_post_accumulate_grad_hook(_hook(name))
+                   for name, parameter in model.named_parameters()]
+
+        torch.manual_seed(1)
+        y_hat = model(self.x, self.y) if isinstance(model, TFCRNN) else model(self.x)
+        y_hat.sum().backward()
+
+        for handle in handles:
+            handle.remove()
+
+        return {name: parameter.grad.clone() for name, parameter in
+                model.named_parameters()}, accumulations
+
+    def test_same_gradients(self):
+        for name, model in self._models():
+            iteration = getattr(model, 'iteration', None)
+            gradients, _ = self._gradients(model, None)
+            if iteration is not None:
+                model.iteration = iteration
+
+            checkpointed_gradients, _ = self._gradients(model, 5)
+            for parameter, gradient in gradients.items():
+                torch.testing.assert_close(
+                    checkpointed_gradients[parameter], gradient,
+                    msg='{}: {}'.format(name, parameter))
+
+    def test_one_accumulation_per_parameter(self):
+        # Data parallel training expects the gradient of every
+        # parameter to be ready once per backward pass.
+        for name, model in self._models():
+            _, accumulations = self._gradients(model, 5)
+            self.assertEqual(accumulations, {k: 1 for k in accumulations}, name)
+
+# EOF
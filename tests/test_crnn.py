@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import torch
+from torch.nn import GRUCell
+
+from models.crnn import CRNN
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestCRNNStateDict']
+
+
+def _make_model(fused_rnn):
+    """Makes a small CRNN model, in evaluation mode.
+
+    :param fused_rnn: Use a fused, full sequence GRU?
+    :type fused_rnn: bool
+    :return: The model.
+    :rtype: models.crnn.CRNN
+    """
+    return CRNN(cnn_channels=8, cnn_dropout=0., rnn_in_dim=8,
+                rnn_out_dim=6, rnn_dropout=0., nb_classes=4,
+                fused_rnn=fused_rnn).eval()
+
+
+class TestCRNNStateDict(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = _make_model(fused_rnn=False)
+        self.x = torch.randn(3, 11, 40)
+
+    def _gru_cell_outputs(self):
+        """The outputs of the model before the RNN was changed,\
+        i.e. with a `torch.nn.GRUCell` called at every time step.
+        """
+        gru_cell = GRUCell(8, 6)
+        gru_cell.load_state_dict({
+            k[len('rnn.'):]: v for k, v in self.model.state_dict().items()
+            if k.startswith('rnn.')})
+
+        b_size, t_steps, _ = self.x.size()
+        with torch.no_grad():
+            features = self.model.dnn(self.x).permute(0, 2, 1, 3).contiguous()
+            features = features.view(b_size, t_steps, 8)
+            h, outputs = torch.zeros(b_size, 6), []
+            for t_step in range(t_steps):
+                h = gru_cell(features[:, t_step], h)
+                outputs.append(self.model.classifier(h))
+        return torch.stack(outputs, dim=1)
+
+    def _outputs(self, model):
+        with torch.no_grad():
+            return model(self.x)
+
+    def test_cell_matches_gru_cell(self):
+        torch.testing.assert_close(
+            self._outputs(self.model), self._gru_cell_outputs())
+
+    def test_cell_state_dict_into_fused(self):
+        fused = _make_model(fused_rnn=True)
+        fused.load_state_dict(self.model.state_dict())
+
+        torch.testing.assert_close(
+            self._outputs(fused), self._gru_cell_outputs())
+
+    def test_fused_state_dict_into_cell(self):
+        fused = _make_model(fused_rnn=True)
+        fused.load_state_dict(self.model.state_dict())
+
+        model = _make_model(fused_rnn=False)
+        model.load_state_dict(fused.state_dict())
+
+        torch.testing.assert_close(
+            self._outputs(model), self._outputs(fused))
+
+# EOF
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from unittest import mock
+
+import torch
+from torch.utils.data import DataLoader, TensorDataset
+
+from data_feeders import SequenceLengthCurriculum
+from experiments import _processes
+from models.tf_crnn import TFCRNN
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestSequenceLengthCurriculum', 'TestExperimentCurriculum']
+
+
+class TestSequenceLengthCurriculum(unittest.TestCase):
+
+    def setUp(self):
+        self.made = []
+
+    def _curriculum(self, **kwargs):
+        """Makes a curriculum that keeps the lengths of the\
+        data loaders that it makes.
+        """
+        def _make_data_loader(seq_len):
+            self.made.append(seq_len)
+            return 'data_loader_{}'.format(seq_len)
+
+        return SequenceLengthCurriculum(
+            make_data_loader=_make_data_loader, max_len=kwargs.pop('max_len', 100),
+            start_len=kwargs.pop('start_len', 10), **kwargs)
+
+    def _lengths(self, curriculum, epochs_waiting):
+        """Steps a curriculum over epochs, with the epochs without\
+        improvement of each, and returns the length after each.
+        """
+        lengths = []
+        for epoch, waiting in enumerate(epochs_waiting):
+            curriculum.step(epoch, waiting)
+            lengths.append(curriculum.seq_len)
+        return lengths
+
+    def test_growth_on_schedule(self):
+        curriculum = self._curriculum(growth_factor=2., every_n_epochs=2)
+        self.assertEqual(curriculum.seq_len, 10)
+        self.assertEqual(self._lengths(curriculum, [0] * 10),
+                         [10, 20, 20, 40, 40, 80, 80, 100, 100, 100])
+        self.assertTrue(curriculum.at_max_len)
+
+    def test_growth_on_plateau(self):
+        curriculum = self._curriculum(growth_factor=3., patience=2)
+        self.assertEqual(self._lengths(curriculum, [0, 1, 2, 0, 1, 5, 5, 5]),
+                         [10, 10, 30, 30, 30, 90, 100, 100])
+
+    def test_schedule_restarts_after_plateau(self):
+        curriculum = self._curriculum(every_n_epochs=3, patience=1)
+        self.assertEqual(self._lengths(curriculum, [0, 1, 0, 0, 0, 0]),
+                         [10, 20, 20, 20, 40, 40])
+
+    def test_small_growth_factor(self):
+        curriculum = self._curriculum(start_len=2, max_len=5,
+                                      growth_factor=1.1, every_n_epochs=1)
+        self.assertEqual(self._lengths(curriculum, [0] * 4), [3, 4, 5, 5])
+
+    def test_start_len_capped(self):
+        curriculum = self._curriculum(start_len=200, every_n_epochs=1)
+        self.assertEqual(curriculum.seq_len, 100)
+        self.assertTrue(curriculum.at_max_len)
+        self.assertFalse(curriculum.step(0, 10))
+
+    def test_data_loader_made_on_change(self):
+        curriculum = self._curriculum(every_n_epochs=1)
+        self.assertEqual(self.made, [])
+
+        self.assertEqual(curriculum.data_loader(), 'data_loader_10')
+        self.assertEqual(curriculum.data_loader(), 'data_loader_10')
+        self.assertEqual(self.made, [10])
+
+        curriculum.step(0, 0)
+        self.assertEqual(curriculum.data_loader(), 'data_loader_20')
+        self.assertEqual(self.made, [10, 20])
+
+        curriculum.reset_data_loader()
+        curriculum.data_loader()
+        self.assertEqual(self.made, [10, 20, 20])
+
+    def test_state_dict(self):
+        curriculum = self._curriculum(every_n_epochs=2)
+        self._lengths(curriculum, [0] * 3)
+
+        other = self._curriculum(every_n_epochs=2)
+        other.load_state_dict(curriculum.state_dict())
+        self.assertEqual(other.state_dict(), {'seq_len': 20, 'start_epoch': 2})
+        self.assertEqual(self._lengths(other, [0] * 4)[1:], self._lengths(curriculum, [0] * 4)[1:])
+
+    def test_settings(self):
+        with self.assertRaises(ValueError):
+            self._curriculum()
+        with self.assertRaises(ValueError):
+            self._curriculum(growth_factor=1., every_n_epochs=1)
+
+
+class _Stop(Exception):
+    pass
+
+
+class TestExperimentCurriculum(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = {
+            'data_loader': {
+                'batch_size': 4, 'data_version': 2017, 'data_fold': 1,
+                'seq_len': 32, 'hop': 16, 'group_by_length': False},
+            'sed_model': {
+                'cnn_channels': 8, 'cnn_dropout': 0., 'rnn_in_dim': 8,
+                'rnn_out_dim': 8, 'rnn_dropout': 0., 'nb_classes': 4},
+            'tf': {'gamma_factor': 10, 'mul_factor': 80, 'min_prob': .05, 'max_prob': .9},
+            'optimizer': {'lr': 1e-3},
+            'training': {
+                'epochs': 1, 'validation_patience': 1, 'grad_norm': 1.,
+                'curriculum_start_len': 8, 'curriculum_every_n_epochs': 1}}
+        self.made = []
+
+    def _data_loader(self, split, seq_len, hop, batch_size, **kwargs):
+        """Replaces the data loaders of the experiment, keeping\
+        the split, the sequence length, and the hop of each.
+        """
+        self.made.append((split, seq_len, hop))
+        return DataLoader(TensorDataset(
+            torch.randn(64 * 32 // seq_len, seq_len, 40),
+            torch.rand(64 * 32 // seq_len, seq_len, 4).gt(.5).float(),
+            torch.ones(64 * 32 // seq_len, seq_len)), batch_size=batch_size)
+
+    def _experiment(self):
+        """Runs the experiment up to the training, returning the\
+        keyword arguments of the training.
+        """
+        captured = {}
+
+        def _training(**kwargs):
+            captured.update(kwargs)
+            raise _Stop()
+
+        with mock.patch.object(_processes, 'get_tut_sed_data_loader', self._data_loader), \
+                mock.patch.object(_processes, 'training', _training), \
+                mock.patch.object(_processes, 'print_msg'), \
+                self.assertRaises(_Stop):
+            _processes.experiment(self.settings, TFCRNN, use_tf=True)
+
+        return captured
+
+    def test_only_start_length_loader(self):
+        kwargs = self._experiment()
+
+        self.assertEqual(self.made, [('training', 8, 4), ('validation', 32, 16)])
+        self.assertIs(kwargs['data_loader_training'], kwargs['curriculum'].data_loader())
+
+        # The scheduled sampling goes on as with the full length.
+        self.assertEqual(kwargs['model'].batch_counter, 16)
+
+    def test_batch_size_found_at_full_length(self):
+        self.settings['training'].update(find_batch_size=True, effective_batch_size=8)
+        lengths = []
+
+        def _step_memory(model, x, y, device, use_tf, precision):
+            lengths.append(x.size(1))
+            return x.size(0) * 1000
+
+        with mock.patch.object(_processes, '_step_memory', _step_memory):
+            self._experiment()
+
+        self.assertEqual(set(lengths), {32})
+        # The training data loader is made again for the found batch
+        # size, at the start length.
+        self.assertEqual([m for m in self.made if m[0] == 'training'],
+                         [('training', 8, 4)] * 2)
+
+    def test_needs_seq_len(self):
+        self.settings['data_loader']['seq_len'] = None
+        with self.assertRaises(ValueError):
+            _processes.experiment(self.settings, TFCRNN, use_tf=True)
+
+# EOF
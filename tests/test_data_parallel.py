@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from multiprocessing import get_context
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import torch
+from torch import distributed
+from torch.nn import BCEWithLogitsLoss
+
+from data_feeders import get_tut_sed_data_loader
+from experiments._processes import _sed_epoch
+from models.crnn import CRNN
+from tests._data import write_real_life_fold
+from tools.metrics import F1PerFrameAccumulator, ErrorRatePerFrameAccumulator
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestDataParallelValidation']
+
+
+def _validation_pass(rank, world_size, init_method, root_dir):
+    """A validation pass over the data of a process, with the\
+    values reduced over all the processes.
+
+    :param rank: The rank of the process.
+    :type rank: int
+    :param world_size: The amount of processes (1 for no data\
+                       parallel pass).
+    :type world_size: int
+    :param init_method: The URL for initializing the process group.
+    :type init_method: str
+    :param root_dir: The root directory of the dataset.
+    :type root_dir: str
+    :return: The objective, the F1 score, the error rate, and the\
+             amounts of frames and batches.
+    :rtype: float, float, float, int, int
+    """
+    torch.set_num_threads(1)
+    if world_size > 1:
+        distributed.init_process_group(
+            'gloo', init_method=init_method, rank=rank, world_size=world_size)
+
+    try:
+        data_loader = get_tut_sed_data_loader(
+            root_dir=root_dir, split='validation', is_test=True,
+            data_version=2017, data_fold=1, batch_size=2, shuffle=False,
+            drop_last=True, input_features_file_name='x.p',
+            target_values_input_name='y.p', seq_len=4,
+            num_replicas=world_size, rank=rank)
+
+        torch.manual_seed(0)
+        model = CRNN(cnn_channels=8, cnn_dropout=0., rnn_in_dim=8, rnn_out_dim=8,
+                     rnn_dropout=0., nb_classes=2).eval()
+
+        with torch.no_grad():
+            _, objective_values, f1_score, er_score, stats = _sed_epoch(
+                model=model, data_loader=data_loader,
+                objective=BCEWithLogitsLoss(reduction='none'), optimizer=None,
+                device='cpu', f1_metric=F1PerFrameAccumulator,
+                er_metric=ErrorRatePerFrameAccumulator, use_tf=False)
+    finally:
+        if world_size > 1:
+            distributed.destroy_process_group()
+
+    return objective_values.mean().item(), f1_score.item(), er_score.item(), \
+        stats['frames'], stats['batches']
+
+
+class TestDataParallelValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        # Nine sequences with no padding, of which the last one
+        # is dropped by the batches of two examples.
+        write_real_life_fold(self.tmp_dir.name, [20, 12, 4], nb_features=40, split='test')
+
+    def test_same_as_one_process(self):
+        one_process = _validation_pass(0, 1, None, self.tmp_dir.name)
+
+        process = partial(
+            _validation_pass, world_size=2,
+            init_method=Path(self.tmp_dir.name, 'init').resolve().as_uri(),
+            root_dir=self.tmp_dir.name)
+        with ProcessPoolExecutor(max_workers=2, mp_context=get_context('spawn')) as executor:
+            results = list(executor.map(process, range(2)))
+
+        self.assertEqual(one_process[3:], (8 * 4, 4))
+        for objective, f1_score, er_score, frames, batches in results:
+            self.assertAlmostEqual(objective, one_process[0], places=6)
+            self.assertEqual((f1_score, er_score), one_process[1:3])
+            self.assertEqual((frames, batches), one_process[3:])
+
+# EOF
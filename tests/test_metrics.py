@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import torch
+
+from tools.metrics import f1_per_frame, error_rate_per_frame, \
+    F1PerFrameAccumulator, ErrorRatePerFrameAccumulator
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestAccumulators']
+
+
+class TestAccumulators(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.y_hat = [torch.rand(4, 25, 6) for _ in range(5)]
+        self.y_true = [torch.rand(4, 25, 6).gt(.7).float() for _ in range(5)]
+
+    def _assert_equal(self, result, expected):
+        self.assertTrue(torch.equal(result, expected),
+                        '{} != {}'.format(result.item(), expected.item()))
+
+    def _check(self, accumulator, metric):
+        for y_hat, y_true in zip(self.y_hat, self.y_true):
+            accumulator.update(y_hat, y_true)
+
+        self._assert_equal(
+            accumulator.compute(),
+            metric(torch.cat(self.y_hat), torch.cat(self.y_true)))
+
+    def _check_masked(self, accumulator, metric, masks):
+        for y_hat, y_true, mask in zip(self.y_hat, self.y_true, masks):
+            accumulator.update(y_hat, y_true, mask)
+
+        mask = torch.cat(masks).bool()
+        self._assert_equal(
+            accumulator.compute(),
+            metric(torch.cat(self.y_hat)[mask], torch.cat(self.y_true)[mask]))
+
+    def _masks(self):
+        """Makes masks with padding at the end and, as the\
+        data loaders do, at the start of every window.
+        """
+        trailing = [torch.ones(4, 25) for _ in self.y_hat]
+        for mask in trailing:
+            mask[:, 20:] = 0
+
+        leading = [torch.arange(25).ge(torch.randint(0, 25, (4, 1))).float()
+                   for _ in self.y_hat]
+
+        return [trailing, leading]
+
+    def test_f1(self):
+        self._check(F1PerFrameAccumulator(), f1_per_frame)
+
+    def test_error_rate(self):
+        self._check(ErrorRatePerFrameAccumulator(), error_rate_per_frame)
+
+    def test_f1_masked(self):
+        for masks in self._masks():
+            self._check_masked(F1PerFrameAccumulator(), f1_per_frame, masks)
+
+    def test_error_rate_masked(self):
+        for masks in self._masks():
+            self._check_masked(ErrorRatePerFrameAccumulator(), error_rate_per_frame, masks)
+
+    def test_reset(self):
+        accumulator = F1PerFrameAccumulator()
+        accumulator.update(torch.ones(2, 3, 4), torch.zeros(2, 3, 4))
+        accumulator.reset()
+        self._check(accumulator, f1_per_frame)
+
+# EOF
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import torch
+from torch.nn import Module, BCEWithLogitsLoss
+from torch.optim import Adam, SGD
+from torch.utils.data import DataLoader, TensorDataset
+
+from data_feeders import get_tut_sed_data_loader
+from experiments._processes import _find_batch_size, _run_name, _carried_state, \
+    _sed_epoch, training, experiment
+from models.crnn import CRNN
+from models.tf_crnn import TFCRNN
+from tools.checkpoints import load_checkpoint
+from tools.metrics import F1PerFrameAccumulator, ErrorRatePerFrameAccumulator
+from tools.telemetry import TelemetrySink
+from tests._data import write_real_life_fold
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestFindBatchSize', 'TestCarriedState', 'TestGradientAccumulation',
+           'TestResume']
+
+
+class TestFindBatchSize(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = TFCRNN(
+            cnn_channels=8, cnn_dropout=0., rnn_in_dim=8, rnn_out_dim=8,
+            rnn_dropout=0., nb_classes=4, gamma_factor=10, mul_factor=80,
+            min_prob=.05, max_prob=.9)
+        self.data_loader = DataLoader(TensorDataset(
+            torch.randn(12, 16, 40), torch.rand(12, 16, 4).gt(.5).float(),
+            torch.ones(12, 16)), batch_size=4)
+
+    def test_scheduled_sampling_before_batch_counter(self):
+        schedules = []
+        scheduled_sampling_schedule = self.model.scheduled_sampling_schedule
+
+        def _schedule(*args, **kwargs):
+            schedule = scheduled_sampling_schedule(*args, **kwargs)
+            schedules.append(schedule)
+            return schedule
+
+        self.model.scheduled_sampling_schedule = _schedule
+        state_dict = {k: v.clone() for k, v in self.model.state_dict().items()}
+
+        batch_size = _find_batch_size(
+            model=self.model, data_loader=self.data_loader, device='cpu',
+            use_tf=True, precision='float32', max_batch_size=8)
+
+        self.assertTrue(1 <= batch_size <= 8)
+        self.assertGreater(len(schedules), 0)
+        self.assertFalse(any(schedule.isnan().any().item() for schedule in schedules))
+
+        self.assertEqual(self.model.batch_counter, 0)
+        self.assertEqual(self.model.iteration, 0)
+        for k, v in self.model.state_dict().items():
+            torch.testing.assert_close(v, state_dict[k])
+
+
+class _LastFrame(Module):
+    """Model that returns the last input feature of every example\
+    as its state and keeps the first input feature and the state\
+    that it is called with.
+    """
+    def __init__(self):
+        super(_LastFrame, self).__init__()
+        self.calls = []
+
+    def forward(self, x, state=None, return_state=False):
+        self.calls.append((x[:, 0, :1].clone(), state))
+        return x[..., :2].mul(0), (x[:, -1, :1].clone(),)
+
+
+class TestCarriedState(unittest.TestCase):
+
+    def test_reset_slots_are_zeroed(self):
+        state = (torch.arange(1., 7.).view(3, 2), torch.ones(3, 1))
+
+        self.assertIsNone(_carried_state(None, [False, False], 'cpu'))
+        self.assertIsNone(_carried_state(state, [True, True, True], 'cpu'))
+
+        h, tf = _carried_state(state, [False, True, False], 'cpu')
+        self.assertEqual(h.tolist(), [[1., 2.], [0., 0.], [5., 6.]])
+        self.assertEqual(tf.tolist(), [[1.], [0.], [1.]])
+
+        # The last batches may have less slots.
+        h, tf = _carried_state(state, [True, False], 'cpu')
+        self.assertEqual(h.tolist(), [[0., 0.], [3., 4.]])
+        self.assertEqual(tf.tolist(), [[0.], [1.]])
+
+    def test_state_is_carried_over_the_recordings(self):
+        with TemporaryDirectory() as tmp_dir:
+            write_real_life_fold(tmp_dir, [10, 3, 16, 8, 5])
+            data_loader = get_tut_sed_data_loader(
+                root_dir=tmp_dir, split='training', is_test=False,
+                data_version=2017, data_fold=1, batch_size=3, shuffle=True,
+                drop_last=False, input_features_file_name='x.p',
+                target_values_input_name='y.p', seq_len=4, stateful=True)
+
+            model = _LastFrame()
+            _sed_epoch(
+                model=model, data_loader=data_loader, objective=None,
+                optimizer=None, device='cpu', f1_metric=F1PerFrameAccumulator,
+                er_metric=ErrorRatePerFrameAccumulator, is_testing=True, use_tf=False)
+
+        resets = data_loader.batch_sampler.resets
+        self.assertEqual(len(model.calls), len(resets))
+        self.assertIsNone(model.calls[0][1])
+
+        for (first_frame, state), batch_resets in zip(model.calls, resets):
+            if state is None:
+                self.assertTrue(all(batch_resets))
+                continue
+            # The state is the frame before the first one of each slot,
+            # except for the slots that start a recording.
+            expected = torch.where(torch.tensor(batch_resets)[:, None],
+                                   torch.zeros(len(batch_resets), 1), first_frame - 1)
+            self.assertEqual(state[0].tolist(), expected.tolist())
+
+
+class TestGradientAccumulation(unittest.TestCase):
+
+    def setUp(self):
+        generator = torch.Generator().manual_seed(0)
+        x = torch.randn(8, 16, 40, generator=generator)
+        y = torch.rand(8, 16, 4, generator=generator).gt(.5).float()
+        # Every example has a different amount of not padded frames.
+        mask = torch.arange(16).expand(8, 16).ge(torch.arange(8).mul(2)[:, None]).float()
+        self.data = TensorDataset(x.mul(mask[..., None]), y, mask)
+
+    def _step(self, batch_size, accumulation_steps):
+        """Makes one optimizer step, over all the examples, and\
+        returns the parameters of the model after it.
+        """
+        torch.manual_seed(0)
+        # In evaluation mode, batch normalization does not depend
+        # on the batches and there is no dropout.
+        model = CRNN(cnn_channels=8, cnn_dropout=0., rnn_in_dim=8, rnn_out_dim=8,
+                     rnn_dropout=0., nb_classes=4).eval()
+        objective_values = _sed_epoch(
+            model=model, data_loader=DataLoader(self.data, batch_size=batch_size),
+            objective=BCEWithLogitsLoss(reduction='none'),
+            optimizer=SGD(model.parameters(), lr=1.), device='cpu',
+            f1_metric=F1PerFrameAccumulator, er_metric=ErrorRatePerFrameAccumulator,
+            use_tf=False, grad_norm=.01, accumulation_steps=accumulation_steps)[1]
+        self.assertEqual(len(objective_values), len(self.data) // batch_size)
+        return {k: v.clone() for k, v in model.state_dict().items()}
+
+    def test_same_as_one_batch(self):
+        one_batch = self._step(batch_size=8, accumulation_steps=1)
+        accumulated = self._step(batch_size=2, accumulation_steps=4)
+        for k, v in one_batch.items():
+            torch.testing.assert_close(accumulated[k], v, msg=k)
+
+
+def _assert_same(test_case, a, b, path='checkpoint'):
+    """Asserts that two (nested) checkpoint values are equal."""
+    if isinstance(a, dict):
+        test_case.assertEqual(sorted(a.keys()), sorted(b.keys()), path)
+        for k in a:
+            _assert_same(test_case, a[k], b[k], '{}.{}'.format(path, k))
+    elif isinstance(a, (list, tuple)):
+        test_case.assertEqual(len(a), len(b), path)
+        for i, (a_i, b_i) in enumerate(zip(a, b)):
+            _assert_same(test_case, a_i, b_i, '{}[{}]'.format(path, i))
+    elif isinstance(a, torch.Tensor):
+        test_case.assertTrue(torch.equal(a, b), path)
+    elif isinstance(a, np.ndarray):
+        test_case.assertTrue(np.array_equal(a, b), path)
+    else:
+        test_case.assertEqual(a, b, path)
+
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+        generator = torch.Generator().manual_seed(0)
+        self.data = [TensorDataset(
+            torch.randn(n, 16, 40, generator=generator),
+            torch.rand(n, 16, 4, generator=generator).gt(.7).float(),
+            torch.ones(n, 16)) for n in [12, 8]]
+
+    def _training(self, checkpoint_dir, epochs, resume=False, **kwargs):
+        """Trains a new model, with the same initialization\
+        for every run that does not resume.
+        """
+        torch.manual_seed(0)
+        model = TFCRNN(
+            cnn_channels=8, cnn_dropout=.2, rnn_in_dim=8, rnn_out_dim=8,
+            rnn_dropout=.2, nb_classes=4, gamma_factor=10, mul_factor=80,
+            min_prob=.05, max_prob=.9)
+        data_loader_training = DataLoader(self.data[0], batch_size=4, shuffle=True)
+        model.batch_counter = len(data_loader_training)
+
+        if resume:
+            # The state must come from the checkpoint, not from here.
+            torch.manual_seed(1)
+            np.random.seed(1)
+            model.iteration = 1
+
+        training(
+            model=model, data_loader_training=data_loader_training,
+            optimizer=Adam(model.parameters(), lr=kwargs.get('lr', 1e-3)),
+            objective=BCEWithLogitsLoss(reduction='none'),
+            f1_metric=F1PerFrameAccumulator, er_metric=ErrorRatePerFrameAccumulator,
+            epochs=epochs, device='cpu', grad_norm=1., use_tf=True,
+            data_loader_validation=DataLoader(self.data[1], batch_size=4),
+            validation_patience=kwargs.get('validation_patience', 10),
+            checkpoint_dir=Path(self.tmp_dir.name, checkpoint_dir),
+            resume=resume, background_saving=False, telemetry=TelemetrySink([]))
+
+        return load_checkpoint(Path(self.tmp_dir.name, checkpoint_dir, 'last.pt'))
+
+    def test_resume_reproduces_the_run(self):
+        uninterrupted = self._training('uninterrupted', epochs=4)
+
+        interrupted = self._training('interrupted', epochs=2)
+        self.assertEqual(interrupted['epoch'], 1)
+        resumed = self._training('interrupted', epochs=4, resume=True)
+
+        self.assertEqual(uninterrupted['epoch'], 3)
+        self.assertEqual(uninterrupted['model_attributes'], {
+            'iteration': 4 * 3 * 16, 'batch_counter': 3})
+        _assert_same(self, resumed, uninterrupted)
+
+    def test_resume_after_early_stopping(self):
+        kwargs = {'lr': .5, 'validation_patience': 1}
+        uninterrupted = self._training('uninterrupted', epochs=10, **kwargs)
+        self.assertTrue(uninterrupted['stopped'])
+        stopped_epoch = uninterrupted['epoch']
+
+        self._training('interrupted', epochs=stopped_epoch, **kwargs)
+        resumed = self._training('interrupted', epochs=10, resume=True, **kwargs)
+        _assert_same(self, resumed, uninterrupted)
+
+        # Resuming a stopped run does not train any more.
+        again = self._training('interrupted', epochs=10, resume=True, **kwargs)
+        _assert_same(self, again, uninterrupted)
+
+    def test_run_name(self):
+        settings = {
+            'data_loader': {'data_version': 2017, 'data_fold': 1},
+            'sed_model': {'cnn_channels': 8}, 'tf': {'min_prob': .05},
+            'baseline': {'fused_rnn': False}, 'optimizer': {'lr': 1e-4},
+            'training': {'checkpoint_dir': 'checkpoints'}}
+
+        name = _run_name(settings, use_tf=True)
+        self.assertRegex(name, r'^2017_fold_1_tf_[0-9a-f]{8}$')
+
+        self.assertEqual(name, _run_name(dict(
+            settings, training={'checkpoint_dir': 'other'},
+            baseline={'fused_rnn': True}), use_tf=True))
+        for section, value in [('sed_model', {'cnn_channels': 16}),
+                               ('tf', {'min_prob': .1}),
+                               ('optimizer', {'lr': 1e-3})]:
+            self.assertNotEqual(name, _run_name(dict(settings, **{section: value}), use_tf=True))
+
+    def test_resume_needs_checkpoint_dir(self):
+        with self.assertRaises(ValueError):
+            experiment({'training': {'checkpoint_dir': None}}, TFCRNN,
+                       use_tf=True, resume=True)
+
+# EOF
@@ -0,0 +1,178 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from tempfile import TemporaryDirectory
+
+import numpy as np
+
+from data_feeders._real_life_dataset import make_windows, cut_window
+from data_feeders._samplers import LengthGroupedBatchSampler, StatefulBatchSampler
+from data_feeders._tut_sed_real_life_2017 import TUTSEDRealLife2017
+from tests._data import write_real_life_fold
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestWindows', 'TestSEDRealLife', 'TestStatefulBatchSampler']
+
+
+class TestWindows(unittest.TestCase):
+
+    def test_amount_of_windows(self):
+        seq_len = 8
+        for hop in [1, 3, 4, 8]:
+            for length in [1, 5, 8, 9, 10, 11, 20, 31]:
+                windows = make_windows(np.array([length]), seq_len, hop)
+                starts = windows[:, 1]
+
+                if length <= seq_len:
+                    expected = 1
+                else:
+                    expected = -(-(length - seq_len) // hop) + 1
+
+                self.assertEqual(len(windows), expected, (hop, length))
+                # The last sequence ends at the end of the recording, the
+                # first one is padded less than a hop, and the sequences
+                # start every `hop` feature vectors.
+                self.assertEqual(starts[-1] + seq_len, length)
+                self.assertTrue(np.all(np.diff(starts) == hop))
+                if length >= seq_len:
+                    self.assertTrue(-hop < starts[0] <= 0)
+                else:
+                    self.assertEqual(starts[0], length - seq_len)
+
+    def test_recordings(self):
+        windows = make_windows(np.array([10, 3, 16]), 8, 4)
+        self.assertEqual(windows.dtype, np.int64)
+        self.assertEqual(windows[:, 0].tolist(), [0, 0, 1, 2, 2, 2])
+        self.assertEqual(windows[:, 1].tolist(), [-2, 2, -5, 0, 4, 8])
+
+    def test_cut_window(self):
+        recording = np.arange(1, 31, dtype=np.float64).reshape(10, 3)
+
+        sequence = cut_window(recording, -2, 8)
+        self.assertEqual(sequence.dtype, np.float32)
+        self.assertTrue(np.all(sequence[:2] == 0))
+        self.assertTrue(np.array_equal(sequence[2:], recording[:6]))
+
+        sequence = cut_window(recording, 2, 8)
+        self.assertTrue(np.array_equal(sequence, recording[2:]))
+
+
+class TestSEDRealLife(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.lengths = [10, 3, 16, 8, 5]
+        self.x, self.y = write_real_life_fold(self.tmp_dir.name, self.lengths)
+        self.dataset = TUTSEDRealLife2017(
+            root_dir=self.tmp_dir.name, data_fold=1,
+            input_features_file_name='x.p', target_values_input_name='y.p',
+            is_test=False, seq_len=8, hop=4)
+
+    def test_leading_padding_mask(self):
+        self.assertEqual(len(self.dataset), 8)
+
+        for item, (recording, start) in enumerate(self.dataset.windows):
+            x, y, mask = self.dataset[item]
+            pad = max(-start, 0)
+
+            self.assertEqual(mask.tolist(), [0.] * pad + [1.] * (8 - pad))
+            self.assertEqual(self.dataset.valid_lengths[item], 8 - pad)
+            self.assertTrue(np.all(x[:pad] == 0))
+            self.assertTrue(np.all(y[:pad] == 0))
+            self.assertTrue(np.array_equal(x[pad:], self.x[recording][start + pad:start + 8]))
+            self.assertTrue(np.array_equal(y[pad:], self.y[recording][start + pad:start + 8]))
+
+    def test_valid_lengths(self):
+        # Recordings shorter than the sequences have their length,
+        # the others are padded only in their first sequence.
+        self.assertEqual(self.dataset.valid_lengths.tolist(),
+                         [6, 8, 3, 8, 8, 8, 8, 5])
+
+    def test_length_grouping(self):
+        valid_lengths = self.dataset.valid_lengths
+        for shuffle in [False, True]:
+            sampler = LengthGroupedBatchSampler(
+                valid_lengths, batch_size=3, shuffle=shuffle, drop_last=False)
+            batches = list(sampler)
+
+            self.assertEqual(len(batches), len(sampler))
+            self.assertEqual(sorted(i for batch in batches for i in batch),
+                             list(range(len(valid_lengths))))
+
+            batch_lengths = sorted([sorted(valid_lengths[batch].tolist()) for batch in batches])
+            self.assertEqual(batch_lengths, [[3, 5, 6], [8, 8], [8, 8, 8]])
+
+        sampler = LengthGroupedBatchSampler(
+            valid_lengths, batch_size=3, shuffle=False, drop_last=True)
+        self.assertEqual([valid_lengths[batch].tolist() for batch in sampler],
+                         [[3, 5, 6], [8, 8, 8]])
+
+
+class TestStatefulBatchSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.x, _ = write_real_life_fold(self.tmp_dir.name, [10, 3, 16, 8, 5])
+        self.dataset = TUTSEDRealLife2017(
+            root_dir=self.tmp_dir.name, data_fold=1,
+            input_features_file_name='x.p', target_values_input_name='y.p',
+            is_test=False, seq_len=4, hop=None)
+        self.first_windows = {recording: i for i, (recording, _) in
+                              reversed(list(enumerate(self.dataset.windows)))}
+
+    def _sampler(self, batch_size=3, shuffle=False, drop_last=False):
+        return StatefulBatchSampler(
+            self.dataset.windows, batch_size=batch_size,
+            shuffle=shuffle, drop_last=drop_last)
+
+    def test_stream_continuity(self):
+        for shuffle in [False, True]:
+            sampler = self._sampler(shuffle=shuffle)
+            batches = list(sampler)
+
+            self.assertEqual(len(batches), len(sampler))
+            self.assertEqual(sorted(i for batch in batches for i in batch),
+                             list(range(len(self.dataset))))
+
+            # A slot that is not reset continues its recording exactly
+            # where the sequence of the previous batch stopped.
+            for b in range(1, len(batches)):
+                for slot, reset in enumerate(sampler.resets[b]):
+                    if reset:
+                        continue
+                    previous = self.dataset[batches[b - 1][slot]][0]
+                    current = self.dataset[batches[b][slot]][0]
+                    self.assertEqual(current[0, 0], previous[-1, 0] + 1, (shuffle, b, slot))
+
+    def test_resets(self):
+        for shuffle in [False, True]:
+            sampler = self._sampler(shuffle=shuffle)
+            batches = list(sampler)
+
+            self.assertEqual([len(r) for r in sampler.resets],
+                             [len(batch) for batch in batches])
+            for b, batch in enumerate(batches):
+                for slot, item in enumerate(batch):
+                    recording = self.dataset.windows[item][0]
+                    starts_recording = self.first_windows[recording] == item
+                    self.assertEqual(sampler.resets[b][slot], b == 0 or starts_recording,
+                                     (shuffle, b, slot))
+
+    def test_drop_last(self):
+        sampler = self._sampler(batch_size=5, drop_last=True)
+        batches = list(sampler)
+        self.assertEqual(len(batches), len(self.dataset) // 5)
+        self.assertTrue(all(len(batch) == 5 for batch in batches))
+
+        # The slots that run out are the last ones of a batch.
+        sampler = self._sampler(batch_size=5, drop_last=False)
+        batches = list(sampler)
+        self.assertEqual([len(batch) for batch in batches], [4, 4, 4])
+        self.assertEqual(sorted(i for batch in batches for i in batch),
+                         list(range(len(self.dataset))))
+
+# EOF
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import torch
+from torch.nn import GRUCell
+
+from models._modules.recurrent import HoistedInputGRUCell
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestHoistedInputGRUCell']
+
+
+class TestHoistedInputGRUCell(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.b_size, self.t_steps = 3, 7
+        self.feature_size, self.label_size, self.hidden_size = 5, 4, 6
+
+        self.gru_cell = GRUCell(
+            self.feature_size + self.label_size, self.hidden_size)
+        self.cell = HoistedInputGRUCell(
+            self.feature_size, self.label_size, self.hidden_size)
+        self.cell.load_state_dict(self.gru_cell.state_dict())
+
+        self.features = torch.randn(self.b_size, self.t_steps, self.feature_size)
+        self.labels = torch.randn(self.b_size, self.t_steps, self.label_size)
+        self.h = torch.randn(self.b_size, self.hidden_size)
+
+    def _gru_cell_outputs(self):
+        h, outputs = self.h, []
+        for t_step in range(self.t_steps):
+            h = self.gru_cell(torch.cat(
+                [self.features[:, t_step], self.labels[:, t_step]], dim=-1), h)
+            outputs.append(h)
+        return torch.stack(outputs, dim=1)
+
+    def test_state_dict_keys(self):
+        self.assertEqual(
+            list(self.cell.state_dict().keys()),
+            list(self.gru_cell.state_dict().keys()))
+
+    def test_step_matches_gru_cell(self):
+        projected = self.cell.project_features(self.features)
+        label_weight = self.cell.label_weight()
+
+        h, outputs = self.h, []
+        for t_step in range(self.t_steps):
+            h = self.cell(projected[:, t_step], h,
+                          self.labels[:, t_step], label_weight)
+            outputs.append(h)
+
+        torch.testing.assert_close(
+            torch.stack(outputs, dim=1), self._gru_cell_outputs())
+
+    def test_sequence_matches_gru_cell(self):
+        torch.testing.assert_close(
+            self.cell.forward_sequence(self.features, self.labels, self.h),
+            self._gru_cell_outputs())
+
+# EOF
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+from time import sleep
+from unittest import mock
+
+import torch
+
+from tools.telemetry import ConsolePrinter, PhaseTimer
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestConsolePrinter', 'TestPhaseTimer']
+
+
+def _record(phase, epoch, validated=True):
+    """Makes a minimal telemetry record.
+
+    :param phase: The phase (`training` or `validation`).
+    :type phase: str
+    :param epoch: The epoch.
+    :type epoch: int
+    :param validated: Is the epoch validated?
+    :type validated: bool
+    :return: The record.
+    :rtype: dict
+    """
+    return {'phase': phase, 'epoch': epoch, 'start': 0., 'end': 1.,
+            'loss': 1., 'f1': 0., 'er': 1., 'data_wait': 0.,
+            'validated': validated}
+
+
+class TestConsolePrinter(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('tools.telemetry.print_training_results')
+        self.print_training_results = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.printer = ConsolePrinter()
+
+    def _printed(self):
+        return [(c[1]['epoch'], c[1]['validation_loss'] is not None)
+                for c in self.print_training_results.call_args_list]
+
+    def test_background_validation_in_epoch_order(self):
+        # Validation every second epoch, with the results of
+        # epoch 1 coming after the training of epoch 2.
+        for record in [_record('training', 0, False),
+                       _record('training', 1, True),
+                       _record('training', 2, False),
+                       _record('validation', 1),
+                       _record('training', 3, True),
+                       _record('validation', 3)]:
+            self.printer(record)
+
+        self.assertEqual(
+            self._printed(), [(0, False), (1, True), (2, False), (3, True)])
+
+    def test_waiting_for_validation(self):
+        self.printer(_record('training', 0, True))
+        self.printer(_record('training', 1, False))
+        self.assertEqual(self._printed(), [])
+
+        self.printer(_record('validation', 0))
+        self.assertEqual(self._printed(), [(0, True), (1, False)])
+
+    def test_flush(self):
+        self.printer(_record('training', 0, True))
+        self.printer(_record('training', 1, True))
+        self.printer(_record('validation', 1))
+        self.assertEqual(self._printed(), [])
+
+        self.printer.flush()
+        self.assertEqual(self._printed(), [(0, False), (1, True)])
+
+        self.printer.flush()
+        self.assertEqual(len(self._printed()), 2)
+
+
+class TestPhaseTimer(unittest.TestCase):
+
+    def test_cpu(self):
+        timer = PhaseTimer('cpu')
+        with timer.time('forward'):
+            sleep(.01)
+        with timer.time('forward'):
+            sleep(.01)
+        timer.add('data_wait', 1.)
+
+        self.assertGreaterEqual(timer.totals['forward'], .02)
+        self.assertEqual(timer.totals['data_wait'], 1.)
+        self.assertEqual(timer.totals['backward'], 0.)
+
+    @unittest.skipUnless(torch.cuda.is_available(), 'Needs a GPU.')
+    def test_cuda_does_not_synchronize_the_phases(self):
+        timer = PhaseTimer('cuda')
+        x = torch.randn(1024, 1024, device='cuda')
+
+        with mock.patch('torch.cuda.synchronize') as synchronize:
+            for _ in range(3):
+                with timer.time('forward'):
+                    x = x.mm(x).div_(x.norm())
+            synchronize.assert_not_called()
+
+        self.assertGreater(timer.totals['forward'], 0.)
+        self.assertEqual(timer.totals['backward'], 0.)
+
+# EOF
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import torch
+
+from models.tf_crnn import TFCRNN
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['TestScheduledSampling', 'TestParallelSampling']
+
+
+def _make_model(parallel_sampling=False):
+    """Makes a small TF CRNN model, with the scheduled\
+    sampling settings of the synthetic data set.
+
+    :param parallel_sampling: Use parallel scheduled sampling?
+    :type parallel_sampling: bool
+    :return: The model.
+    :rtype: models.tf_crnn.TFCRNN
+    """
+    model = TFCRNN(
+        cnn_channels=8, cnn_dropout=0., rnn_in_dim=8, rnn_out_dim=8,
+        rnn_dropout=0., nb_classes=4, gamma_factor=10, mul_factor=80,
+        min_prob=.05, max_prob=.9, parallel_sampling=parallel_sampling)
+    model.batch_counter = 50
+    return model
+
+
+class TestScheduledSampling(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = _make_model()
+
+    def test_schedule_matches_scalar(self):
+        t_steps = 5000
+        self.model.iteration = 123
+
+        schedule = self.model.scheduled_sampling_schedule(t_steps)
+
+        scalar = []
+        for t_step in range(t_steps):
+            self.model.iteration = 123 + t_step
+            scalar.append(self.model.scheduled_sampling())
+
+        self.assertEqual(schedule.size(), (t_steps, ))
+        torch.testing.assert_close(
+            schedule, torch.tensor(scalar, dtype=schedule.dtype))
+
+    def test_schedule_does_not_advance_iteration(self):
+        self.model.iteration = 10
+        self.model.scheduled_sampling_schedule(100)
+        self.model.scheduled_sampling_flags(4, 100)
+        self.assertEqual(self.model.iteration, 10)
+
+    def test_flags_rate(self):
+        b_size, t_steps = 512, 64
+        for iteration in [0, 2000, 4000, 100000]:
+            self.model.iteration = iteration
+
+            prob = self.model.scheduled_sampling_schedule(t_steps)
+            flags = self.model.scheduled_sampling_flags(b_size, t_steps)
+
+            self.assertEqual(flags.size(), (b_size, t_steps, 1))
+            self.assertEqual(flags.dtype, torch.bool)
+            # True selects the ground truth, with the probability
+            # returned by the schedule.
+            self.assertAlmostEqual(
+                flags.float().mean().item(), prob.mean().item(), delta=.01)
+
+
+class TestParallelSampling(unittest.TestCase):
+
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = _make_model(parallel_sampling=True)
+        self.model.iteration = 2000
+        self.b_size, self.t_steps = 64, 32
+        self.x = torch.randn(self.b_size, self.t_steps, 40)
+        self.y = torch.rand(self.b_size, self.t_steps, 4).gt(.5).float()
+
+        self.passes, self.flags = [], []
+        forward_sequence = self.model.rnn.forward_sequence
+        scheduled_sampling_flags = self.model.scheduled_sampling_flags
+
+        def _forward_sequence(features, labels=None, h=None, parameters=None):
+            outputs = forward_sequence(features, labels, h, parameters)
+            self.passes.append({
+                'labels': labels, 'outputs': outputs,
+                'grad_enabled': torch.is_grad_enabled()})
+            return outputs
+
+        def _scheduled_sampling_flags(*args, **kwargs):
+            self.flags.append(scheduled_sampling_flags(*args, **kwargs))
+            return self.flags[-1]
+
+        self.model.rnn.forward_sequence = _forward_sequence
+        self.model.scheduled_sampling_flags = _scheduled_sampling_flags
+
+    def test_passes(self):
+        prob = self.model.scheduled_sampling_schedule(self.t_steps)
+        outputs = self.model(self.x, self.y)
+
+        self.assertEqual(outputs.size(), (self.b_size, self.t_steps, 4))
+        self.assertEqual(self.model.iteration, 2000 + self.t_steps)
+        self.assertEqual(len(self.passes), 2)
+        self.assertEqual(len(self.flags), 1)
+
+        first, second = self.passes
+        for a_pass in self.passes:
+            self.assertEqual(a_pass['outputs'].size(), (self.b_size, self.t_steps, 8))
+            self.assertEqual(a_pass['labels'].size(), (self.b_size, self.t_steps, 4))
+
+        # The first pass uses the shifted ground truth values,
+        # without keeping the graph.
+        self.assertFalse(first['grad_enabled'])
+        self.assertFalse(first['outputs'].requires_grad)
+        self.assertTrue(torch.equal(first['labels'][:, 1:], self.y[:, :-1]))
+        self.assertTrue(torch.equal(first['labels'][:, 0], torch.zeros(self.b_size, 4)))
+
+        # The second pass uses the ground truth values where the
+        # flags are True and the predictions of the first pass
+        # where they are False.
+        self.assertTrue(second['grad_enabled'])
+        self.assertTrue(second['outputs'].requires_grad)
+
+        flags = self.flags[0]
+        self.assertEqual(flags.size(), (self.b_size, self.t_steps, 1))
+        self.assertAlmostEqual(
+            flags.float().mean().item(), prob.mean().item(), delta=.02)
+
+        predictions = self.model.classifier(
+            first['outputs']).sigmoid().gt(.5).float()
+        self.assertTrue(torch.equal(
+            second['labels'],
+            torch.where(flags, first['labels'], torch.cat(
+                [torch.zeros(self.b_size, 1, 4), predictions[:, :-1]], dim=1))))
+
+    def test_gradients(self):
+        self.model(self.x, self.y).sum().backward()
+        for name, parameter in self.model.named_parameters():
+            self.assertIsNotNone(parameter.grad, name)
+
+    def test_no_ground_truth_is_autoregressive(self):
+        with torch.no_grad():
+            outputs = self.model(self.x, None)
+
+        self.assertEqual(outputs.size(), (self.b_size, self.t_steps, 4))
+        self.assertEqual(self.passes, [])
+        self.assertEqual(self.model.iteration, 2000)
+
+# EOF
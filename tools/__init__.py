@@ -1,12 +1,14 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-from tools import printing, file_io, metrics, various
+from tools import printing, file_io, metrics, various, checkpoints, \
+    telemetry, profiling
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
 __all__ = [
-    'printing', 'file_io', 'metrics', 'various'
+    'printing', 'file_io', 'metrics', 'various', 'checkpoints',
+    'telemetry', 'profiling'
 ]
 
 # EOF
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import random
+from pathlib import Path
+from os import getpid, replace
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['get_rng_states', 'set_rng_states',
+           'save_checkpoint', 'load_checkpoint', 'ModelSnapshot']
+
+
+def get_rng_states():
+    """Returns the states of the random number generators\
+    of Python, numpy, and PyTorch.
+
+    :return: The states of the random number generators.
+    :rtype: dict
+    """
+    return {
+        'python': random.getstate(),
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+        'cuda': torch.cuda.get_rng_state_all() if torch.cuda.is_available() else []}
+
+
+def set_rng_states(rng_states):
+    """Sets the states of the random number generators of\
+    Python, numpy, and PyTorch.
+
+    :param rng_states: The states, as returned by\
+                       :func:`get_rng_states`.
+    :type rng_states: dict
+    """
+    random.setstate(rng_states['python'])
+    np.random.set_state(rng_states['numpy'])
+    torch.set_rng_state(rng_states['torch'])
+    if torch.cuda.is_available() and len(rng_states['cuda']) > 0:
+        torch.cuda.set_rng_state_all(rng_states['cuda'])
+
+
+def save_checkpoint(checkpoint, file_path):
+    """Saves a checkpoint.
+
+    The checkpoint is first written to a temporary file\
+    and then moved to its place, so an interrupted saving\
+    does not destroy the previous checkpoint.
+
+    :param checkpoint: The checkpoint.
+    :type checkpoint: dict
+    :param file_path: The path of the checkpoint file.
+    :type file_path: pathlib.Path|str
+    """
+    file_path = Path(file_path)
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name('{}.{}.tmp'.format(file_path.name, getpid()))
+    torch.save(checkpoint, str(tmp_path))
+    replace(str(tmp_path), str(file_path))
+
+
+def load_checkpoint(file_path):
+    """Loads a checkpoint, on the CPU.
+
+    :param file_path: The path of the checkpoint file.
+    :type file_path: pathlib.Path|str
+    :return: The checkpoint, or None if the file does not exist.
+    :rtype: dict|None
+    """
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return None
+    return torch.load(str(file_path), map_location='cpu', weights_only=False)
+
+
+class ModelSnapshot(object):
+    def __init__(self, file_path=None, background_saving=True):
+        """Keeps a snapshot of the parameters of a model (e.g. the\
+        best model so far) in a reusable CPU buffer.
+
+        The buffer is allocated once, in pinned memory if there is\
+        a GPU, and the parameters are copied to it without waiting\
+        for the copies to finish. If `file_path` is specified, every\
+        snapshot is also saved there, on a background thread if\
+        `background_saving` is set.
+
+        :param file_path: The path for saving the snapshots\
+                          (None for not saving).
+        :type file_path: pathlib.Path|str|None
+        :param background_saving: Save the snapshots on a\
+                                  background thread?
+        :type background_saving: bool
+        """
+        super(ModelSnapshot, self).__init__()
+        self.file_path = file_path
+        self.epoch = -1
+        self._buffer = None
+        self._copied = None
+        self._saving = None
+        self._executor = ThreadPoolExecutor(max_workers=1) \
+            if file_path is not None and background_saving else None
+
+    def _wait(self):
+        """Waits for the copies and the saving of the\
+        previous snapshot to finish.
+        """
+        if self._saving is not None:
+            self._saving.result()
+            self._saving = None
+        if self._copied is not None:
+            self._copied.synchronize()
+            self._copied = None
+
+    def _save(self, copied):
+        """Saves the current snapshot.
+
+        :param copied: The event of the copies of the snapshot\
+                       (None if there is nothing to wait for).
+        :type copied: torch.cuda.Event|None
+        """
+        if copied is not None:
+            copied.synchronize()
+        save_checkpoint({'model': self._buffer, 'epoch': self.epoch}, self.file_path)
+
+    def take(self, model, epoch):
+        """Takes a snapshot of the parameters of a model.
+
+        :param model: The model.
+        :type model: torch.nn.Module
+        :param epoch: The epoch of the snapshot.
+        :type epoch: int
+        """
+        self.copy_from(model.state_dict(), epoch)
+
+    def copy_from(self, state_dict, epoch):
+        """Copies a state dict to the snapshot.
+
+        :param state_dict: The state dict.
+        :type state_dict: dict[str, torch.Tensor]
+        :param epoch: The epoch of the snapshot.
+        :type epoch: int
+        """
+        self._wait()
+
+        if self._buffer is None:
+            pin_memory = torch.cuda.is_available()
+            self._buffer = OrderedDict(
+                (k, torch.empty(v.size(), dtype=v.dtype, device='cpu',
+                                pin_memory=pin_memory))
+                for k, v in state_dict.items())
+
+        on_gpu = False
+        for k, v in state_dict.items():
+            self._buffer[k].copy_(v.detach(), non_blocking=True)
+            on_gpu = on_gpu or v.is_cuda
+
+        if on_gpu:
+            self._copied = torch.cuda.Event()
+            self._copied.record()
+
+        self.epoch = epoch
+
+        if self.file_path is not None:
+            if self._executor is None:
+                self._save(self._copied)
+            else:
+                self._saving = self._executor.submit(self._save, self._copied)
+
+    def state_dict(self):
+        """Returns the snapshot, after its copies finish.
+
+        :return: The snapshot, or None if there is no snapshot.
+        :rtype: collections.OrderedDict[str, torch.Tensor]|None
+        """
+        if self._copied is not None:
+            self._copied.synchronize()
+            self._copied = None
+        return self._buffer
+
+    def close(self):
+        """Waits for any saving to finish and stops the\
+        background thread.
+        """
+        self._wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+
+# EOF
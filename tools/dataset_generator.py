@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pickle
+from pathlib import Path
+from argparse import ArgumentParser
+
+import numpy as np
+
+from tools.printing import print_msg
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['make_recording', 'generate_synthetic',
+           'generate_real_life', 'generate_dataset', 'main']
+
+# Approximate sizes of the TUT datasets, for `scale` = 1. Lengths
+# are in feature vectors (i.e. frames of 20 ms).
+_presets = {
+    'synthetic': {
+        'nb_classes': 16,
+        'nb_sequences': {'training': 600, 'validation': 200, 'testing': 200},
+        'seq_len': 1024,
+        'input_features_file_name': 'features_normalized.npy',
+        'target_values_input_name': 'target_values.npy'},
+    'real_life_2016/home': {
+        'nb_classes': 11, 'nb_recordings': 10,
+        'min_len': 9000, 'max_len': 15000},
+    'real_life_2016/residential_area': {
+        'nb_classes': 11, 'nb_recordings': 12,
+        'min_len': 9000, 'max_len': 15000},
+    'real_life_2017': {
+        'nb_classes': 6, 'nb_recordings': 24,
+        'min_len': 9000, 'max_len': 15000}}
+
+
+def _recording_length(rng, min_len, max_len, length_distribution):
+    """Draws the length of a recording.
+
+    :param rng: The random number generator.
+    :type rng: numpy.random.RandomState
+    :param min_len: The minimum length.
+    :type min_len: int
+    :param max_len: The maximum length.
+    :type max_len: int
+    :param length_distribution: The distribution of the lengths\
+                                (`uniform`, `lognormal`, or `fixed`).
+    :type length_distribution: str
+    :return: The length.
+    :rtype: int
+    """
+    if length_distribution == 'fixed' or min_len == max_len:
+        return max_len
+    if length_distribution == 'uniform':
+        return int(rng.randint(min_len, max_len + 1))
+    if length_distribution == 'lognormal':
+        # Centered at the geometric mean, with the limits at about
+        # two standard deviations.
+        log_min, log_max = np.log(min_len), np.log(max_len)
+        length = np.exp(rng.normal((log_min + log_max) / 2, (log_max - log_min) / 4))
+        return int(np.clip(length, min_len, max_len))
+    raise ValueError('Unknown length distribution `{}`.'.format(length_distribution))
+
+
+def make_recording(seed, index, length, nb_features, nb_classes,
+                   event_density, mean_event_len, dtype='float32'):
+    """Makes the input features and the target values of a\
+    recording.
+
+    Every class has events with exponentially distributed\
+    lengths, at random onsets, so that on average it is active\
+    in `event_density` of the frames. The input features are\
+    a fixed (for the `seed`) random pattern per active class,\
+    plus Gaussian noise, so that a model can learn the task.
+
+    The recording depends only on `seed` and `index`, so it\
+    can be made again whenever it is needed, instead of being\
+    kept in memory.
+
+    :param seed: The seed of the dataset.
+    :type seed: int
+    :param index: The index of the recording.
+    :type index: int
+    :param length: The amount of frames.
+    :type length: int
+    :param nb_features: The amount of features per frame.
+    :type nb_features: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int
+    :param event_density: The mean fraction of active frames,\
+                          per class.
+    :type event_density: float
+    :param mean_event_len: The mean length of the events, in frames.
+    :type mean_event_len: float
+    :param dtype: The data type of the arrays.
+    :type dtype: str
+    :return: The input features and the target values.
+    :rtype: numpy.ndarray, numpy.ndarray
+    """
+    patterns = np.random.RandomState(seed).normal(size=(nb_classes, nb_features))
+    rng = np.random.RandomState([seed, index])
+
+    y = np.zeros((length, nb_classes), dtype=dtype)
+    nb_events = rng.poisson(event_density * length / mean_event_len, size=nb_classes)
+
+    for class_index, class_events in enumerate(nb_events):
+        onsets = rng.randint(0, length, size=class_events)
+        durations = np.maximum(rng.exponential(mean_event_len, size=class_events), 1)
+        for onset, duration in zip(onsets, durations.astype(np.int64)):
+            y[onset:onset + duration, class_index] = 1
+
+    x = y.dot(patterns.astype(dtype))
+    x += rng.normal(size=x.shape).astype(dtype)
+
+    return x, y
+
+
+def generate_synthetic(root_dir, nb_sequences, seq_len, nb_features,
+                       nb_classes, event_density, mean_event_len,
+                       input_features_file_name, target_values_input_name,
+                       seed=0, dtype='float32'):
+    """Generates a dataset with the layout of TUT SED Synthetic\
+    2016, i.e. `<root_dir>/synthetic/<split>`, with one numpy\
+    file of sequences for the input features and one for the\
+    target values, per split.
+
+    The files are written one sequence at a time, so the needed\
+    memory does not depend on the size of the dataset.
+
+    :param root_dir: The root directory of the datasets.
+    :type root_dir: pathlib.Path|str
+    :param nb_sequences: The amount of sequences per split.
+    :type nb_sequences: dict[str, int]
+    :param seq_len: The amount of frames of a sequence.
+    :type seq_len: int
+    :param nb_features: The amount of features per frame.
+    :type nb_features: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int
+    :param event_density: The mean fraction of active frames,\
+                          per class.
+    :type event_density: float
+    :param mean_event_len: The mean length of the events, in frames.
+    :type mean_event_len: float
+    :param input_features_file_name: Input features file name.
+    :type input_features_file_name: str
+    :param target_values_input_name: Target values file name.
+    :type target_values_input_name: str
+    :param seed: The seed of the dataset.
+    :type seed: int
+    :param dtype: The data type of the arrays.
+    :type dtype: str
+    """
+    index = 0
+    for split, split_sequences in nb_sequences.items():
+        split_dir = Path(root_dir, 'synthetic', split)
+        split_dir.mkdir(parents=True, exist_ok=True)
+
+        x_file = np.lib.format.open_memmap(
+            str(split_dir.joinpath(input_features_file_name)), mode='w+',
+            dtype=dtype, shape=(split_sequences, seq_len, nb_features))
+        y_file = np.lib.format.open_memmap(
+            str(split_dir.joinpath(target_values_input_name)), mode='w+',
+            dtype=dtype, shape=(split_sequences, seq_len, nb_classes))
+
+        for i in range(split_sequences):
+            x_file[i], y_file[i] = make_recording(
+                seed, index, seq_len, nb_features, nb_classes,
+                event_density, mean_event_len, dtype)
+            index += 1
+
+        x_file.flush()
+        y_file.flush()
+        del x_file, y_file
+
+        print_msg('{}: {} sequences'.format(split_dir, split_sequences), start='  -- ')
+
+
+def generate_real_life(root_dir, data_dir, scene, nb_recordings, nb_folds,
+                       min_len, max_len, length_distribution, nb_features,
+                       nb_classes, event_density, mean_event_len,
+                       input_features_file_name, target_values_input_name,
+                       seed=0, dtype='float32'):
+    """Generates a dataset with the layout of the TUT SED Real\
+    Life datasets, i.e. `<root_dir>/<data_dir>/<scene>/fold_N`,\
+    with pickle files of lists of recordings for the training\
+    and testing splits of every fold.
+
+    Every recording is in the testing split of one fold, and in\
+    the training split of all the others. The recordings are\
+    made again for every file, so the needed memory is the one\
+    of the biggest file (which is also needed for loading it).
+
+    :param root_dir: The root directory of the datasets.
+    :type root_dir: pathlib.Path|str
+    :param data_dir: The data directory (e.g. `real_life_2017`).
+    :type data_dir: str
+    :param scene: The acoustic scene (if applicable, else '').
+    :type scene: str
+    :param nb_recordings: The amount of recordings.
+    :type nb_recordings: int
+    :param nb_folds: The amount of folds.
+    :type nb_folds: int
+    :param min_len: The minimum amount of frames of a recording.
+    :type min_len: int
+    :param max_len: The maximum amount of frames of a recording.
+    :type max_len: int
+    :param length_distribution: The distribution of the lengths\
+                                (`uniform`, `lognormal`, or `fixed`).
+    :type length_distribution: str
+    :param nb_features: The amount of features per frame.
+    :type nb_features: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int
+    :param event_density: The mean fraction of active frames,\
+                          per class.
+    :type event_density: float
+    :param mean_event_len: The mean length of the events, in frames.
+    :type mean_event_len: float
+    :param input_features_file_name: Input features file name.
+    :type input_features_file_name: str
+    :param target_values_input_name: Target values file name.
+    :type target_values_input_name: str
+    :param seed: The seed of the dataset.
+    :type seed: int
+    :param dtype: The data type of the arrays.
+    :type dtype: str
+    """
+    rng = np.random.RandomState(seed)
+    lengths = [_recording_length(rng, min_len, max_len, length_distribution)
+               for _ in range(nb_recordings)]
+    folds = np.arange(nb_recordings) % nb_folds + 1
+    rng.shuffle(folds)
+
+    for fold in range(1, nb_folds + 1):
+        fold_dir = Path(root_dir, data_dir, scene, 'fold_{}'.format(fold))
+        fold_dir.mkdir(parents=True, exist_ok=True)
+
+        for f_prefix, indices in [('train', np.flatnonzero(folds != fold)),
+                                  ('test', np.flatnonzero(folds == fold))]:
+            recordings = [make_recording(
+                seed, index, lengths[index], nb_features, nb_classes,
+                event_density, mean_event_len, dtype) for index in indices]
+
+            for i, file_name in enumerate([input_features_file_name,
+                                           target_values_input_name]):
+                file_path = fold_dir.joinpath('{}_{}'.format(f_prefix, file_name))
+                with file_path.open('wb') as f:
+                    pickle.dump([r[i] for r in recordings], f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+            del recordings
+
+        print_msg('{}: {} training and {} testing recordings'.format(
+            fold_dir, int(np.sum(folds != fold)), int(np.sum(folds == fold))),
+            start='  -- ')
+
+
+def generate_dataset(layout, root_dir='data', scale=1., nb_features=40,
+                     nb_classes=None, event_density=.1, mean_event_len=100,
+                     seq_len=None, nb_folds=4, min_len=None, max_len=None,
+                     length_distribution='uniform', seed=0, dtype='float32',
+                     input_features_file_name=None,
+                     target_values_input_name=None):
+    """Generates a synthetic dataset with the layout and,\
+    for `scale` = 1, the approximate size of a TUT dataset.
+
+    Not specified arguments take the values of the TUT dataset.\
+    `scale` multiplies the amount of sequences or recordings.
+
+    :param layout: The layout (`synthetic`, `real_life_2016/home`,\
+                   `real_life_2016/residential_area`, or\
+                   `real_life_2017`).
+    :type layout: str
+    :param root_dir: The root directory of the datasets.
+    :type root_dir: pathlib.Path|str
+    :param scale: The size of the dataset, relative to the TUT one.
+    :type scale: float
+    :param nb_features: The amount of features per frame.
+    :type nb_features: int
+    :param nb_classes: The amount of classes.
+    :type nb_classes: int|None
+    :param event_density: The mean fraction of active frames,\
+                          per class.
+    :type event_density: float
+    :param mean_event_len: The mean length of the events, in frames.
+    :type mean_event_len: float
+    :param seq_len: The amount of frames of a sequence, for the\
+                    synthetic layout.
+    :type seq_len: int|None
+    :param nb_folds: The amount of folds, for the real life layouts.
+    :type nb_folds: int
+    :param min_len: The minimum amount of frames of a recording,\
+                    for the real life layouts.
+    :type min_len: int|None
+    :param max_len: The maximum amount of frames of a recording,\
+                    for the real life layouts.
+    :type max_len: int|None
+    :param length_distribution: The distribution of the lengths\
+                                (`uniform`, `lognormal`, or `fixed`).
+    :type length_distribution: str
+    :param seed: The seed of the dataset.
+    :type seed: int
+    :param dtype: The data type of the arrays.
+    :type dtype: str
+    :param input_features_file_name: Input features file name.
+    :type input_features_file_name: str|None
+    :param target_values_input_name: Target values file name.
+    :type target_values_input_name: str|None
+    """
+    if layout not in _presets:
+        raise ValueError('Unknown layout `{}`. Available layouts are: {}.'.format(
+            layout, ', '.join(_presets)))
+
+    preset = _presets[layout]
+
+    common_kwargs = {
+        'root_dir': root_dir, 'nb_features': nb_features,
+        'nb_classes': preset['nb_classes'] if nb_classes is None else nb_classes,
+        'event_density': event_density, 'mean_event_len': mean_event_len,
+        'input_features_file_name': preset.get(
+            'input_features_file_name', 'input_features.p')
+        if input_features_file_name is None else input_features_file_name,
+        'target_values_input_name': preset.get(
+            'target_values_input_name', 'target_values.p')
+        if target_values_input_name is None else target_values_input_name,
+        'seed': seed, 'dtype': dtype}
+
+    print_msg('Generating `{}` in `{}`, with scale {}'.format(
+        layout, root_dir, scale), end='\n\n')
+
+    if layout == 'synthetic':
+        generate_synthetic(
+            nb_sequences={split: max(int(round(v * scale)), 1)
+                          for split, v in preset['nb_sequences'].items()},
+            seq_len=preset['seq_len'] if seq_len is None else seq_len,
+            **common_kwargs)
+    else:
+        data_dir, _, scene = layout.partition('/')
+        generate_real_life(
+            data_dir=data_dir, scene=scene,
+            nb_recordings=max(int(round(preset['nb_recordings'] * scale)), nb_folds),
+            nb_folds=nb_folds,
+            min_len=preset['min_len'] if min_len is None else min_len,
+            max_len=preset['max_len'] if max_len is None else max_len,
+            length_distribution=length_distribution, **common_kwargs)
+
+
+def main():
+    arg_parser = ArgumentParser()
+    arg_parser.add_argument('--layout', type=str, default='real_life_2017',
+                            choices=sorted(_presets))
+    arg_parser.add_argument('--root-dir', type=str, default='data')
+    arg_parser.add_argument('--scale', type=float, default=1.)
+    arg_parser.add_argument('--nb-features', type=int, default=40)
+    arg_parser.add_argument('--nb-classes', type=int)
+    arg_parser.add_argument('--event-density', type=float, default=.1)
+    arg_parser.add_argument('--mean-event-len', type=float, default=100)
+    arg_parser.add_argument('--seq-len', type=int)
+    arg_parser.add_argument('--nb-folds', type=int, default=4)
+    arg_parser.add_argument('--min-len', type=int)
+    arg_parser.add_argument('--max-len', type=int)
+    arg_parser.add_argument('--length-distribution', type=str, default='uniform',
+                            choices=['uniform', 'lognormal', 'fixed'])
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('--dtype', type=str, default='float32')
+    arg_parser.add_argument('--input-features-file-name', type=str)
+    arg_parser.add_argument('--target-values-input-name', type=str)
+
+    generate_dataset(**vars(arg_parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
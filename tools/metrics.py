@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import torch
+import torch.distributed
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
-__all__ = ['f1_per_frame', 'error_rate_per_frame']
+__all__ = ['f1_per_frame', 'error_rate_per_frame',
+           'F1PerFrameAccumulator', 'ErrorRatePerFrameAccumulator']
 
 
 _eps = torch.finfo(torch.float32).eps
@@ -54,6 +56,168 @@ def error_rate_per_frame(y_hat, y_true):
     return (s + d + i)/n
 
 
+class F1PerFrameAccumulator(object):
+    """Accumulates, batch by batch, the TP, FP, and FN\
+    for the F1 score of :func:`f1_per_frame`.
+
+    The counts are kept on the device of the inputs. The\
+    result is the same as calling :func:`f1_per_frame` with\
+    all the batches concatenated.
+    """
+    def __init__(self):
+        super(F1PerFrameAccumulator, self).__init__()
+        self.tp = 0
+        self.fp = 0
+        self.fn = 0
+
+    def reset(self):
+        """Resets the accumulated counts.
+        """
+        self.tp = 0
+        self.fp = 0
+        self.fn = 0
+
+    def update(self, y_hat, y_true, mask=None):
+        """Updates the counts with a batch.
+
+        :param y_hat: The predictions
+        :type y_hat: torch.Tensor
+        :param y_true: The ground truth values
+        :type y_true: torch.Tensor
+        :param mask: The mask of the frames to be counted\
+                     (None for all frames).
+        :type mask: torch.Tensor | None
+        """
+        y_hat, y_true = _masked(y_hat, y_true, mask)
+        tp, _, fp, fn = _tp_tf_fp_fn(y_hat=y_hat, y_true=y_true, dim_sum=None)
+        self.tp = tp.sum(dtype=torch.float64).add(self.tp)
+        self.fp = fp.sum(dtype=torch.float64).add(self.fp)
+        self.fn = fn.sum(dtype=torch.float64).add(self.fn)
+
+    def all_reduce(self):
+        """Sums the counts over the processes of the default\
+        process group of :mod:`torch.distributed`.
+        """
+        self.tp, self.fp, self.fn = _all_reduce_counts(self.tp, self.fp, self.fn)
+
+    def compute(self):
+        """Gets the F1 score from the accumulated counts.
+
+        :return: The F1 score per frame
+        :rtype: torch.Tensor
+        """
+        return _f1(tp=_as_float(self.tp), fp=_as_float(self.fp),
+                   fn=_as_float(self.fn))
+
+
+class ErrorRatePerFrameAccumulator(object):
+    """Accumulates, batch by batch, the substitutions,\
+    deletions, insertions, and active events for the\
+    error rate of :func:`error_rate_per_frame`.
+
+    The counts are kept on the device of the inputs. The\
+    result is the same as calling :func:`error_rate_per_frame`\
+    with all the batches concatenated.
+    """
+    def __init__(self):
+        super(ErrorRatePerFrameAccumulator, self).__init__()
+        self.s = 0
+        self.d = 0
+        self.i = 0
+        self.n = 0
+
+    def reset(self):
+        """Resets the accumulated counts.
+        """
+        self.s = 0
+        self.d = 0
+        self.i = 0
+        self.n = 0
+
+    def update(self, y_hat, y_true, mask=None):
+        """Updates the counts with a batch.
+
+        :param y_hat: The predictions.
+        :type y_hat: torch.Tensor
+        :param y_true: The ground truth.
+        :type y_true: torch.Tensor
+        :param mask: The mask of the frames to be counted\
+                     (None for all frames).
+        :type mask: torch.Tensor | None
+        """
+        y_hat, y_true = _masked(y_hat, y_true, mask)
+        _, __, fp, fn = _tp_tf_fp_fn(y_hat, y_true, -1)
+
+        self.s = fn.min(fp).sum(dtype=torch.float64).add(self.s)
+        self.d = fn.sub(fp).clamp_min(0).sum(dtype=torch.float64).add(self.d)
+        self.i = fp.sub(fn).clamp_min(0).sum(dtype=torch.float64).add(self.i)
+        self.n = y_true.sum(dtype=torch.float64).add(self.n)
+
+    def all_reduce(self):
+        """Sums the counts over the processes of the default\
+        process group of :mod:`torch.distributed`.
+        """
+        self.s, self.d, self.i, self.n = _all_reduce_counts(
+            self.s, self.d, self.i, self.n)
+
+    def compute(self):
+        """Gets the error rate from the accumulated counts.
+
+        :return: The error rate.
+        :rtype: torch.Tensor
+        """
+        s, d, i = _as_float(self.s), _as_float(self.d), _as_float(self.i)
+        n = _as_float(self.n) + _eps
+
+        return (s + d + i)/n
+
+
+def _masked(y_hat, y_true, mask):
+    """Keeps only the frames where the mask is not zero.
+
+    :param y_hat: The predictions, with shape (..., classes).
+    :type y_hat: torch.Tensor
+    :param y_true: The ground truth values, with shape (..., classes).
+    :type y_true: torch.Tensor
+    :param mask: The mask, with shape (...), or None.
+    :type mask: torch.Tensor | None
+    :return: The predictions and ground truth values of the\
+             frames to be kept, with shape (frames, classes).
+    :rtype: (torch.Tensor, torch.Tensor)
+    """
+    if mask is None:
+        return y_hat, y_true
+    mask = mask.gt(0)
+    return y_hat[mask], y_true[mask]
+
+
+def _as_float(count):
+    """Casts an accumulated count to the float32\
+    tensor that the metric functions use.
+
+    :param count: The count.
+    :type count: torch.Tensor | int
+    :return: The count as a float32 tensor.
+    :rtype: torch.Tensor
+    """
+    return torch.as_tensor(count).float()
+
+
+def _all_reduce_counts(*counts):
+    """Sums accumulated counts over the processes of the default\
+    process group of :mod:`torch.distributed`.
+
+    :param counts: The counts.
+    :type counts: torch.Tensor | int
+    :return: The summed counts, as float64 CPU tensors.
+    :rtype: tuple[torch.Tensor]
+    """
+    counts = torch.stack([
+        torch.as_tensor(count, dtype=torch.float64).cpu() for count in counts])
+    torch.distributed.all_reduce(counts)
+    return counts.unbind()
+
+
 def _f1(tp, fp, fn):
     """
 
@@ -9,7 +9,8 @@ __docformat__ = 'reStructuredText'
 __all__ = [
     'print_msg', 'inform_about_device', 'print_date_and_time',
     'InformAboutProcess', 'print_yaml_settings',
-    'print_training_results', 'print_evaluation_results'
+    'print_training_results', 'print_evaluation_results',
+    'print_folds_results'
 ]
 
 
@@ -158,7 +159,7 @@ class InformAboutProcess(ContextDecorator):
 def print_training_results(epoch, training_loss, validation_loss,
                            training_f1, training_er,
                            validation_f1, validation_er,
-                           time_elapsed):
+                           time_elapsed, data_wait=None):
     """Prints the results of the pre-training step to console.
 
     :param epoch: The epoch.
@@ -177,21 +178,41 @@ def print_training_results(epoch, training_loss, validation_loss,
     :type validation_er: float | None
     :param time_elapsed: The time elapsed for the epoch.
     :type time_elapsed: float
+    :param data_wait: The time spent on waiting for the data.
+    :type data_wait: float | None
     """
+    def _va_value(value, f_spec):
+        """Formats a validation value, which can be None.
+
+        :param value: The value.
+        :type value: float | None
+        :param f_spec: The format specification for floats.
+        :type f_spec: str
+        :return: The formatted value.
+        :rtype: str
+        """
+        if value is None:
+            return '{:>{w}}'.format('None', w=f_spec.split('.')[0])
+        return '{:{f_spec}f}'.format(float(value), f_spec=f_spec)
+
     the_msg = \
         'Epoch:{e:{e_spec}d} | ' \
-        'Loss (tr/va):{l_tr:{l_f_spec}f}/{l_va:{l_f_spec}f} | ' \
-        'F1 (tr/va):{f1_tr:{acc_f_spec}f}/{f1_va:{acc_f_spec}f} | ' \
-        'ER (tr/va):{er_tr:{acc_f_spec}f}/{er_va:{acc_f_spec}f} | ' \
+        'Loss (tr/va):{l_tr:{l_f_spec}f}/{l_va} | ' \
+        'F1 (tr/va):{f1_tr:{acc_f_spec}f}/{f1_va} | ' \
+        'ER (tr/va):{er_tr:{acc_f_spec}f}/{er_va} | ' \
         'Time:{t:{t_f_spec}f} sec.'.format(
             e=epoch,
-            l_tr=training_loss, l_va='None' if validation_loss is None else validation_loss,
-            f1_tr=training_f1, f1_va='None' if validation_f1 is None else validation_f1,
-            er_tr=training_er, er_va='None' if validation_er is None else validation_er,
+            l_tr=training_loss, l_va=_va_value(validation_loss, _loss_f_spec),
+            f1_tr=training_f1, f1_va=_va_value(validation_f1, _acc_f_spec),
+            er_tr=training_er, er_va=_va_value(validation_er, _acc_f_spec),
             t=time_elapsed,
             l_f_spec=_loss_f_spec, acc_f_spec=_acc_f_spec, t_f_spec=_time_f_spec,
             e_spec=_epoch_f_spec)
 
+    if data_wait is not None:
+        the_msg = '{} | Data wait:{t:{t_f_spec}f} sec.'.format(
+            the_msg, t=data_wait, t_f_spec=_time_f_spec)
+
     print_msg(the_msg, start='  -- ')
 
 
@@ -212,4 +233,28 @@ def print_evaluation_results(f1_score, er_score, time_elapsed):
     print_msg(the_msg, start='  -- ')
 
 
+def print_folds_results(folds_results):
+    """Prints the testing results of each fold and their mean.
+
+    :param folds_results: The F1 score and the error rate of\
+                          each fold, keyed by the fold.
+    :type folds_results: dict[int, (float, float)]
+    """
+    print_msg('Results per fold', start='\n\n-- ', end='\n\n')
+
+    msg = 'Fold:{fold:>{e_spec}} | F1:{f1:{acc_f_spec}f} | ER:{er:{acc_f_spec}f}'
+
+    for fold, (f1_score, er_score) in sorted(folds_results.items()):
+        print_msg(msg.format(
+            fold=fold, f1=f1_score, er=er_score,
+            e_spec=_epoch_f_spec, acc_f_spec=_acc_f_spec), start='  -- ')
+
+    nb_folds = max(len(folds_results), 1)
+    print_msg(msg.format(
+        fold='Mean',
+        f1=sum(f1 for f1, _ in folds_results.values()) / nb_folds,
+        er=sum(er for _, er in folds_results.values()) / nb_folds,
+        e_spec=_epoch_f_spec, acc_f_spec=_acc_f_spec), start='  -- ')
+
+
 # EOF
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from pathlib import Path
+
+import torch
+from torch.profiler import profile, schedule, ProfilerActivity
+
+from tools.printing import print_msg
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['make_profiler']
+
+
+def make_profiler(run_name, output_dir='profiling', wait=5,
+                  steps=3, row_limit=30):
+    """Creates a profiler for a window of training steps.
+
+    The profiler skips the first `wait` steps, warms up for\
+    one step, and records the next `steps` steps. Then, it\
+    writes a Chrome trace (viewable in `chrome://tracing` or\
+    Perfetto) and a table with the top operators, in\
+    `output_dir`. The named ranges (e.g. `dnn`, `recurrent`,\
+    `loss`, `backward`) are the ones of the models and of\
+    :class:`tools.telemetry.PhaseTimer`.
+
+    :param run_name: The name of the run, used for the file names.
+    :type run_name: str
+    :param output_dir: The directory for the results.
+    :type output_dir: pathlib.Path|str
+    :param wait: The amount of steps to skip.
+    :type wait: int
+    :param steps: The amount of steps to record.
+    :type steps: int
+    :param row_limit: The amount of operators in the table.
+    :type row_limit: int
+    :return: The profiler, to be started and stepped after\
+             every training step.
+    :rtype: torch.profiler.profile
+    """
+    output_dir = Path(output_dir)
+    on_gpu = torch.cuda.is_available()
+
+    def _on_trace_ready(the_profiler):
+        """Writes the results of the profiler.
+
+        :param the_profiler: The profiler.
+        :type the_profiler: torch.profiler.profile
+        """
+        output_dir.mkdir(parents=True, exist_ok=True)
+        trace_path = output_dir.joinpath('{}_trace.json'.format(run_name))
+        table_path = output_dir.joinpath('{}_top_ops.txt'.format(run_name))
+
+        the_profiler.export_chrome_trace(str(trace_path))
+        table_path.write_text(the_profiler.key_averages().table(
+            sort_by='self_cuda_time_total' if on_gpu else 'self_cpu_time_total',
+            row_limit=row_limit))
+
+        print_msg('Profiling results written to `{}` and `{}`.'.format(
+            trace_path, table_path), start='\n-- ', end='\n\n')
+
+    activities = [ProfilerActivity.CPU]
+    if on_gpu:
+        activities.append(ProfilerActivity.CUDA)
+
+    return profile(
+        activities=activities,
+        schedule=schedule(wait=wait, warmup=1, active=steps, repeat=1),
+        on_trace_ready=_on_trace_ready)
+
+# EOF
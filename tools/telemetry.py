@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import json
+import resource
+from time import time, perf_counter
+from pathlib import Path
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import torch
+from torch.autograd.profiler import record_function
+
+from tools.printing import print_training_results, print_evaluation_results
+
+__author__ = 'Konstantinos Drossos -- Tampere University'
+__docformat__ = 'reStructuredText'
+__all__ = ['PhaseTimer', 'make_record', 'TelemetrySink',
+           'JSONLWriter', 'ConsolePrinter']
+
+_phases = ['data_wait', 'forward', 'backward', 'optimizer', 'metrics']
+
+
+class PhaseTimer(object):
+    def __init__(self, device):
+        """Accumulates the wall time of the phases of an epoch\
+        (i.e. data wait, forward, backward, optimizer, and metrics).
+
+        Every timed phase is also a named range for the profiler.
+
+        On a GPU, a timed phase is the time between two CUDA\
+        events on the current stream, so the timing does not\
+        synchronize the host with the device (and does not\
+        cancel the overlap of the copies with the computations).\
+        The device is synchronized only when :attr:`totals` is\
+        read, i.e. once per epoch.
+
+        :param device: The device that is used.
+        :type device: str
+        """
+        super(PhaseTimer, self).__init__()
+        self._totals = OrderedDict((phase, 0.) for phase in _phases)
+        self._events = []
+        self._cuda = torch.device(device).type == 'cuda'
+
+    @property
+    def totals(self):
+        """The accumulated time of every phase, in seconds.
+
+        :return: The time of the phases.
+        :rtype: collections.OrderedDict
+        """
+        if len(self._events) > 0:
+            self._events[-1][-1].synchronize()
+            for phase, start_event, end_event in self._events:
+                self._totals[phase] += start_event.elapsed_time(end_event) / 1000
+            self._events = []
+        return self._totals
+
+    def add(self, phase, seconds):
+        """Adds time to a phase.
+
+        :param phase: The phase.
+        :type phase: str
+        :param seconds: The time, in seconds.
+        :type seconds: float
+        """
+        self._totals[phase] += seconds
+
+    @contextmanager
+    def time(self, phase):
+        """Context manager that adds its time to a phase.
+
+        :param phase: The phase.
+        :type phase: str
+        """
+        if self._cuda:
+            start_event = torch.cuda.Event(enable_timing=True)
+            end_event = torch.cuda.Event(enable_timing=True)
+            start_event.record()
+            try:
+                with record_function(phase):
+                    yield
+            finally:
+                end_event.record()
+                self._events.append((phase, start_event, end_event))
+            return
+
+        start_time = perf_counter()
+        try:
+            with record_function(phase):
+                yield
+        finally:
+            self.add(phase, perf_counter() - start_time)
+
+
+def _peak_memory(device):
+    """Returns the peak resident set size of the process and\
+    the peak memory allocated on the device, in MB, and resets\
+    the latter.
+
+    :param device: The device that is used.
+    :type device: str
+    :return: The peak RSS and the peak device memory (None\
+             if the device is not a GPU).
+    :rtype: float, float|None
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    if torch.device(device).type != 'cuda':
+        return peak_rss, None
+    peak_device = torch.cuda.max_memory_allocated() / 1024 ** 2
+    torch.cuda.reset_peak_memory_stats()
+    return peak_rss, peak_device
+
+
+def make_record(phase, epoch, start_time, loss, f1_score, er_score,
+                stats, device, **extra):
+    """Makes a telemetry record of a phase of an epoch.
+
+    :param phase: The phase (`training`, `validation`, or `testing`).
+    :type phase: str
+    :param epoch: The epoch (None for testing).
+    :type epoch: int|None
+    :param start_time: The time that the phase started, as\
+                       returned by :func:`time.time`.
+    :type start_time: float
+    :param loss: The mean loss (None if not calculated).
+    :type loss: float|None
+    :param f1_score: The F1 score.
+    :type f1_score: float
+    :param er_score: The error rate.
+    :type er_score: float
+    :param stats: The timings and the amounts of frames and\
+                  batches, as returned by the epoch.
+    :type stats: dict
+    :param device: The device that is used.
+    :type device: str
+    :param extra: Any extra values for the record.
+    :type extra: object
+    :return: The record.
+    :rtype: collections.OrderedDict
+    """
+    end_time = time()
+    duration = max(end_time - start_time, 1e-12)
+    peak_rss, peak_device = _peak_memory(device)
+
+    record = OrderedDict([
+        ('phase', phase), ('epoch', epoch),
+        ('start', start_time), ('end', end_time), ('duration', duration),
+        ('loss', None if loss is None else float(loss)),
+        ('f1', float(f1_score)), ('er', float(er_score))])
+    record.update((p, stats[p]) for p in _phases)
+    record.update([
+        ('frames', stats['frames']), ('batches', stats['batches']),
+        ('frames_per_sec', stats['frames'] / duration),
+        ('batches_per_sec', stats['batches'] / duration),
+        ('peak_rss_mb', peak_rss), ('peak_device_memory_mb', peak_device)])
+    record.update(extra)
+
+    return record
+
+
+class TelemetrySink(object):
+    def __init__(self, consumers):
+        """Sends the telemetry records to their consumers.
+
+        :param consumers: The consumers, i.e. callables\
+                          that take a record.
+        :type consumers: list[callable]
+        """
+        super(TelemetrySink, self).__init__()
+        self.consumers = consumers
+
+    def __call__(self, record):
+        for consumer in self.consumers:
+            consumer(record)
+
+    def flush(self):
+        """Flushes the consumers that can be flushed.
+        """
+        for consumer in self.consumers:
+            if hasattr(consumer, 'flush'):
+                consumer.flush()
+
+    def close(self):
+        """Closes the consumers that can be closed.
+        """
+        for consumer in self.consumers:
+            if hasattr(consumer, 'close'):
+                consumer.close()
+
+
+class JSONLWriter(object):
+    def __init__(self, file_path):
+        """Appends the telemetry records to a JSON lines file.
+
+        :param file_path: The path of the file.
+        :type file_path: pathlib.Path|str
+        """
+        super(JSONLWriter, self).__init__()
+        self.file_path = Path(file_path)
+        self._file = None
+
+    def __call__(self, record):
+        if self._file is None:
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self.file_path.open('a')
+        self._file.write('{}\n'.format(json.dumps(record)))
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ConsolePrinter(object):
+    def __init__(self):
+        """Prints the telemetry records to the console, one line\
+        per epoch with its training and validation results.
+
+        The lines are printed in the order of the epochs, i.e. an\
+        epoch is printed only after all the previous ones, even if\
+        its validation results come later (e.g. from a background\
+        validation).
+        """
+        super(ConsolePrinter, self).__init__()
+        self._training = OrderedDict()
+        self._validation = {}
+
+    def _print_epoch(self, training_record, validation_record=None):
+        """Prints the results of an epoch.
+
+        :param training_record: The record of the training phase.
+        :type training_record: dict
+        :param validation_record: The record of the validation phase\
+                                  (None if there was no validation).
+        :type validation_record: dict|None
+        """
+        last_record = training_record if validation_record is None else validation_record
+        print_training_results(
+            epoch=training_record['epoch'],
+            training_loss=training_record['loss'],
+            validation_loss=last_record['loss'] if validation_record else None,
+            training_f1=training_record['f1'],
+            training_er=training_record['er'],
+            validation_f1=last_record['f1'] if validation_record else None,
+            validation_er=last_record['er'] if validation_record else None,
+            time_elapsed=last_record['end'] - training_record['start'],
+            data_wait=training_record['data_wait'] +
+            (validation_record['data_wait'] if validation_record else 0.))
+
+    def _print_ready_epochs(self):
+        """Prints, in order, the epochs that have all their results\
+        and are not waiting for a previous epoch.
+        """
+        while self._training:
+            epoch, training_record = next(iter(self._training.items()))
+            if training_record.get('validated', True) and epoch not in self._validation:
+                break
+            self._training.popitem(last=False)
+            self._print_epoch(training_record, self._validation.pop(epoch, None))
+
+    def __call__(self, record):
+        if record['phase'] == 'training':
+            self._training[record['epoch']] = record
+            self._print_ready_epochs()
+        elif record['phase'] == 'validation':
+            self._validation[record['epoch']] = record
+            self._print_ready_epochs()
+        elif record['phase'] == 'testing':
+            print_evaluation_results(record['f1'], record['er'], record['duration'])
+
+    def flush(self):
+        """Prints the epochs that are still waiting, with the\
+        validation results that they have (e.g. the ones after\
+        an early stopping).
+        """
+        for epoch, training_record in self._training.items():
+            self._print_epoch(training_record, self._validation.pop(epoch, None))
+        self._training.clear()
+        self._validation.clear()
+
+# EOF
@@ -5,7 +5,7 @@ from argparse import ArgumentParser
 
 __author__ = 'Konstantinos Drossos -- Tampere University'
 __docformat__ = 'reStructuredText'
-__all__ = ['CheckAllNone', 'get_argument_parser']
+__all__ = ['CheckAllNone', 'get_argument_parser', 'get_profiling_settings']
 
 
 class CheckAllNone(object):
@@ -39,7 +39,27 @@ def get_argument_parser():
     arg_parser = ArgumentParser()
     arg_parser.add_argument('--config-file', type=str, default='')
     arg_parser.add_argument('--baseline', default=False, action='store_true')
+    arg_parser.add_argument('--resume', default=False, action='store_true')
+    arg_parser.add_argument('--profile', default=False, action='store_true')
+    arg_parser.add_argument('--profile-wait', type=int, default=5)
+    arg_parser.add_argument('--profile-steps', type=int, default=3)
+    arg_parser.add_argument('--profile-dir', type=str, default='profiling')
 
     return arg_parser
 
+
+def get_profiling_settings(args):
+    """Returns the profiling settings from the command line arguments.
+
+    :param args: The parsed arguments.
+    :type args: argparse.Namespace
+    :return: The profiling settings, or None if there is no profiling.
+    :rtype: dict|None
+    """
+    if not args.profile:
+        return None
+    return {'output_dir': args.profile_dir,
+            'wait': args.profile_wait,
+            'steps': args.profile_steps}
+
 # EOF